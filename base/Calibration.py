@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+
+class Calibration(namedtuple("Calibration", ["client_x", "client_y", "scale", "dpi"])):
+    """
+    Where the game's client area sits inside the window (relative to the window's
+    top-left corner) and how much larger it is drawn than the standard 800x600 layout
+    the coordinates in config.json were measured at.
+    """
+
+    __slots__ = ()
+
+
+def window_dpi(window):
+    """The DPI of the monitor the window is on, 96 where it can't be queried."""
+    if sys.platform == "win32":
+        try:
+            import ctypes
+
+            return int(ctypes.windll.user32.GetDpiForWindow(window._hWnd)) or 96
+        except Exception:
+            pass
+    return 96
+
+
+class Calibrator:
+    """
+    Finds the client offsets and scale by locating an anchor template (the Seeds
+    button) and caches the result on disk per platform, window size and DPI.
+
+    A cached calibration is verified by looking for the anchor in a small box around
+    where it should be, so the full multi-scale search only runs when the cache is
+    missing or wrong.
+    """
+
+    SCALES = np.linspace(0.5, 2.0, 31)
+
+    def __init__(self, window_manager, cache_path="cache/calibration.json", anchor="seeds.png", anchor_element="seed_button", confidence=0.9):
+        self.window_manager = window_manager
+        self.cache_path = cache_path
+        self.anchor = anchor
+        self.anchor_position = window_manager.config["game_elements"][anchor_element]
+        self.confidence = confidence
+
+    @property
+    def window(self):
+        return self.window_manager.window
+
+    def key(self, dpi):
+        return f"{sys.platform}:{self.window.width}x{self.window.height}@{dpi}"
+
+    def _read_all(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"Could not read calibration cache '{self.cache_path}': {e}")
+            return {}
+
+    def load(self, dpi):
+        entry = self._read_all().get(self.key(dpi))
+        return Calibration(**entry) if entry else None
+
+    def save(self, calibration):
+        data = self._read_all()
+        data[self.key(calibration.dpi)] = calibration._asdict()
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.cache_path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def _from_match(self, match, scale, dpi):
+        center_x, center_y = match.center
+        return Calibration(
+            int(round(center_x - self.anchor_position[0] * scale - self.window.left)),
+            int(round(center_y - self.anchor_position[1] * scale - self.window.top)),
+            float(scale),
+            dpi,
+        )
+
+    def verify(self, calibration, margin=8):
+        """
+        True if the anchor is where the calibration says, checked in a small box only.
+        """
+        template = self.window_manager.templates.get(self.anchor)
+        if template is None:
+            return False
+        scale = calibration.scale
+        center_x = self.window.left + calibration.client_x + self.anchor_position[0] * scale
+        center_y = self.window.top + calibration.client_y + self.anchor_position[1] * scale
+        half_width = template.width * scale / 2 + margin
+        half_height = template.height * scale / 2 + margin
+        box = (center_x - half_width, center_y - half_height, center_x + half_width, center_y + half_height)
+
+        view, origin = self.window_manager.frames.get_region(box)
+        return self.window_manager.templates.locate(self.anchor, view, origin, self.confidence, scale=scale) is not None
+
+    def calibrate(self, dpi):
+        """
+        Searches the whole window for the anchor over a range of scales.
+        """
+        frame, origin = self.window_manager.frames.get_region()
+        best = None
+        for scale in self.SCALES:
+            match = self.window_manager.templates.locate(self.anchor, frame, origin, 0, scale=float(scale))
+            if match and (best is None or match.score > best[0].score):
+                best = (match, float(scale))
+        if best is None or best[0].score < self.confidence:
+            logging.warning(f"Calibration failed, could not find '{self.anchor}' at any scale")
+            return None
+        match, scale = best
+        logging.info(f"Calibrated at scale {scale:.2f} (score {match.score:.3f})")
+        return self._from_match(match, scale, dpi)
+
+    def run(self):
+        """
+        Returns a verified calibration, from the cache if it is still valid.
+        """
+        dpi = window_dpi(self.window)
+        cached = self.load(dpi)
+        if cached and self.verify(cached):
+            logging.info("Using cached window calibration")
+            return cached
+
+        calibration = self.calibrate(dpi)
+        if calibration:
+            self.save(calibration)
+        return calibration
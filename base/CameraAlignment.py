@@ -0,0 +1,202 @@
+import logging
+from collections import namedtuple
+
+import cv2
+import numpy as np
+from pytweening import easeOutCirc
+
+from . import Conditions
+from .ColorSearch import parse_color
+from .InputSequence import InputSequence
+from .Tracer import sleep, tracer
+
+
+class AlignmentStep(namedtuple("AlignmentStep", ["name", "converged", "iterations", "error"])):
+    """How one closed-loop step ended: whether it converged, after how many tries."""
+
+    __slots__ = ()
+
+
+def sky_rows(view, sky_rgb, tolerance=12, min_fraction=0.5):
+    """
+    Counts the rows at the top of `view` that are mostly sky, i.e. how far down the
+    horizon is. 0 means no sky is visible at all.
+    """
+    if view.size == 0:
+        return 0
+    r, g, b = sky_rgb
+    low = np.array([max(b - tolerance, 0), max(g - tolerance, 0), max(r - tolerance, 0)], dtype=np.uint8)
+    high = np.array([min(b + tolerance, 255), min(g + tolerance, 255), min(r + tolerance, 255)], dtype=np.uint8)
+    fraction = cv2.inRange(view, low, high).mean(axis=1) / 255
+    ground = np.flatnonzero(fraction < min_fraction)
+    return int(ground[0]) if ground.size else view.shape[0]
+
+
+class CameraAligner:
+    """
+    Sets up the camera by measuring it from the screen instead of replaying a fixed
+    recipe, and repeats each step only until the measurement says it is done:
+
+    - follow mode: presses "right" in the camera mode setting until
+      cameramode_follow.png shows up, and "left" the same number of times afterwards
+      until it is gone again,
+    - pitch: looks down until at most `horizon_target` rows of sky are left in the
+      "camera_view" region, moving the mouse in proportion to the error,
+    - yaw: bounces between the seed and sell buttons in follow mode until the view
+      after a bounce matches the one before.
+
+    Every step gives up after `max_iterations` and reports it, so a failed alignment
+    shows up in the log instead of silently leaving the camera wrong.
+
+    The pitch is aligned to "no sky left", which looks the same as a `sky_color`
+    that doesn't match the game. So `sky_color` has no default and must be measured
+    on the real client, and the camera has to show sky before it is moved; without
+    either, align() stops and the caller uses the open-loop recipe.
+    """
+
+    def __init__(self, macro, settings=None):
+        settings = settings or {}
+        self.macro = macro
+        self.window_manager = macro.window_manager
+        sky_color = settings.get("sky_color")
+        self.sky_rgb = parse_color(sky_color) if sky_color else None
+        self.sky_tolerance = settings.get("sky_tolerance", 12)
+        self.horizon_target = settings.get("horizon_target", 0)
+        self.tolerance = settings.get("tolerance", 4)
+        self.pitch_gain = settings.get("pitch_gain", 4)
+        self.max_iterations = settings.get("max_iterations", 6)
+        self.settle_threshold = settings.get("settle_threshold", 2.0)
+        self.steps = []
+
+    def _finish(self, name, converged, iterations, error=0.0):
+        step = AlignmentStep(name, converged, iterations, error)
+        self.steps.append(step)
+        log = logging.info if converged else logging.warning
+        log(f"Camera {name}: {'converged' if converged else 'did not converge'} after {iterations} iteration(s), error {error:.1f}")
+        return step
+
+    def horizon(self):
+        """Rows of sky left at the top of the camera view on a fresh frame."""
+        self.window_manager.frames.invalidate()
+        view, _ = self.window_manager.frames.get_region(self.window_manager.resolve_region("camera_view"))
+        return sky_rows(view, self.sky_rgb, self.sky_tolerance)
+
+    def _follow_visible(self):
+        return Conditions.template_visible(self.window_manager, "cameramode_follow.png", region="camera_mode")
+
+    def _open_camera_mode(self):
+        settings_open = Conditions.region_settled(self.window_manager, require_change=True)
+        settings_open()  # Remember how the screen looks before opening the menu
+        self.macro.press("esc")
+        self.macro.wait_until(settings_open, 0.4, label="settings menu open")
+        self.macro.press("tab")
+        sleep(0.3)
+        self.macro.press("down")
+        sleep(0.3)
+
+    def set_follow_mode(self):
+        """
+        Switches the camera to follow mode. Returns how many "right" presses it took,
+        which restore_camera_mode needs, or None if follow mode never showed up.
+        """
+        self._open_camera_mode()
+        visible = self._follow_visible()
+        presses = 0
+        converged = visible()
+        while not converged and presses < self.max_iterations:
+            self.macro.press("right")
+            presses += 1
+            converged = self.macro.wait_until(visible, 0.3, label="camera mode follow")
+        self.macro.press("esc")
+        self._finish("follow mode", converged, presses)
+        return presses if converged else None
+
+    def restore_camera_mode(self, presses):
+        """Switches back to the camera mode that was set before set_follow_mode."""
+        if presses == 0:
+            return self._finish("mode restore", True, 0).converged
+        self._open_camera_mode()
+        visible = self._follow_visible()
+        for _ in range(presses):
+            self.macro.press("left")
+        gone = self.macro.wait_until(lambda: not visible(), 0.3, label="camera mode restored")
+        self.macro.press("esc")
+        return self._finish("mode restore", gone, presses).converged
+
+    def align_pitch(self):
+        """Looks down in eased mouse moves sized by how far the horizon is off."""
+        error = self.horizon() - self.horizon_target
+        iterations = 0
+        while abs(error) > self.tolerance and iterations < self.max_iterations:
+            iterations += 1
+            steps = 20
+            # eased_move_rel moves by dy * easing(t) per step, scale it so the steps add up to dy
+            total = sum(easeOutCirc(i / steps) for i in range(1, steps))
+            dy = error * self.pitch_gain / total
+            self.macro.play(InputSequence(gap=0.002).eased_move_rel(0, dy, steps, easeOutCirc))
+            error = self.horizon() - self.horizon_target
+        return self._finish("pitch", abs(error) <= self.tolerance, iterations, error).converged
+
+    def _snapshot(self):
+        self.window_manager.frames.invalidate()
+        view, _ = self.window_manager.frames.get_region(self.window_manager.resolve_region("camera_view"))
+        gray = cv2.cvtColor(view, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (max(gray.shape[1] // 4, 1), max(gray.shape[0] // 4, 1)), interpolation=cv2.INTER_AREA)
+        return small.astype(np.int16)
+
+    def settle_yaw(self):
+        """
+        Bounces between the seed and sell buttons in follow mode, which turns the camera
+        behind the character, until the view after a bounce stops changing.
+        """
+        seeds = self.window_manager.to_screen(*self.window_manager.config["game_elements"]["seed_button"])
+        sell = self.window_manager.to_screen(*self.window_manager.config["game_elements"]["sell_button"])
+        bounce = InputSequence(gap=0).click_at(*seeds).wait(0.05).click_at(*sell).wait(0.05)
+
+        previous = None
+        difference = float("inf")
+        iterations = 0
+        while iterations < self.max_iterations:
+            iterations += 1
+            self.macro.play(bounce)
+            sleep(0.05)
+            current = self._snapshot()
+            if previous is not None:
+                difference = float(np.abs(current - previous).mean())
+                if difference <= self.settle_threshold:
+                    break
+            previous = current
+        return self._finish("yaw", difference <= self.settle_threshold, iterations, difference).converged
+
+    @tracer.traced("routine", "align camera")
+    def align(self):
+        """
+        Runs the closed-loop steps in order. Returns True if every step converged;
+        self.steps tells which one did not. Returns None, without moving the camera
+        or having only gone first person, if sky_color is unset or no sky is
+        visible to measure the pitch by.
+        """
+        self.steps = []
+        if self.sky_rgb is None:
+            logging.warning("camera_alignment.sky_color is not calibrated, the closed loop can't measure the pitch")
+            self._finish("pitch", False, 0, float(self.horizon_target))
+            return None
+        with self.macro.input_slot():
+            self.macro.click_center()
+            self.macro.scroll(1000000)  # Going first person
+        sleep(0.2)
+        if self.horizon() == 0:
+            logging.warning("No sky_color in the camera view, the closed loop can't measure the pitch")
+            self._finish("pitch", False, 0, float(self.horizon_target))
+            return None
+        pitch = self.align_pitch()
+        self.macro.scroll_center(-2500)  # Going third person
+
+        presses = self.set_follow_mode()
+        if presses is None:
+            return False
+        self.macro.scroll_center(-3000)
+        sleep(0.2)
+        yaw = self.settle_yaw()
+        restored = self.restore_camera_mode(presses)
+        return pitch and yaw and restored
@@ -0,0 +1,176 @@
+import logging
+import sys
+import threading
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+
+class CaptureBackend(ABC):
+    """
+    Grabs a screen box into a preallocated BGR buffer. A backend without grab()
+    can't be created.
+
+    Two buffers are used in turn, so a view handed out for one frame stays valid
+    while the next frame is being captured. Anything kept longer has to be copied.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._buffers = [None, None]
+        self._current = 0
+        self.grabs = 0
+        self.bytes_copied = 0
+
+    def _buffer(self, height, width):
+        self._current ^= 1
+        buffer = self._buffers[self._current]
+        if buffer is None or buffer.shape[:2] != (height, width):
+            buffer = self._buffers[self._current] = np.empty((height, width, 3), dtype=np.uint8)
+        return buffer
+
+    def _copied(self, *arrays):
+        self.grabs += 1
+        self.bytes_copied += sum(array.nbytes for array in arrays)
+
+    @abstractmethod
+    def grab(self, box):
+        """
+        Captures a (left, top, right, bottom) screen box, or the whole screen for None.
+        Returns a BGR array backed by one of the reusable buffers.
+        """
+
+    def close(self):
+        pass
+
+
+class PilCaptureBackend(CaptureBackend):
+    """
+    PIL.ImageGrab, available everywhere. PIL allocates a new image per grab, which is
+    converted straight into the reusable buffer.
+    """
+
+    name = "pil"
+
+    def __init__(self):
+        super().__init__()
+        from PIL import ImageGrab
+
+        self._image_grab = ImageGrab
+
+    def grab(self, box):
+        image = self._image_grab.grab(bbox=box)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        rgb = np.asarray(image)
+        buffer = self._buffer(*rgb.shape[:2])
+        cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=buffer)
+        self._copied(rgb, buffer)
+        return buffer
+
+
+class MssCaptureBackend(CaptureBackend):
+    """
+    The fast path through the optional `mss` package (XGetImage/XShm on Linux,
+    BitBlt on Windows). The raw BGRA bytes are wrapped without a copy and converted
+    once into the reusable buffer. An mss handle must stay on the thread that made it,
+    so every thread that grabs gets its own, made on its first grab.
+    """
+
+    name = "mss"
+
+    def __init__(self):
+        super().__init__()
+        try:
+            import mss
+        except ImportError as e:
+            raise ImportError("The 'mss' capture backend needs `pip install mss`") from e
+        self._mss = mss
+        self._local = threading.local()
+        self._handles = []
+        self._handles_lock = threading.Lock()
+        # Fails here rather than on the first grab if the display can't be opened
+        self._handle()
+
+    def _handle(self):
+        """This thread's mss handle."""
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._local.sct = self._mss.mss()
+            with self._handles_lock:
+                self._handles.append(sct)
+        return sct
+
+    def grab(self, box):
+        sct = self._handle()
+        if box is None:
+            monitor = sct.monitors[0]
+        else:
+            monitor = {"left": box[0], "top": box[1], "width": box[2] - box[0], "height": box[3] - box[1]}
+        shot = sct.grab(monitor)
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        buffer = self._buffer(shot.height, shot.width)
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=buffer)
+        self._copied(buffer)
+        return buffer
+
+    def close(self):
+        with self._handles_lock:
+            handles, self._handles = self._handles, []
+        for sct in handles:
+            sct.close()
+        self._local = threading.local()
+
+
+class SyntheticCaptureBackend(CaptureBackend):
+    """
+    Serves frames from a callable instead of the screen, for tests, benchmarks and the
+    simulator. `source()` returns the whole virtual screen as a BGR array.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, source=None, size=(800, 600)):
+        super().__init__()
+        if source is None:
+            screen = np.random.default_rng(0).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+            source = lambda: screen
+        self.source = source
+
+    def grab(self, box):
+        screen = self.source()
+        if box is None:
+            box = (0, 0, screen.shape[1], screen.shape[0])
+        left, top = max(int(box[0]), 0), max(int(box[1]), 0)
+        right, bottom = min(int(box[2]), screen.shape[1]), min(int(box[3]), screen.shape[0])
+        buffer = self._buffer(max(bottom - top, 0), max(right - left, 0))
+        np.copyto(buffer, screen[top:bottom, left:right])
+        self._copied(buffer)
+        return buffer
+
+
+CAPTURE_BACKENDS = {
+    "pil": PilCaptureBackend,
+    "mss": MssCaptureBackend,
+    "synthetic": SyntheticCaptureBackend,
+}
+
+
+def create_capture_backend(name=None):
+    """
+    Builds the capture backend named in config.json. "auto" (the default) uses mss on
+    Linux when it is installed and PIL otherwise.
+    """
+    if name in (None, "auto"):
+        if sys.platform.startswith("linux"):
+            try:
+                return MssCaptureBackend()
+            except ImportError:
+                pass
+        return PilCaptureBackend()
+    if name not in CAPTURE_BACKENDS:
+        logging.warning(f"Unknown capture backend '{name}', using pil")
+        return PilCaptureBackend()
+    return CAPTURE_BACKENDS[name]()
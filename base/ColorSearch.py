@@ -0,0 +1,125 @@
+from collections import namedtuple
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from .Tracer import tracer
+
+
+class Blob(namedtuple("Blob", ["color", "left", "top", "width", "height", "area", "center"])):
+    """
+    A connected patch of matching pixels in screen coordinates. `color` is the hex
+    string of the target it matched and `center` its centroid.
+    """
+
+    __slots__ = ()
+
+
+def parse_color(hex):
+    """Turns '26ee26' or '#26ee26' into an (r, g, b) tuple."""
+    hex = hex.lstrip("#")
+    return tuple(int(hex[i : i + 2], 16) for i in (0, 2, 4))
+
+
+def _pack(rgb):
+    """The uint32 value a BGRA pixel of this color has in memory."""
+    r, g, b = rgb
+    return np.array([b, g, r, 255], dtype=np.uint8).view(np.uint32)[0]
+
+
+class ColorSearch:
+    """
+    Finds patches of given colors inside the window or a named region.
+
+    The region is converted once into a reusable BGRA buffer that is viewed as one
+    uint32 per pixel, so exact colors are compared with a single integer compare per
+    pixel instead of building 3-channel boolean arrays. With a tolerance the region
+    is thresholded with cv2.inRange. Matching pixels are grouped into blobs with
+    cv2.connectedComponentsWithStats, one mask per target color, so touching patches
+    of two colors stay two blobs.
+    """
+
+    def __init__(self, frames, resolve_region=None):
+        """
+        Args:
+            frames: The FrameProvider to read pixels from.
+            resolve_region: A callable turning region names into screen boxes,
+                usually WindowManager.resolve_region.
+        """
+        self.frames = frames
+        self.resolve_region = resolve_region or (lambda region: region)
+        self._buffer = None
+
+    def _packed(self, view):
+        height, width = view.shape[:2]
+        if self._buffer is None or self._buffer.shape[:2] != (height, width):
+            self._buffer = np.empty((height, width, 4), dtype=np.uint8)
+        cv2.cvtColor(view, cv2.COLOR_BGR2BGRA, dst=self._buffer)
+        return self._buffer.view(np.uint32).reshape(height, width)
+
+    def _masks(self, view, targets, tolerance):
+        """One uint8 mask per target color."""
+        if not np.any(tolerance):
+            packed = self._packed(view)
+            return [(packed == _pack(rgb)).view(np.uint8) for rgb in targets]
+
+        masks = []
+        for r, g, b in targets:
+            target = np.array([b, g, r], dtype=np.int16)
+            lower = np.clip(target - tolerance[::-1], 0, 255).astype(np.uint8)
+            upper = np.clip(target + tolerance[::-1], 0, 255).astype(np.uint8)
+            masks.append(cv2.inRange(view, lower, upper))
+        return masks
+
+    @tracer.traced("match", "find color")
+    def find(self, colors, region=None, tolerance=0, min_area=1):
+        """
+        Searches for one or more colors in a single frame.
+
+        Args:
+            colors: A hex string or a list of hex strings.
+            region: A region name from config.json, a (left, top, right, bottom)
+                box in screen coordinates, or None for the whole window.
+            tolerance: Allowed difference per channel, an int or an (r, g, b) tuple.
+            min_area: Blobs with fewer pixels are dropped.
+
+        Returns:
+            A dict mapping each hex string to its blobs, largest first.
+        """
+        started = perf_counter()
+        if isinstance(colors, str):
+            colors = [colors]
+        targets = [parse_color(color) for color in colors]
+        tolerance = np.broadcast_to(np.asarray(tolerance, dtype=np.int16), (3,))
+
+        box = self.resolve_region(region)
+        view, (left, top) = self.frames.get_region(box)
+        found = {color: [] for color in colors}
+        if view.size == 0:
+            return found
+
+        for color, mask in zip(colors, self._masks(view, targets, tolerance)):
+            count, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+            for label in range(1, count):
+                x, y, width, height, area = stats[label]
+                if area < min_area:
+                    continue
+                cx, cy = centroids[label]
+                found[color].append(
+                    Blob(color, left + int(x), top + int(y), int(width), int(height), int(area),
+                         (left + int(round(cx)), top + int(round(cy))))
+                )
+
+        for blobs in found.values():
+            blobs.sort(key=lambda blob: blob.area, reverse=True)
+
+        if self.frames.recorder is not None:
+            query = {"colors": colors, "box": box, "tolerance": tolerance.tolist(), "min_area": min_area}
+            self.frames.recorder.vision("color", query, found, perf_counter() - started)
+        return found
+
+    def find_largest(self, color, region=None, tolerance=0, min_area=1):
+        """Returns the biggest blob of a single color, or None."""
+        blobs = self.find(color, region, tolerance, min_area)[color]
+        return blobs[0] if blobs else None
@@ -0,0 +1,160 @@
+import logging
+from collections import namedtuple
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from .Tracer import sleep
+
+
+WaitResult = namedtuple("WaitResult", ["label", "ok", "waited", "fixed_delay", "polls"])
+
+
+def wait_until(condition, timeout, poll_interval=0.05, frames=None, label=None):
+    """
+    Polls `condition` until it returns something truthy or `timeout` seconds pass.
+
+    Args:
+        condition: A callable taking no arguments, e.g. one of the factories below.
+        timeout: The longest time to wait, in seconds.
+        poll_interval: The pause between two polls.
+        frames: If given, this FrameProvider is invalidated before every poll so the
+            condition always looks at a fresh capture.
+        label: A name for the step, used in the log line.
+
+    Returns:
+        A WaitResult; `ok` is False if the condition never became true.
+    """
+    started = perf_counter()
+    polls = 0
+    while True:
+        if frames is not None:
+            frames.invalidate()
+        polls += 1
+        if condition():
+            ok = True
+            break
+        if perf_counter() - started >= timeout:
+            ok = False
+            break
+        sleep(poll_interval)
+
+    waited = perf_counter() - started
+    result = WaitResult(label or getattr(condition, "__name__", "condition"), ok, waited, timeout, polls)
+    log = logging.debug if ok else logging.warning
+    log(
+        "Waited %.2fs for '%s' (fixed delay was %ss, %d polls, %s)",
+        waited, result.label, timeout, polls, "ready" if ok else "timed out",
+    )
+    return result
+
+
+def template_visible(window_manager, image_name, confidence=0.9, region=None):
+    """True once the template can be found in the region (default: whole window)."""
+    def condition():
+        view, origin = window_manager.frames.get_region(window_manager.resolve_region(region))
+        return window_manager.templates.locate(image_name, view, origin, confidence=confidence) is not None
+
+    condition.__name__ = f"template {image_name}"
+    return condition
+
+
+def color_present(window_manager, hex, region=None, tolerance=0, min_area=1):
+    """True once a blob of the color shows up in the region."""
+    def condition():
+        return window_manager.colors.find_largest(hex, region, tolerance, min_area) is not None
+
+    condition.__name__ = f"color {hex}"
+    return condition
+
+
+def state_is(window_manager, name, value=True):
+    """True once the game state snapshot has `value` for the detector `name`, e.g. state_is(wm, "gui", None)."""
+    def condition():
+        return getattr(window_manager.state.snapshot(), name) == value
+
+    condition.__name__ = f"state {name}={value!r}"
+    return condition
+
+
+def text_present(window_manager, text, region):
+    """True once an OCR line in the region contains `text` (case-insensitive)."""
+    text = text.lower()
+
+    def condition():
+        bounding_box = window_manager.resolve_region(region)
+        return any(text in line for line, _ in window_manager.get_words_in_bounding_box(bounding_box))
+
+    condition.__name__ = f"text '{text}'"
+    return condition
+
+
+def region_changed(window_manager, region=None, threshold=2.0):
+    """True once the region differs from how it looked on the first poll, e.g. a dialog went away."""
+    state = {"first": None}
+
+    def condition():
+        view, _ = window_manager.frames.get_region(window_manager.resolve_region(region))
+        if view.size == 0:
+            return True
+        small = _small_gray(view)
+        if state["first"] is None:
+            state["first"] = small
+            return False
+        return np.abs(small - state["first"]).mean() > threshold
+
+    condition.__name__ = "region changed"
+    return condition
+
+
+def all_of(*conditions):
+    """True once every condition is. All of them are polled every time, so each keeps its own history."""
+    def condition():
+        results = [check() for check in conditions]
+        return all(results)
+
+    condition.__name__ = " and ".join(getattr(check, "__name__", "condition") for check in conditions)
+    return condition
+
+
+def _small_gray(view):
+    """The view downscaled 4x in grayscale, as int16 so differences don't wrap."""
+    gray = cv2.cvtColor(view, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (max(gray.shape[1] // 4, 1), max(gray.shape[0] // 4, 1)), interpolation=cv2.INTER_AREA)
+    return small.astype(np.int16)
+
+
+def region_settled(window_manager, region=None, threshold=2.0, stable_polls=2, require_change=False):
+    """
+    True once the region stopped changing: the mean absolute difference between two
+    consecutive (downscaled, grayscale) polls stayed under `threshold` for
+    `stable_polls` polls in a row.
+
+    With require_change, the region first has to differ from how it looked on the
+    first poll, which is how "the GUI opened and finished animating" is detected.
+    """
+    state = {"first": None, "previous": None, "changed": not require_change, "stable": 0}
+
+    def condition():
+        view, _ = window_manager.frames.get_region(window_manager.resolve_region(region))
+        if view.size == 0:
+            return True
+        small = _small_gray(view)
+
+        if state["first"] is None:
+            state["first"] = state["previous"] = small
+            return False
+
+        if not state["changed"]:
+            state["changed"] = np.abs(small - state["first"]).mean() > threshold
+
+        if np.abs(small - state["previous"]).mean() <= threshold:
+            state["stable"] += 1
+        else:
+            state["stable"] = 0
+        state["previous"] = small
+        return state["changed"] and state["stable"] >= stable_polls
+
+    condition.__name__ = "region settled"
+    return condition
@@ -0,0 +1,47 @@
+import json
+import os
+
+
+# Keys every part of the macro relies on, with the type they must have
+REQUIRED_KEYS = {
+    "window_title": str,
+    "standard_width": int,
+    "standard_height": int,
+    "title_bar_offsets": dict,
+    "border_offsets": dict,
+    "game_elements": dict,
+}
+
+_loaded = {}
+
+
+def validate_config(config):
+    """Raises ValueError listing every missing or mistyped required key."""
+    problems = []
+    for key, expected in REQUIRED_KEYS.items():
+        if key not in config:
+            problems.append(f"missing '{key}'")
+        elif not isinstance(config[key], expected):
+            problems.append(f"'{key}' should be a {expected.__name__}")
+    for name, coords in config.get("game_elements", {}).items():
+        if not (isinstance(coords, list) and len(coords) == 2):
+            problems.append(f"game_elements.{name} should be [x, y]")
+    for name, box in config.get("regions", {}).items():
+        if not (isinstance(box, list) and len(box) == 4):
+            problems.append(f"regions.{name} should be [left, top, right, bottom]")
+    if problems:
+        raise ValueError("Invalid config: " + ", ".join(problems))
+
+
+def load_config(path="config.json"):
+    """
+    Parses and validates a config file once. Later calls with the same path return
+    the same dict, so GAGMacro, WindowManager and GameActions all share one object.
+    """
+    key = os.path.abspath(path)
+    if key not in _loaded:
+        with open(path, "r") as f:
+            config = json.load(f)
+        validate_config(config)
+        _loaded[key] = config
+    return _loaded[key]
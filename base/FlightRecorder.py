@@ -0,0 +1,232 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import threading
+from collections import deque
+from datetime import datetime
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from .Tracer import tracer
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Dump folders start with the time they were written, which is also their age order
+DUMP_NAME = re.compile(r"^\d{8}_\d{6}_\d{6}_")
+
+_listener = None
+
+
+class _RawQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues the record as it is. The stock QueueHandler formats the message and the
+    traceback on the calling thread in prepare(); here the listener does it. Log
+    arguments are read when the listener gets to them, so pass values rather than
+    objects that change right after the call.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def install_queue_logging(level=logging.DEBUG):
+    """
+    Sends every log record through a queue to a listener thread that does the
+    formatting and writing, so a log call on the input path costs a queue put instead
+    of a write to the console. Safe to call more than once.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return _listener
+    log_queue = queue.SimpleQueue()
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+    _listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    root.addHandler(_RawQueueHandler(log_queue))
+    return _listener
+
+
+def add_log_handler(handler):
+    """Adds a handler that runs on the logging listener thread, if there is one."""
+    if _listener is not None:
+        _listener.handlers = _listener.handlers + (handler,)
+    else:
+        logging.getLogger().addHandler(handler)
+
+
+def remove_log_handler(handler):
+    """Removes a handler added with add_log_handler."""
+    if _listener is not None and handler in _listener.handlers:
+        _listener.handlers = tuple(h for h in _listener.handlers if h is not handler)
+    logging.getLogger().removeHandler(handler)
+
+
+class _RecentRecords(logging.Handler):
+    """
+    Keeps the last records in a deque, unformatted until a dump needs them. A
+    traceback is formatted right away and its exc_info dropped, which would keep
+    every frame of the failed call alive for as long as the record is kept.
+    """
+
+    def __init__(self, capacity):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+
+    def emit(self, record):
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        self.records.append(record)
+
+
+class FlightRecorder:
+    """
+    Keeps the last few captured frames and log records in memory, and writes them to
+    disk only when something goes wrong.
+
+    Recording a frame is a copy into a preallocated ring slot; log records are kept
+    unformatted. A dump copies the ring and hands it to a writer thread, which saves
+    the frames as compressed PNGs together with the log (and recent trace spans while
+    tracing) into a folder per failure, then deletes the oldest dumps beyond `keep`
+    folders or `max_megabytes` in total.
+    """
+
+    def __init__(self, path="debug", frames=8, log_records=500, max_megabytes=100, keep=20, compression=3):
+        self.path = path
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self.keep = keep
+        self.compression = compression
+
+        self._slots = [None] * frames
+        self._meta = [None] * frames
+        self._next = 0
+        self._lock = threading.Lock()
+        self.log = _RecentRecords(log_records)
+        add_log_handler(self.log)
+
+        # A few dumps may wait to be written, more are dropped rather than blocking
+        self._queue = queue.Queue(maxsize=4)
+        self._thread = None
+        self.dumps = 0
+        self.dropped = 0
+        atexit.register(self.close)
+
+    def frame(self, frame, origin):
+        """Keeps a copy of a captured frame. Called by the FrameProvider."""
+        with self._lock:
+            index = self._next
+            slot = self._slots[index]
+            if slot is None or slot.shape != frame.shape:
+                slot = self._slots[index] = np.empty_like(frame)
+            np.copyto(slot, frame)
+            self._meta[index] = (tuple(origin), perf_counter())
+            self._next = (index + 1) % len(self._slots)
+
+    def _snapshot(self):
+        """The frames in the ring, oldest first, as (frame copy, origin, capture time)."""
+        with self._lock:
+            order = range(self._next, self._next + len(self._slots))
+            return [
+                (self._slots[i % len(self._slots)].copy(),) + self._meta[i % len(self._slots)]
+                for i in order
+                if self._slots[i % len(self._slots)] is not None
+            ]
+
+    def dump(self, reason):
+        """
+        Writes the recent frames and log to a new folder in the background. Returns
+        right away; if the writer is too far behind the dump is dropped.
+        """
+        job = {
+            "reason": re.sub(r"[^\w.-]+", "_", reason),
+            "time": datetime.now(),
+            "now": perf_counter(),
+            "frames": self._snapshot(),
+            "records": list(self.log.records),
+            "spans": tracer.events[-200:] if tracer.enabled else [],
+        }
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="flight-recorder", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(job)
+            self.dumps += 1
+        except queue.Full:
+            self.dropped += 1
+            logging.warning(f"Flight recorder is busy, dropped the dump for '{reason}'")
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                folder = self._write(job)
+                self._prune()
+                logging.info(f"Flight recorder saved '{job['reason']}' to '{folder}'")
+            except Exception as e:
+                logging.error(f"Flight recorder could not save '{job['reason']}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, job):
+        name = f"{job['time'].strftime('%Y%m%d_%H%M%S_%f')}_{job['reason']}"
+        folder = os.path.join(self.path, name)
+        os.makedirs(folder, exist_ok=True)
+        for i, (frame, origin, captured_at) in enumerate(job["frames"]):
+            age = int((job["now"] - captured_at) * 1000)
+            filename = f"frame_{i:02d}_{age}ms_at_{origin[0]}_{origin[1]}.png"
+            cv2.imwrite(os.path.join(folder, filename), frame, [cv2.IMWRITE_PNG_COMPRESSION, self.compression])
+        with open(os.path.join(folder, "log.txt"), "w") as f:
+            for record in job["records"]:
+                f.write(self.log.format(record) + "\n")
+        if job["spans"]:
+            with open(os.path.join(folder, "trace.jsonl"), "w") as f:
+                for span_name, cat, start, duration, tid, args, breakdown in job["spans"]:
+                    f.write(json.dumps({
+                        "name": span_name, "cat": cat, "start": round(start - tracer.started, 4),
+                        "duration": round(duration, 4), "tid": tid, "breakdown": dict(breakdown),
+                    }, default=repr) + "\n")
+        return folder
+
+    def _prune(self):
+        """Deletes the oldest dumps until both the folder count and size limits hold."""
+        folders = sorted(
+            entry.path for entry in os.scandir(self.path) if entry.is_dir() and DUMP_NAME.match(entry.name)
+        )
+        sizes = {
+            folder: sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+            for folder in folders
+        }
+        total = sum(sizes.values())
+        while folders and (len(folders) > self.keep or total > self.max_bytes):
+            oldest = folders.pop(0)
+            total -= sizes[oldest]
+            shutil.rmtree(oldest, ignore_errors=True)
+
+    def flush(self):
+        """Waits until every queued dump has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Writes the queued dumps and stops keeping log records."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+        remove_log_handler(self.log)
+        atexit.unregister(self.close)
@@ -0,0 +1,101 @@
+import logging
+from time import perf_counter
+
+from .Tracer import tracer
+
+
+class FrameProvider:
+    """
+    Captures the game window once per "tick" and hands out views of that frame.
+
+    Every vision helper asks the provider for pixels instead of grabbing the screen
+    itself. The frame is kept until an input action invalidates it (or it gets older
+    than `max_age` seconds), so several lookups between two inputs share one capture.
+
+    Frames are contiguous BGR uint8 arrays, the layout OpenCV expects, written by the
+    capture backend into reusable buffers. Views stay valid for one more capture; copy
+    anything that has to live longer.
+    """
+
+    def __init__(self, window_manager, backend, max_age=0.5):
+        self.window_manager = window_manager
+        self.backend = backend
+        self.max_age = max_age
+
+        self._frame = None
+        self._origin = (0, 0)
+        self._captured_at = 0.0
+
+        self.captures = 0
+        self.hits = 0
+        # Changes whenever the current frame does, so results derived from a frame can be cached
+        self.generation = 0
+        # A SessionRecorder that gets every captured frame, see SessionRecorder.attach
+        self.recorder = None
+        # A FlightRecorder keeping the last frames in memory for failure dumps
+        self.flight_recorder = None
+
+    def invalidate(self):
+        """Drops the cached frame so the next request captures a new one."""
+        self._frame = None
+        self.generation += 1
+
+    def _capture(self):
+        box = self.window_manager.capture_box()
+        with tracer.span("capture", "capture"):
+            self._frame = self.backend.grab(box)
+        self._origin = (box[0], box[1]) if box else (0, 0)
+        self._captured_at = perf_counter()
+        self.generation += 1
+        self.captures += 1
+        logging.debug("Captured frame %dx%d at %s", self._frame.shape[1], self._frame.shape[0], self._origin)
+        if self.recorder is not None:
+            self.recorder.frame(self._frame, self._origin)
+        if self.flight_recorder is not None:
+            self.flight_recorder.frame(self._frame, self._origin)
+
+    def use(self, frame, origin):
+        """Makes a frame that was not captured, e.g. a recorded one, the current frame."""
+        self._frame = frame
+        self._origin = tuple(origin)
+        self._captured_at = perf_counter()
+        self.generation += 1
+
+    def get_frame(self):
+        """
+        Returns the current frame (BGR array), capturing it only if needed.
+        """
+        if self._frame is None or perf_counter() - self._captured_at > self.max_age:
+            self._capture()
+        else:
+            self.hits += 1
+        return self._frame
+
+    @property
+    def origin(self):
+        """Screen coordinates of the top-left pixel of the current frame."""
+        return self._origin
+
+    def get_region(self, bounding_box=None):
+        """
+        Returns a zero-copy view of a screen region of the current frame.
+
+        Args:
+            bounding_box: A tuple (left, top, right, bottom) in screen coordinates.
+                None returns the whole frame.
+
+        Returns:
+            A tuple (view, (left, top)) where (left, top) are the screen coordinates of
+            the view's top-left pixel after clipping to the frame.
+        """
+        frame = self.get_frame()
+        if bounding_box is None:
+            return frame, self._origin
+
+        ox, oy = self._origin
+        height, width = frame.shape[:2]
+        left = min(max(int(bounding_box[0]) - ox, 0), width)
+        top = min(max(int(bounding_box[1]) - oy, 0), height)
+        right = min(max(int(bounding_box[2]) - ox, left), width)
+        bottom = min(max(int(bounding_box[3]) - oy, top), height)
+        return frame[top:bottom, left:right], (left + ox, top + oy)
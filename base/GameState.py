@@ -0,0 +1,197 @@
+from time import perf_counter
+
+import numpy as np
+
+from .ColorSearch import parse_color
+from .Tracer import tracer
+
+# Which GUI counts as open when several probes match, most specific first
+GUI_ORDER = ("egg_prompt", "gear_shop", "gear_dialog", "sell_dialog", "backpack", "settings")
+
+
+class GameState:
+    """
+    What one frame shows, as decided by every detector at once. Detector values are
+    attributes, e.g. state.gui, state.follow_camera, state.buy_button.
+    """
+
+    __slots__ = ("values", "generation", "elapsed")
+
+    def __init__(self, values, generation, elapsed):
+        self.values = values
+        self.generation = generation
+        self.elapsed = elapsed
+
+    def __getattr__(self, name):
+        try:
+            return self.values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={value!r}" for name, value in self.values.items())
+        return f"GameState({values})"
+
+
+class StateReader:
+    """
+    Builds GameState snapshots from the FrameProvider's current frame.
+
+    Color probes (a box, an expected color and the share of its pixels that must
+    match) are precomputed once per calibration into one array of flat pixel indices
+    with per-pixel color bounds, so all of them are evaluated with a single gather,
+    one vectorized bounds check and one np.add.reduceat. Template probes run
+    matchTemplate in their own small box. The snapshot is cached until the frame is
+    invalidated by the next input.
+
+    Probes come from "game_state" in config.json; each has a "kind" ("color" or
+    "template") and a place: "region" (a region name), "box" ([left, top, right,
+    bottom] in client coordinates) or "element" with "size" ([half width, half
+    height] around a game_elements entry).
+
+    A probe is only "calibrated" once its color or template has been checked against
+    the real game. Routines that would skip work on a detector's word check
+    trusted(name) first and keep doing it unconditionally while it is false.
+    """
+
+    def __init__(self, window_manager, probes=None, stride=2):
+        """
+        Args:
+            window_manager: Gives the frames, the coordinate mapping and templates.
+            probes: name -> probe settings, see the class docstring.
+            stride: Only every stride-th pixel in both directions of a color probe's
+                box is checked, unless the probe has a "stride" of its own.
+        """
+        self.window_manager = window_manager
+        self.probes = probes or {}
+        self.stride = stride
+        self.detectors = {}
+        self.detector_probes = {}
+        self._layout = None
+        self._layout_key = None
+        self._cached = None
+        self.snapshots = 0
+        self.hits = 0
+
+        self.register("gui", lambda probes: next((name for name in GUI_ORDER if probes.get(name)), None), GUI_ORDER)
+        for name in ("follow_camera", "money_visible", "buy_button", "recall_wrench_in_hotbar"):
+            self.register(name, lambda probes, name=name: bool(probes.get(name)), (name,))
+
+    def register(self, name, detector, probes=()):
+        """
+        Adds a detector: a callable taking {probe name: bool} for the current frame and
+        returning the value snapshots get under `name`. `probes` are the probes it
+        reads, which decide whether it is trusted.
+        """
+        self.detectors[name] = detector
+        self.detector_probes[name] = tuple(probes)
+        self._cached = None
+
+    def trusted(self, name):
+        """True if every probe the detector `name` reads is configured and calibrated."""
+        return all(self.probes.get(probe, {}).get("calibrated", False) for probe in self.detector_probes.get(name, ()))
+
+    def screen_box(self, probe):
+        """The screen box a probe looks at."""
+        window_manager = self.window_manager
+        if "region" in probe:
+            return window_manager.resolve_region(probe["region"])
+        if "element" in probe:
+            x, y = window_manager.config["game_elements"][probe["element"]]
+            width, height = probe.get("size", (10, 10))
+            box = (x - width, y - height, x + width, y + height)
+        else:
+            box = probe["box"]
+        left, top = window_manager.to_screen(box[0], box[1])
+        right, bottom = window_manager.to_screen(box[2], box[3])
+        return (left, top, right, bottom)
+
+    def _frame_box(self, probe, origin, shape):
+        left, top, right, bottom = self.screen_box(probe)
+        ox, oy = origin
+        height, width = shape[:2]
+        return (
+            min(max(left - ox, 0), width),
+            min(max(top - oy, 0), height),
+            min(max(right - ox, 0), width),
+            min(max(bottom - oy, 0), height),
+        )
+
+    def _build_layout(self, origin, shape):
+        """Flat pixel indices and color bounds of every color probe, plus template boxes."""
+        indices, lower, upper, starts, names, thresholds = [], [], [], [], [], []
+        templates = []
+        width = shape[1]
+        offset = 0
+        for name, probe in self.probes.items():
+            left, top, right, bottom = self._frame_box(probe, origin, shape)
+            if probe.get("kind", "color") == "template":
+                templates.append((name, probe, (left, top, right, bottom)))
+                continue
+            stride = probe.get("stride", self.stride)
+            ys, xs = np.mgrid[top:bottom:stride, left:right:stride]
+            flat = (ys * width + xs).ravel()
+            if flat.size == 0:
+                continue
+            r, g, b = parse_color(probe["color"])
+            tolerance = probe.get("tolerance", 10)
+            target = np.array([b, g, r], dtype=np.int16)
+            indices.append(flat)
+            lower.append(np.broadcast_to(np.clip(target - tolerance, 0, 255), (flat.size, 3)))
+            upper.append(np.broadcast_to(np.clip(target + tolerance, 0, 255), (flat.size, 3)))
+            starts.append(offset)
+            names.append(name)
+            thresholds.append(probe.get("min_fraction", 0.5) * flat.size)
+            offset += flat.size
+
+        if indices:
+            return {
+                "indices": np.concatenate(indices),
+                "lower": np.concatenate(lower).astype(np.uint8),
+                "upper": np.concatenate(upper).astype(np.uint8),
+                "starts": np.array(starts),
+                "names": names,
+                "thresholds": np.array(thresholds),
+                "templates": templates,
+            }
+        return {"indices": None, "names": [], "templates": templates}
+
+    def _evaluate(self, frame, origin):
+        wm = self.window_manager
+        key = (origin, frame.shape, wm.xOffset, wm.yOffset, wm.scale)
+        if key != self._layout_key:
+            self._layout = self._build_layout(origin, frame.shape)
+            self._layout_key = key
+        layout = self._layout
+
+        probes = {}
+        if layout["indices"] is not None:
+            pixels = frame.reshape(-1, 3)[layout["indices"]]
+            inside = np.all((pixels >= layout["lower"]) & (pixels <= layout["upper"]), axis=1)
+            counts = np.add.reduceat(inside.astype(np.int32), layout["starts"])
+            probes.update(zip(layout["names"], (counts >= layout["thresholds"]).tolist()))
+
+        for name, probe, (left, top, right, bottom) in layout["templates"]:
+            view = frame[top:bottom, left:right]
+            match = wm.templates.locate(
+                probe["template"], view, (origin[0] + left, origin[1] + top), confidence=probe.get("confidence", 0.9)
+            )
+            probes[name] = match is not None
+        return probes
+
+    @tracer.traced("match", "game state")
+    def snapshot(self):
+        """The GameState of the current frame, evaluated once per frame."""
+        frames = self.window_manager.frames
+        frame = frames.get_frame()
+        if self._cached is not None and self._cached.generation == frames.generation:
+            self.hits += 1
+            return self._cached
+
+        started = perf_counter()
+        probes = self._evaluate(frame, frames.origin)
+        values = {name: detector(probes) for name, detector in self.detectors.items()}
+        values["probes"] = probes
+        self.snapshots += 1
+        self._cached = GameState(values, frames.generation, perf_counter() - started)
+        return self._cached
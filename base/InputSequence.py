@@ -0,0 +1,223 @@
+import logging
+import queue
+import sys
+import threading
+from collections import deque, namedtuple
+from time import perf_counter
+
+import pyautogui
+import pydirectinput
+
+from .Tracer import sleep
+
+
+class InputEvent(namedtuple("InputEvent", ["at", "action", "args"])):
+    """One input, sent `at` seconds after the sequence starts."""
+
+    __slots__ = ()
+
+
+class InputSequence:
+    """
+    A list of mouse and keyboard inputs with exact timings, built up front and then
+    played by an InputPlayer.
+
+    Every input is scheduled `gap` seconds after the previous one, the role the global
+    pydirectinput.PAUSE used to play. Because the timing is part of the sequence, a
+    fast part (a mouse curve) and a slow part (menu navigation) no longer need the
+    global pause changed in between, and eased curves are computed once, not per call.
+    """
+
+    def __init__(self, gap=0.05):
+        self.gap = gap
+        self.events = []
+        self.duration = 0.0
+
+    def __repr__(self):
+        return f"InputSequence({len(self.events)} events, {self.duration:.3f}s)"
+
+    def __len__(self):
+        return len(self.events)
+
+    def _add(self, action, *args):
+        self.events.append(InputEvent(self.duration, action, args))
+        self.duration += self.gap
+        return self
+
+    def wait(self, seconds):
+        """Delays the next input by `seconds` on top of the gap."""
+        self.duration += seconds
+        return self
+
+    def move_to(self, x, y):
+        return self._add("move_to", int(x), int(y))
+
+    def move_rel(self, dx, dy):
+        return self._add("move_rel", int(dx), int(dy))
+
+    def click(self, button="left"):
+        return self._add("click", button)
+
+    def mouse_down(self, button="left"):
+        return self._add("mouse_down", button)
+
+    def mouse_up(self, button="left"):
+        return self._add("mouse_up", button)
+
+    def key_down(self, key):
+        return self._add("key_down", key)
+
+    def key_up(self, key):
+        return self._add("key_up", key)
+
+    def press(self, key):
+        return self._add("press", key)
+
+    def scroll(self, clicks):
+        return self._add("scroll", int(clicks))
+
+    def extend(self, other):
+        """Appends another sequence, keeping its relative timings."""
+        start = self.duration
+        self.events.extend(event._replace(at=start + event.at) for event in other.events)
+        self.duration = start + other.duration
+        return self
+
+    def click_at(self, x, y, clicks=1, nudge=None):
+        """
+        Moves to screen (x, y) and clicks. On Windows the cursor is nudged by a pixel
+        and back first so Roblox registers the new position.
+        """
+        if nudge is None:
+            nudge = sys.platform == "win32"
+        self.move_to(x, y)
+        if nudge:
+            self.move_rel(1, 1).move_rel(-1, -1)
+        for _ in range(clicks):
+            self.click()
+        return self
+
+    def drag(self, start_x, start_y, end_x, end_y, hold=0.1):
+        """Presses at the start point, moves to the end point and releases."""
+        return (
+            self.move_to(start_x, start_y).wait(hold)
+            .mouse_down().wait(hold)
+            .move_to(end_x, end_y).wait(hold)
+            .mouse_up()
+        )
+
+    def eased_move_rel(self, dx, dy, steps, easing):
+        """
+        Relative moves growing along an easing curve: step i moves by
+        (dx, dy) * easing(i / steps), for i = 1 .. steps - 1.
+        """
+        for i in range(1, steps):
+            t = easing(i / steps)
+            self.move_rel(int(dx * t), int(dy * t))
+        return self
+
+
+class InputPlayer:
+    """
+    Plays InputSequences on a dedicated thread, starting every event at its scheduled
+    time: it sleeps until shortly before and busy-waits the last `spin` seconds. How
+    late each event actually went out is recorded as timing jitter: count, total and
+    worst over the whole run, and the last `samples` values for the p95.
+    """
+
+    def __init__(self, spin=0.002, samples=1000):
+        self.spin = spin
+        self._queue = queue.Queue()
+        self._thread = None
+        # Lateness in seconds, a macro running for days must not keep every event
+        self.lateness = deque(maxlen=samples)
+        self.events = 0
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+        self.sequences = 0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="input-player", daemon=True)
+            self._thread.start()
+
+    def play(self, sequence, wait=True):
+        """
+        Plays a sequence. Blocks until it has been sent unless `wait` is False;
+        errors while sending are raised in the caller.
+        """
+        self._ensure_thread()
+        done = threading.Event()
+        job = {"sequence": sequence, "done": done, "error": None}
+        self._queue.put(job)
+        if wait:
+            done.wait()
+            if job["error"] is not None:
+                raise job["error"]
+        return done
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._play(job["sequence"])
+            except Exception as e:
+                logging.error(f"Input sequence failed: {e}")
+                job["error"] = e
+            finally:
+                job["done"].set()
+
+    def _play(self, sequence):
+        started = perf_counter()
+        for event in sequence.events:
+            target = started + event.at
+            while True:
+                remaining = target - perf_counter()
+                if remaining <= 0:
+                    break
+                if remaining > self.spin:
+                    sleep(remaining - self.spin)
+            late = perf_counter() - target
+            self.lateness.append(late)
+            self.events += 1
+            self.total_lateness += late
+            self.max_lateness = max(self.max_lateness, late)
+            self._send(event.action, event.args)
+        self.sequences += 1
+
+    def _send(self, action, args):
+        # Looked up on every event so the simulator can swap the input modules
+        mouse = pydirectinput if sys.platform == "win32" else pyautogui
+        if action == "move_to":
+            mouse.moveTo(*args, _pause=False)
+        elif action == "move_rel":
+            pydirectinput.moveRel(*args, _pause=False)
+        elif action == "click":
+            mouse.click(button=args[0], _pause=False)
+        elif action == "mouse_down":
+            mouse.mouseDown(button=args[0], _pause=False)
+        elif action == "mouse_up":
+            mouse.mouseUp(button=args[0], _pause=False)
+        elif action == "key_down":
+            pydirectinput.keyDown(args[0], _pause=False)
+        elif action == "key_up":
+            pydirectinput.keyUp(args[0], _pause=False)
+        elif action == "press":
+            pydirectinput.press(args[0], _pause=False)
+        elif action == "scroll":
+            pyautogui.scroll(args[0], _pause=False)
+        else:
+            raise ValueError(f"Unknown input action '{action}'")
+
+    def report(self):
+        """Returns a one-line summary of how late events went out."""
+        if not self.events:
+            return "Input player: nothing played"
+        late = sorted(self.lateness)
+        mean = self.total_lateness / self.events
+        p95 = late[min(int(len(late) * 0.95), len(late) - 1)]
+        return (
+            f"Input player: {self.sequences} sequences, {self.events} events, lateness "
+            f"mean {mean * 1000:.3f}ms, p95 of the last {len(late)} {p95 * 1000:.3f}ms, "
+            f"max {self.max_lateness * 1000:.3f}ms"
+        )
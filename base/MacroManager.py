@@ -1,29 +1,34 @@
-from datetime import datetime
 import logging
-import cv2
-import numpy as np
 import pyautogui
 import pydirectinput
 from pytweening import easeOutCirc
 import sys
-from time import sleep
-import json
 import os
 import functools
+from contextlib import nullcontext
 from .WindowManager import WindowManager
-import pygetwindow as gw
-from PIL import ImageGrab
-
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+from .Config import load_config
+from . import Conditions
+from .CameraAlignment import CameraAligner
+from .FlightRecorder import FlightRecorder, install_queue_logging
+from .InputSequence import InputPlayer, InputSequence
+from .SessionRecorder import SessionRecorder
+from .ShopReader import BLIND_CLICKS, ShopReader
+from .ShopScanner import ShopScanner
+from .Tracer import sleep, tracer
+from .Watchdog import Watchdog
+
+install_queue_logging(logging.DEBUG)
+
+# Looking up in small relative moves along an easing curve, a genius way of bypassing
+# what I think is Roblox trying to prevent robotic mouse movement. Compiled once.
+LOOK_UP = InputSequence(gap=0.002).eased_move_rel(0, 200, 100, easeOutCirc)
 
 def ensure_roblox_active(func):
     """
     A decorator to ensure the 'Roblox' window is active before executing the decorated function.
-    Attempts to activate 'Roblox' if it's not currently active.
+    Focus is read from the WindowWatcher's cached state; while the window is not active
+    the call waits for it to come back instead of ending the macro.
     """
     @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
@@ -34,32 +39,71 @@ def ensure_roblox_active(func):
             logging.error("No Roblox window found in instance")
             return False
         
-        is_active = gw.getActiveWindow() == roblox_window
-        if not is_active:
-            window_title = getattr(roblox_window, 'title', 'Roblox')
-            logging.info(
-                f"Pre-check: Window '{window_title}' is NOT active for '{func.__name__}'."
-            )
-            exit()
+        with self.input_slot():
+            if not self.window_manager.watcher.ensure_focus(func.__name__, self.input_released):
+                return False
+
+            logging.debug("Executing '%s' for Roblox window...", func.__name__)
+            return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+def invalidates_frame(func):
+    """
+    A decorator for input actions. Once the input has been sent the cached frame no
+    longer matches the screen, so the next vision call has to capture a new one.
+    The input is also logged to the session recorder, if one is attached, and timed
+    as an "input" span while tracing. With several game instances the input is sent
+    while holding the shared input lock.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        recorder = self.window_manager.frames.recorder
+        if recorder is not None:
+            recorder.input(func.__name__, args, kwargs)
+        try:
+            with self.input_slot(), tracer.span(func.__name__, "input"):
+                return func(self, *args, **kwargs)
+        finally:
+            self.window_manager.frames.invalidate()
+
+    return wrapper
 
-        logging.debug(f"Executing '{func.__name__}' for Roblox window...")
-        return func(self, *args, **kwargs)
+
+def watched(func):
+    """
+    A decorator for GameActions routines that can get stuck: the routine runs under
+    the Watchdog, which recovers and retries it when a step raises StuckError.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        return self.watchdog.run(func.__name__, lambda: func(self, *args, **kwargs))
 
     return wrapper
 
 
 class GAGMacro:
-    def __init__(self, config_path="config.json"):
+    def __init__(self, config_path="config.json", config=None):
         self.os_name = sys.platform
         self.asset_path = os.path.join("templates")
-        self.config = self._load_config(config_path)
+        self.config = config if config is not None else self._load_config(config_path)
 
         pyautogui.PAUSE = (
             0  # Removing the built-in delay completely bcs we won't use this for inputs
         )
         pydirectinput.PAUSE = 0.05  # Lowering the built-in delay, but leaving a small one so the clicks and movements register
 
-        self.window_manager = WindowManager(config_path)
+        self.window_manager = WindowManager(config_path, config=self.config)
+        # Plays compiled InputSequences on its own timing thread
+        self.input_player = InputPlayer(**self.config.get("input_player", {}))
+        self.templates = self.window_manager.templates
+        self.wait_log = []
+        self.recorder = None
+        # The Orchestrator's InputLock when this is one of several instances
+        self.input_lock = None
+        self.flight_recorder = FlightRecorder(**self.config.get("flight_recorder", {}))
+        self.window_manager.frames.flight_recorder = self.flight_recorder
         self.game_actions = GameActions(self)
 
     def _load_config(self, config_path):
@@ -67,81 +111,70 @@ class GAGMacro:
         Load configuration from a JSON file.
         """
         try:
-            with open(config_path, "r") as f:
-                return json.load(f)
+            return load_config(config_path)
         except Exception as e:
             print(f"Error loading config: {e}")
-            return {}
+            raise
 
+    @tracer.traced()
     @ensure_roblox_active
+    @invalidates_frame
     def click(self, x, y):
         """
         Clicks at x, y in CLIENT coordinates (ignores window title bar and border).
         """
         # convert to client coordinates
-        x = x + self.window_manager.xOffset
-        y = y + self.window_manager.yOffset
-        if self.os_name == "win32":
-            pydirectinput.moveTo(x, y)
-            pydirectinput.moveRel(1, 1)
-            pydirectinput.moveRel(-1, -1)
-            pydirectinput.click()
-        else:
-            pyautogui.moveTo(x, y)
-            pyautogui.click()
+        x, y = self.window_manager.to_screen(x, y)
+        self.input_player.play(InputSequence().click_at(x, y))
     
+    @tracer.traced()
     @ensure_roblox_active
+    @invalidates_frame
     def click_abs(self, x, y, clicks=1):
         """
-        Clicks at x, y in CLIENT coordinates (ignores window title bar and border).
+        Clicks at x, y in SCREEN coordinates, e.g. a match position.
         """
-        if self.os_name == "win32":
-            pydirectinput.moveTo(x, y)
-            pydirectinput.moveRel(1, 1)
-            pydirectinput.moveRel(-1, -1)
-            for _ in range(clicks):
-                pydirectinput.click()
-        else:
-            pyautogui.moveTo(x, y)
-            pyautogui.click()
+        self.input_player.play(InputSequence().click_at(x, y, clicks=clicks))
 
-    @ensure_roblox_active
     def move(self, x, y):
         """
-        Clicks at x, y in CLIENT coordinates (ignores window title bar and border).
+        Moves the mouse to x, y in CLIENT coordinates (ignores window title bar and border).
         """
-        # convert to client coordinates
-        x = x + self.window_manager.xOffset
-        y = y + self.window_manager.yOffset
+        self.move_abs(*self.window_manager.to_screen(x, y))
+
+    @tracer.traced()
+    @ensure_roblox_active
+    @invalidates_frame
+    def move_abs(self, x, y):
+        """
+        Moves the mouse to x, y in SCREEN coordinates.
+        """
+        sequence = InputSequence().move_to(x, y)
         if self.os_name == "win32":
-            pydirectinput.moveTo(x, y)
-            pydirectinput.moveRel(1, 1)
-            pydirectinput.moveRel(-1, -1)
-        else:
-            pyautogui.moveTo(x, y)
+            sequence.move_rel(1, 1).move_rel(-1, -1)
+        self.input_player.play(sequence)
 
+    @tracer.traced()
     @ensure_roblox_active
+    @invalidates_frame
     def drag(self, start_x, start_y, end_x, end_y):
         """
         Drags the mouse from (start_x, start_y) to (end_x, end_y) in CLIENT coordinates.
         """
         # convert to client coordinates
-        start_x += self.window_manager.xOffset
-        start_y += self.window_manager.yOffset
-        end_x += self.window_manager.xOffset
-        end_y += self.window_manager.yOffset
+        start_x, start_y = self.window_manager.to_screen(start_x, start_y)
+        end_x, end_y = self.window_manager.to_screen(end_x, end_y)
+        self.input_player.play(InputSequence().drag(start_x, start_y, end_x, end_y))
 
-        if self.os_name == "win32":
-            pydirectinput.moveTo(start_x, start_y)
-            sleep(0.1)
-            pydirectinput.mouseDown(button="left")
-            sleep(0.1)
-            pydirectinput.moveTo(end_x, end_y)
-            sleep(0.1)
-            pydirectinput.mouseUp(button="left")
-        else:
-            pyautogui.moveTo(start_x, start_y)
-            pyautogui.dragTo(end_x, end_y)
+    @tracer.traced()
+    @ensure_roblox_active
+    @invalidates_frame
+    def play(self, sequence):
+        """
+        Sends a compiled InputSequence, in screen coordinates, with its own timings
+        instead of pydirectinput.PAUSE between inputs.
+        """
+        self.input_player.play(sequence)
 
     @ensure_roblox_active
     def click_center(self):
@@ -154,13 +187,14 @@ class GAGMacro:
             print("Error: Could not get center coordinates")
             return False
 
+        # Window coordinates are on the screen already, to_screen would scale them again
         center_x, center_y = coordinates
-        self.click(center_x, center_y)
+        self.click_abs(center_x, center_y)
         return True
     
     def move_center(self):
         """
-        Clicks the center of the current window.
+        Moves the mouse to the center of the current window.
         """
 
         coordinates = self.window_manager.get_center_coordinates()
@@ -169,30 +203,88 @@ class GAGMacro:
             return False
 
         center_x, center_y = coordinates
-        self.move(center_x, center_y)
+        self.move_abs(center_x, center_y)
         return True
     
-    def click_color(self, hex, clicks=1):
-        hex = hex.lstrip("#")
-        rgb = tuple(int(hex[i : i + 2], 16) for i in (0, 2, 4))
+    @invalidates_frame
+    def press(self, key):
+        """
+        Presses and releases a key.
+        """
+        pydirectinput.press(key)
 
-        # Take a screenshot of the entire screen
-        screenshot = ImageGrab.grab()
-        screenshot_np = np.array(screenshot)
+    @invalidates_frame
+    def key_down(self, key):
+        pydirectinput.keyDown(key)
 
-        # Convert the screenshot to RGB format
-        screenshot_rgb = cv2.cvtColor(screenshot_np, cv2.COLOR_BGR2RGB)
+    @invalidates_frame
+    def key_up(self, key):
+        pydirectinput.keyUp(key)
 
-        # Find all pixels that match the target color
-        matching_pixels = np.where(np.all(screenshot_rgb == rgb, axis=-1))
+    @invalidates_frame
+    def write(self, text):
+        """
+        Types a string one key at a time.
+        """
+        pydirectinput.write(text)
 
-        if matching_pixels[0].size > 0:
-            # Click the first matching pixel
-            x, y = matching_pixels[1][0], matching_pixels[0][0]
-            print(f"Found color {hex} at ({x}, {y}). Clicking...")
-            
-            self.click_abs(x, y, clicks=clicks)
+    @invalidates_frame
+    def scroll(self, clicks):
+        """
+        Scrolls wherever the mouse currently is, see scroll_center.
+        """
+        pyautogui.scroll(clicks)
+
+    def scroll_center(self, clicks):
+        """
+        Moves the mouse to the center of the window and scrolls there, without another
+        instance moving the mouse in between.
+        """
+        with self.input_slot():
+            if not self.move_center():
+                return False
+            self.scroll(clicks)
+        return True
 
+    @invalidates_frame
+    def move_rel(self, x, y):
+        """
+        Moves the mouse relative to its current position (used to turn the camera).
+        """
+        pydirectinput.moveRel(x, y)
+
+    @invalidates_frame
+    def mouse_click(self, button="left"):
+        """
+        Clicks wherever the mouse currently is.
+        """
+        pydirectinput.click(button=button)
+
+    @tracer.traced()
+    def click_color(self, hex, clicks=1, region=None, tolerance=0):
+        """
+        Clicks the middle of the largest patch of a color.
+
+        Args:
+            hex: The color, e.g. "26ee26".
+            clicks: How many times to click it.
+            region: A region name from config.json or a (left, top, right, bottom) box.
+                Defaults to the whole window.
+            tolerance: Allowed difference per channel, an int or an (r, g, b) tuple.
+
+        Returns:
+            bool: True if the color was found and clicked, False otherwise.
+        """
+        hex = hex.lstrip("#")
+        blob = self.window_manager.colors.find_largest(hex, region=region, tolerance=tolerance)
+
+        if blob:
+            print(f"Found color {hex} at {blob.center} ({blob.area} px). Clicking...")
+            self.click_abs(*blob.center, clicks=clicks)
+            return True
+        return False
+
+    @tracer.traced()
     def click_image(self, image_name, confidence=0.9, debug_string=None):
             """
             Finds and clicks the center of a given image on the screen.
@@ -201,67 +293,125 @@ class GAGMacro:
             Returns:
                 bool: True if the image was found and clicked, False otherwise.
             """
-            image_path = os.path.join(self.asset_path, image_name)
-            if not os.path.exists(image_path):
-                logging.error(f"Image asset not found at '{image_path}'")
+            if image_name not in self.templates:
+                logging.error(f"Image asset not found at '{os.path.join(self.asset_path, image_name)}'")
                 return False
 
-            try:
-                # The region to search in
-                search_region = self.window.box if self.window else None
+            frame, origin = self.window_manager.frames.get_region()
+            match = self.templates.locate(image_name, frame, origin, confidence=confidence)
 
-                location = pyautogui.locateCenterOnScreen(
-                    image_path, confidence=confidence, region=search_region
-                )
+            if match:
+                logging.info(f"Found '{image_name}' at {match.center} (score {match.score:.3f}). Clicking...")
+                self.click_abs(*match.center)
+                return True
 
-                if location:
-                    logging.info(f"Found '{image_name}' at {location}. Clicking...")
-                    self.click_abs(*location)
-                    return True
-                else:
-                    logging.warning(f"Could not find '{image_name}' on screen with confidence {confidence}.")
-                    
-                    if debug_string:
-                        try:
-                            screenshot = pyautogui.screenshot(region=search_region)
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            filename = f"{debug_string}_{image_name}_{timestamp}.png"
-                            screenshot.save(os.path.join("debug", filename))
-                            logging.info(f"Saved debug screenshot to '{filename}'")
-                        except Exception as e:
-                            logging.error(f"Failed to save debug screenshot: {e}")
-                    
-                    return False
-
-            except pyautogui.PyAutoGUIException as e:
-                logging.info(f"Could not find '{image_name}'")
-                return False
+            logging.warning(f"Could not find '{image_name}' on screen with confidence {confidence}.")
+
+            if debug_string:
+                # Written on the flight recorder's thread, with the frames leading up to the miss
+                self.flight_recorder.dump(f"{debug_string}_{image_name}")
+
+            return False
 
+    @tracer.traced()
     def find_image(self, image_name, confidence=0.9):
         """
         Checks if an image is on the screen.
         """
 
-        if not os.path.exists(image_name):
+        if image_name not in self.templates:
             print(f"Error: Image asset not found at '{image_name}'")
             return False
 
-        try:
-            pyautogui.locateOnScreen(
-                image_name, confidence=confidence, region=self.window.box if self.window else None
-            )
-            # If above succeeds, we can just return True, since it returns an exeption if it fails
-            return True
-        except pyautogui.ImageNotFoundException:
-            return False
-        except pyautogui.PyAutoGUIException as e:
-            print(f"Error during image search. Details: {e}")
+        frame, origin = self.window_manager.frames.get_region()
+        return self.templates.locate(image_name, frame, origin, confidence=confidence) is not None
+
+    @tracer.traced()
+    def find_images(self, image_names, confidence=0.9, region=None):
+        """
+        Looks for several images in the same frame.
+
+        Returns:
+            dict: Maps each image name to its Match, or None if it is not on screen.
+        """
+        frame, origin = self.window_manager.frames.get_region(region)
+        return self.templates.locate_many(image_names, frame, origin, confidence=confidence)
+
+    @tracer.traced()
+    def wait_until(self, condition, timeout, poll_interval=0.05, label=None):
+        """
+        Waits until `condition` (see base.Conditions) is met or `timeout` seconds pass,
+        checking a freshly captured frame on every poll. Use the old fixed delay as the
+        timeout so a missed detection is never slower than before.
+
+        Returns:
+            bool: True if the condition was met, False on timeout.
+        """
+        result = Conditions.wait_until(
+            condition, timeout, poll_interval, frames=self.window_manager.frames, label=label
+        )
+        self.wait_log.append(result)
+        return result.ok
+
+    def wait_report(self):
+        """
+        Returns a printable table of time actually waited vs. the old fixed delay per step.
+        """
+        lines = [f"{'step':<32}{'count':>6}{'waited':>9}{'fixed':>9}{'saved':>9}"]
+        steps = {}
+        for result in self.wait_log:
+            count, waited, fixed = steps.get(result.label, (0, 0.0, 0.0))
+            steps[result.label] = (count + 1, waited + result.waited, fixed + result.fixed_delay)
+        for label, (count, waited, fixed) in steps.items():
+            lines.append(f"{label:<32}{count:>6}{waited:>8.2f}s{fixed:>8.2f}s{fixed - waited:>8.2f}s")
+        return "\n".join(lines)
+
+    def start_recording(self, path):
+        """
+        Records every frame, input and vision result from now on to the folder `path`,
+        to be replayed offline with base.SessionRecorder.SessionReplay.
+        """
+        self.recorder = SessionRecorder(path).attach(self.window_manager)
+        logging.info(f"Recording session to '{path}'")
+        return self.recorder
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.detach(self.window_manager)
+            self.recorder.close()
+            self.recorder = None
+
+    def close(self):
+        """Stops recording and every background thread the macro started."""
+        self.stop_recording()
+        self.window_manager.close()
+        self.flight_recorder.close()
 
-    def setup_window(self):
+    def input_slot(self):
+        """
+        A context manager holding the mouse and keyboard for this instance: takes the
+        shared input lock and focuses this window when running next to other instances,
+        does nothing otherwise. Wrap inputs that must not be interleaved with another
+        window's, e.g. holding a key down while sleeping.
+        """
+        if self.input_lock is None:
+            return nullcontext()
+        return self.input_lock.hold()
+
+    def input_released(self):
+        """
+        A context manager giving the input lock up while waiting inside input_slot(),
+        so a paused instance doesn't hold the other ones up.
+        """
+        if self.input_lock is None:
+            return nullcontext()
+        return self.input_lock.released()
+
+    def setup_window(self, index=0, position=(0, 0), handle=None):
         """
         Sets up the window using the WindowManager.
         """
-        success = self.window_manager.setup_window()
+        success = self.window_manager.setup_window(index, position, handle)
         if success:
             # Store a reference to the window for convenience
             self.window = self.window_manager.window
@@ -279,7 +429,37 @@ class GameActions:
         self.regions = self.macro.config.get("regions", {})
         self.shop_items = self.macro.config.get("shop_items", {})
         self.window_manager = self.macro.window_manager
+        self.shop_scanners = {}
+        self.text_matcher = self.window_manager.text_matcher
+        gear_shop = self.macro.config.get("shops", {}).get("gear", {})
+        self.shop_reader = ShopReader(
+            self.window_manager,
+            gear_shop.get("row_height", 60),
+            self.macro.config.get("money_template", "big_money.png"),
+        )
+        self.clicks_saved = 0
+        self.camera_settings = self.macro.config.get("camera_alignment", {})
+        self.camera_aligner = CameraAligner(self.macro, self.camera_settings)
+        self.watchdog = Watchdog(self, **self.macro.config.get("watchdog", {}))
+
+    def get_shop_scanner(self, shop_name):
+        """
+        Returns the ShopScanner for a shop configured under "shops" in config.json.
+        """
+        if shop_name not in self.shop_scanners:
+            shop = self.macro.config.get("shops", {}).get(shop_name, {})
+            self.shop_scanners[shop_name] = ShopScanner(
+                self.macro,
+                shop_name,
+                shop.get("region", [0, 0, 800, 600]),
+                self.text_matcher,
+                shop.get("catalog", shop_name),
+                scroll_step=shop.get("scroll_step", -116),
+                index_path=self.macro.config.get("shop_index_path", "cache/shop_index.json"),
+            )
+        return self.shop_scanners[shop_name]
 
+    @tracer.traced("routine")
     def goto_seeds(self):
         """
         Navigates to the Seed shop.
@@ -287,6 +467,7 @@ class GameActions:
         seed_coords = self.game_elements.get("seed_button")
         return self.macro.click(*seed_coords)
     
+    @tracer.traced("routine")
     def goto_gear_shop(self):
         """
         Navigates to the Gear shop.
@@ -294,15 +475,18 @@ class GameActions:
         keybinds = self.macro.config.get("keybinds", {})
         wrench_keybind = keybinds.get("recall_wrench", '2')
 
-        pydirectinput.press(wrench_keybind)
+        self.macro.press(wrench_keybind)
         sleep(0.5) 
 
         logging.info("Using recall wrench to teleport...")
-        self.macro.click_center() 
-        sleep(0.2) 
-        pydirectinput.click(button="left")
+        # The second click has to land where the first one moved the mouse
+        with self.macro.input_slot():
+            self.macro.click_center()
+            sleep(0.2)
+            self.macro.mouse_click(button="left")
         sleep(0.5) 
 
+    @tracer.traced("routine")
     def goto_garden(self):
         """
         Navigates to the Garden.
@@ -311,6 +495,7 @@ class GameActions:
         garden_coords = self.game_elements.get("garden_button")
         return self.macro.click(*garden_coords)
 
+    @tracer.traced("routine")
     def goto_sell(self):
         """
         Navigates to the Sell shop.
@@ -318,76 +503,105 @@ class GameActions:
         sell_coords = self.game_elements.get("sell_button")
         return self.macro.click(*sell_coords)
 
+    @tracer.traced("routine")
     def set_camera_and_settings(self):
         """
-        Consistently sets an optimal angle to walk around
-        """
+        Consistently sets an optimal angle to walk around.
+
+        The default, "camera_alignment": {"mode": "open_loop"}, plays the fixed recipe
+        below. With "closed_loop" and a "sky_color" measured on the real client the
+        camera is measured from the screen and each step repeats only until it is
+        right (see CameraAligner); when the closed loop can't see the sky it measures
+        by, the recipe is played instead.
+
+        Returns:
+            bool: False if a closed-loop step did not converge.
+        """
+        if self.camera_settings.get("mode", "open_loop") == "closed_loop":
+            aligned = self.camera_aligner.align()
+            if aligned is None:
+                print("Camera alignment can't measure the sky, using the fixed recipe")
+                self.macro.flight_recorder.dump("camera_alignment_no_sky")
+            else:
+                if aligned:
+                    print("Camera and settings complete!")
+                else:
+                    failed = [step.name for step in self.camera_aligner.steps if not step.converged]
+                    print(f"Camera alignment failed at: {', '.join(failed) or 'follow mode'}")
+                    self.macro.flight_recorder.dump("camera_alignment")
+                sleep(0.5)
+                return aligned
 
         def toggle_follow_mode():
-            pydirectinput.press("esc")
+            self.macro.press("esc")
             sleep(0.4)
-            pydirectinput.press("tab")
+            self.macro.press("tab")
             sleep(0.3)
-            pydirectinput.press("down")
+            self.macro.press("down")
             sleep(0.3)
-            pydirectinput.press("right")
+            self.macro.press("right")
             sleep(0.3)
-            pydirectinput.press("right")
+            self.macro.press("right")
             sleep(0.3)
-            pydirectinput.press("esc")
+            self.macro.press("esc")
 
-        self.macro.click_center()
-        pyautogui.scroll(1000000)  # Going first person
+        with self.macro.input_slot():
+            self.macro.click_center()
+            self.macro.scroll(1000000)  # Going first person
         sleep(0.2)
 
         # Looking up. (windows only)
-        pydirectinput.PAUSE = (
-            0.002  # Temporarely, because this part would be too slow otherwise
-        )
-        for i in range(1, 100):
-            pydirectinput.moveRel(
-                0, int(200 * easeOutCirc(i / 100))
-            )  # A fucking genius way of bypassing what I think is Roblox trying to prevent robotic mouse movement
-        pydirectinput.PAUSE = 0.05
+        self.macro.play(LOOK_UP)
 
         sleep(0.3)
-        pyautogui.scroll(-2500)  # Going third person
+        self.macro.scroll_center(-2500)  # Going third person
 
         toggle_follow_mode()
         sleep(0.5)
-        pyautogui.scroll(-3000)
+        self.macro.scroll_center(-3000)
         sleep(0.2)
-        pydirectinput.PAUSE = (
-            0  # Temporarely, because this part would be too slow otherwise
-        )
-        for i in range(0, 6):  # Abusing the follow camera mode to align the camera
-            self.goto_seeds()
-            sleep(0.05)
-            self.goto_sell()
-            sleep(0.05)
-        pydirectinput.PAUSE = 0.05
+        # Abusing the follow camera mode to align the camera
+        seeds = self.window_manager.to_screen(*self.game_elements.get("seed_button"))
+        sell = self.window_manager.to_screen(*self.game_elements.get("sell_button"))
+        align = InputSequence(gap=0)
+        for i in range(0, 6):
+            align.click_at(*seeds).wait(0.05).click_at(*sell).wait(0.05)
+        self.macro.play(align)
 
         toggle_follow_mode()
         print("Camera and settings complete!")
         sleep(0.5)
+        return True
 
+    @tracer.traced("routine")
+    @watched
     def sell_inventory(self):
         print("Selling inventory... ")
         self.goto_sell()
         sleep(0.2)
-        pydirectinput.press("e")
-        sleep(2)
+        # Only the dialog's buttons count, the world behind it keeps moving
+        dialog_open = Conditions.region_settled(self.window_manager, "sell_dialog", require_change=True)
+        dialog_open()  # Remember how the screen looks before talking to the NPC
+        self.macro.press("e")
+        self.watchdog.expect(self.macro.wait_until(dialog_open, 2, label="sell dialog open"), "sell dialog open")
         self.macro.click(*self.game_elements.get("sell_inventory"))
         sleep(1)
 
+    @tracer.traced("routine")
     def put_recall_wrench_in_hotbar(self):
         """
         Puts the recall wrench in the hotbar using pydirectinput.
 
         Opens the backpack (`), selects backpackSearchBar, types "recall" and
         presses enter, then drags the mouse from topLeftItemSlot to itemSlotTwo.
-        """
-        pydirectinput.press("`")  # Open the backpack
+        Does nothing if the wrench is in item slot two already, once the probe for it
+        is calibrated.
+        """
+        state = self.window_manager.state
+        if state.trusted("recall_wrench_in_hotbar") and state.snapshot().recall_wrench_in_hotbar:
+            logging.info("The recall wrench is in the hotbar already")
+            return
+        self.macro.press("`")  # Open the backpack
         sleep(0.5)
         self.macro.click(
             *self.game_elements.get("backpack_search_bar")
@@ -396,9 +610,9 @@ class GameActions:
             *self.game_elements.get("backpack_search_bar")
         ) 
         sleep(0.5)
-        pydirectinput.write("recall")  # Type the search term
+        self.macro.write("recall")  # Type the search term
         sleep(0.2)
-        pydirectinput.press("enter")  # Press enter to search
+        self.macro.press("enter")  # Press enter to search
         sleep(0.5)
 
         # Drag the recall wrench from the top left item slot to item slot two
@@ -407,9 +621,11 @@ class GameActions:
         sleep(0.5)
         self.macro.click_center()
         sleep(0.5)
-        pydirectinput.press("`")  # Close the backpack
+        self.macro.press("`")  # Close the backpack
         sleep(0.5)
     
+    @tracer.traced("routine")
+    @watched
     def buy_from_egg_shop(self):
         """
         Automatically buys items from the Egg Shop.
@@ -419,9 +635,10 @@ class GameActions:
 
         logging.info("Walking to the first egg...")
         sleep(0.8)
-        pydirectinput.keyDown('w')
-        sleep(0.9)
-        pydirectinput.keyUp('w')
+        with self.macro.input_slot():
+            self.macro.key_down('w')
+            sleep(0.9)
+            self.macro.key_up('w')
         sleep(0.75)
 
         for i in range(3):
@@ -429,69 +646,111 @@ class GameActions:
 
             if i > 0:
                 logging.info(f"{log_prefix} Nudging forward to next egg...")
-                pydirectinput.keyDown('w')
-                sleep(0.2)
-                pydirectinput.keyUp('w')
+                with self.macro.input_slot():
+                    self.macro.key_down('w')
+                    sleep(0.2)
+                    self.macro.key_up('w')
                 sleep(0.75)
 
             logging.info(f"{log_prefix} Interacting with egg...")
-            pydirectinput.press('e')
-            sleep(0.5) 
+            self.macro.press('e')
+            prompt = self.macro.wait_until(
+                Conditions.template_visible(self.window_manager, confirm_image, confidence=0.85),
+                0.5,
+                label="egg purchase prompt",
+            )
+            if i == 0:
+                # No prompt at the first egg means the walk did not end at the eggs
+                self.watchdog.expect(prompt, "egg purchase prompt")
 
             logging.info(f"{log_prefix} Looking for '{confirm_image}' to confirm purchase...")
             self.macro.click_image(confirm_image, confidence=0.85, debug_string="egg_purchase")
             sleep(0.5)
     
+    @tracer.traced("routine")
+    @watched
     def buy_from_gear_shop(self):
         """
         Automatically buys items from the Gear Shop.
         """
         self.goto_gear_shop()
         sleep(1)
-        pydirectinput.press('e')  # Open the gear shop
-        sleep(2)
+        region = self.window_manager.resolve_region("gear_shop")
+
+        # The dialog's own box: the shop box shows the moving world until the shop opens
+        dialog_open = Conditions.region_settled(self.window_manager, "gear_dialog", require_change=True)
+        dialog_open()
+        self.macro.press('e')  # Open the gear shop
+        self.watchdog.expect(self.macro.wait_until(dialog_open, 2, label="gear dialog open"), "gear dialog open")
+
+        # Open once the dialog is gone and the list has stopped animating
+        shop_open = Conditions.all_of(
+            Conditions.region_changed(self.window_manager, "gear_dialog"),
+            Conditions.region_settled(self.window_manager, region),
+        )
+        shop_open()
         self.macro.click(*self.game_elements.get("gear_option_one"))
-        sleep(2)
+        self.watchdog.expect(self.macro.wait_until(shop_open, 2, label="gear shop open"), "gear shop open")
         self.macro.move_center()
         sleep(1)
-        pyautogui.scroll(10000)  # Scroll to the top of the gear shop
-        sleep(1)
-        region = self.regions.get("gear_shop", [0, 0, 800, 600])
-        gear_items = self.shop_items.get("gear", []).copy()
-
-
-        for i in range(len(gear_items)):
-            words = self.window_manager.get_words_in_bounding_box(region)
-            for word, coords in words:
-                word = word.lower()
-                for gear in gear_items:
-                    found = False
-                    if gear.lower() in word:
-                        logging.info(f"Found gear item: {gear} at {coords}")
-                        self.macro.click_abs(*coords)
-                        sleep(1)
-                        self.macro.click_color("26ee26", clicks=25)
-                        found = True
-                        gear_items.remove(gear)  # Remove the item from the list to prevent re-finding it
-                        break
-                if found:
-                    break
-            sleep(0.5)
-            pyautogui.scroll(-116)
-            sleep(0.5)
-        self.close_gui()
 
+        scanner = self.get_shop_scanner("gear")
+        if self.window_manager.state.trusted("buy_button"):
+            buy_button = Conditions.state_is(self.window_manager, "buy_button")
+        else:
+            # Any pixel of the button's color, until the probe is checked against the game
+            buy_button = Conditions.color_present(self.window_manager, "26ee26")
+        money = self.shop_reader.read_money()
+        logging.info(f"Money: {money}")
+        clicks_saved = 0
+        for gear, coords in scanner.walk(self.shop_items.get("gear", [])):
+            if coords is None:
+                # Nothing was sent, an unstocked catalog item says nothing about being stuck
+                logging.info(f"Gear item {gear} is not in the shop")
+                continue
+            offer = self.shop_reader.read_offer(gear, coords, region)
+            clicks = self.shop_reader.clicks_needed(offer, money)
+            clicks_saved += BLIND_CLICKS - clicks
+            if clicks == 0:
+                logging.info(f"Skipping {gear}: stock {offer.stock}, price {offer.price}")
+                continue
+            logging.info(f"Buying {clicks}x {gear} at {coords} (stock {offer.stock}, price {offer.price})")
+            self.macro.click_abs(*coords)
+            self.watchdog.expect(
+                self.macro.wait_until(buy_button, 1, label="buy button visible"),
+                "buy button visible",
+            )
+            self.macro.click_color("26ee26", clicks=clicks)
+            # Purchases that keep leaving the list as it was went nowhere
+            self.watchdog.checkpoint("gear bought", region)
+            if money is not None and offer.price:
+                money -= clicks * offer.price
+        self.clicks_saved += clicks_saved
+        logging.info(f"Saved {clicks_saved} purchase clicks this cycle ({self.clicks_saved} in total)")
+        logging.info(self.window_manager.ocr_cache.stats())
+        if not self.close_gui():
+            # Everything is bought already, get back to a known state without a retry
+            self.watchdog.recover_from("gui closed")
+
+    @tracer.traced("routine")
     def close_gui(self):
         """
         Closes a GUI by finding and double-clicking a specified close button.
+        Returns True right away if no GUI is open, once the GUI probes are calibrated.
         """
+        state = self.window_manager.state
+        if state.trusted("gui") and state.snapshot().gui is None:
+            logging.info("No GUI is open")
+            return True
         logging.info("Attempting to close GUI by double-clicking the shop")
 
         if self.macro.click_image("shop.png"):
             logging.info("First click successful. Performing second click.")
-            sleep(0.5) 
+            self.macro.wait_until(Conditions.template_visible(self.window_manager, "shop.png"), 0.5, label="shop button")
             self.macro.click_image("shop.png",)
 
             self.macro.click_center()
             logging.info("GUI close sequence completed.")
             return True
+        logging.warning("Could not close the GUI, the shop button is not visible")
+        return False
@@ -0,0 +1,212 @@
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class OcrBackend(ABC):
+    """
+    The interface WindowManager reads text through. A backend turns a BGR region
+    into a list of (lowercase line text, (x, y) center) in screen coordinates.
+    A backend without read() can't be created.
+
+    `names_only` tells the backend the caller only looks for catalog names (a shop
+    list), so a backend that can only read names may answer it.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def read(self, view, origin, names_only=False):
+        """Reads the lines of a BGR region whose top left corner is at `origin` on screen."""
+
+
+class ScreenOcrBackend(OcrBackend):
+    """
+    General-purpose OCR through screen_ocr's quality reader (screen_ocr 0.6 or newer,
+    where read_image takes the image's place on screen as `bounding_box`).
+    """
+
+    name = "screen_ocr"
+
+    def __init__(self, reader=None):
+        if reader is None:
+            # Imported here so only configurations that actually use screen_ocr pay for it
+            from screen_ocr import Reader
+
+            reader = Reader.create_quality_reader()
+        self.reader = reader
+
+    def read_boxes(self, view, origin):
+        """
+        Like read(), but returns (text, (left, top, right, bottom)) line boxes.
+        """
+        image = Image.fromarray(cv2.cvtColor(view, cv2.COLOR_BGR2RGB))
+        height, width = view.shape[:2]
+        ox, oy = origin
+        result = self.reader.read_image(image, bounding_box=(ox, oy, ox + width, oy + height))
+
+        output = []
+        for line in result.result.lines:
+            if not line.words:
+                continue
+
+            line_text = "".join(word.text + " " for word in line.words).strip().lower()
+            left = min(word.left for word in line.words)
+            top = min(word.top for word in line.words)
+            right = max(word.left + word.width for word in line.words)
+            bottom = max(word.top + word.height for word in line.words)
+            output.append((line_text, (left, top, right, bottom)))
+
+        return output
+
+    def read(self, view, origin, names_only=False):
+        output = []
+        for line_text, (left, top, right, bottom) in self.read_boxes(view, origin):
+            output.append((line_text, (int((left + right) / 2), int((top + bottom) / 2))))
+        return output
+
+
+class GlyphBackend(OcrBackend):
+    """
+    Recognizes the game's closed vocabulary (shop item names) by matching pre-rendered
+    word templates, which is far cheaper than general OCR since the UI uses one font.
+    Only reads with names_only use the templates; stock, prices and money always go
+    to the fallback, which can read any text.
+
+    Templates are learned from the fallback backend: whenever it reads a line that is
+    exactly a catalog name, that line is cropped out of the frame and kept as the
+    template for the name. Templates are cached on disk. Until every catalog name has
+    a template, the region is handed to the fallback, so an unlearned item is never
+    silently missed. The same goes for a read whose hits don't explain every row of
+    names:
+    - nothing matched with at least `min_confidence`;
+    - some template matched a row with at least `doubt_confidence` but nothing matched
+      that row with `min_confidence`, e.g. a highlighted name;
+    - two matched rows are more than 1.5 row pitches apart (the smallest gap between
+      matched rows), so a row in between matched nothing at all.
+    """
+
+    name = "glyph"
+
+    def __init__(self, matcher, fallback, cache_path="cache/glyphs.npz", min_confidence=0.85, doubt_confidence=None):
+        self.matcher = matcher
+        self.fallback = fallback
+        self.cache_path = cache_path
+        self.min_confidence = min_confidence
+        self.doubt_confidence = min_confidence - 0.25 if doubt_confidence is None else doubt_confidence
+        self.templates = {}
+        self.fallbacks = 0
+        # OCR pipeline workers learn and save at the same time
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with np.load(self.cache_path) as data:
+                self.templates = {label: data[label] for label in data.files}
+            logging.debug(f"Loaded {len(self.templates)} glyph templates from '{self.cache_path}'")
+        except Exception as e:
+            logging.warning(f"Could not load glyph templates from '{self.cache_path}': {e}")
+
+    def save(self):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(self.cache_path, **self.templates)
+
+    def learn(self, view, origin, boxes):
+        """
+        Stores templates for every line box whose text is exactly a catalog name.
+        """
+        learned = {}
+        gray = cv2.cvtColor(view, cv2.COLOR_BGR2GRAY)
+        for text, (left, top, right, bottom) in boxes:
+            match = self.matcher.match(text)
+            if match is None or match.confidence < 1 or text != match.item.lower():
+                continue
+            if match.item in self.templates:
+                continue
+            crop = gray[max(top - origin[1], 0) : bottom - origin[1], max(left - origin[0], 0) : right - origin[0]]
+            if crop.size == 0 or crop.std() < 1e-6:
+                continue
+            learned[match.item] = crop.copy()
+        if not learned:
+            return
+        with self._lock:
+            learned = {item: crop for item, crop in learned.items() if item not in self.templates}
+            if not learned:
+                return
+            # A new dict, so a recognize() running on another worker keeps iterating the old one
+            self.templates = {**self.templates, **learned}
+            logging.info(f"Learned {len(learned)} glyph templates ({len(self.templates)} total)")
+            self.save()
+
+    def recognize(self, view, origin):
+        """
+        Returns [(text, (x, y), score)] for every known word found in the region.
+        """
+        return self._recognize(view, origin)[0]
+
+    def _recognize(self, view, origin):
+        """recognize() and whether some row of names is left unexplained by it."""
+        gray = cv2.cvtColor(view, cv2.COLOR_BGR2GRAY)
+        found = []
+        rows = []  # (top, bottom) of every confident hit
+        doubtful = []  # row centers where a template matched weakly
+        for label, template in self.templates.items():
+            height, width = template.shape
+            if height > gray.shape[0] or width > gray.shape[1]:
+                continue
+            result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (x, y) = cv2.minMaxLoc(result)
+            if score >= self.min_confidence:
+                center = (origin[0] + x + width // 2, origin[1] + y + height // 2)
+                found.append((label.lower(), center, score))
+                rows.append((y, y + height))
+            weak_rows = np.flatnonzero((result >= self.doubt_confidence).any(axis=1))
+            doubtful.extend((weak_rows + height // 2).tolist())
+        found.sort(key=lambda hit: hit[1][1])
+
+        missed = any(not any(top <= center < bottom for top, bottom in rows) for center in doubtful)
+        if len(rows) >= 2:
+            gaps = np.diff(sorted(top for top, _ in rows))
+            gaps = gaps[gaps > 0]
+            missed = missed or (gaps.size > 0 and gaps.max() > 1.5 * gaps.min())
+        return found, missed
+
+    @property
+    def complete(self):
+        """True once there is a template for every catalog name."""
+        return all(item in self.templates for _, item, _ in self.matcher.patterns)
+
+    def read(self, view, origin, names_only=False):
+        if names_only and self.complete:
+            found, missed = self._recognize(view, origin)
+            if found and not missed:
+                return [(text, center) for text, center, _ in found]
+
+        self.fallbacks += 1
+        boxes = self.fallback.read_boxes(view, origin)
+        self.learn(view, origin, boxes)
+        return [
+            (text, (int((left + right) / 2), int((top + bottom) / 2)))
+            for text, (left, top, right, bottom) in boxes
+        ]
+
+
+def create_ocr_backend(name, matcher, cache_path="cache/glyphs.npz", min_confidence=0.85):
+    """
+    Builds the OCR backend named in config.json ("screen_ocr" or "glyph").
+    """
+    if name == "glyph":
+        return GlyphBackend(matcher, ScreenOcrBackend(), cache_path, min_confidence)
+    if name != "screen_ocr":
+        logging.warning(f"Unknown OCR backend '{name}', using screen_ocr")
+    return ScreenOcrBackend()
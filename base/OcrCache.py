@@ -0,0 +1,117 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def region_hash(view, hash_size=16, margin=2):
+    """
+    A difference hash of a BGR region: the region is shrunk to (hash_size + 1) x
+    hash_size grayscale pixels and every bit records whether a pixel is more than
+    `margin` gray levels brighter than its right neighbour. Tiny capture noise leaves
+    the hash unchanged, even on flat backgrounds, a scroll or a different GUI
+    changes it.
+    """
+    gray = cv2.cvtColor(view, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = small[:, 1:] - small[:, :-1] > margin
+    return view.shape[:2] + (np.packbits(bits).tobytes(),)
+
+
+def exact_hash(view):
+    """
+    A hash of the exact region bytes. Unlike region_hash it tells apart texts that
+    only differ in a small glyph, like "x2 Stock" and "x3 Stock", but any change of a
+    pixel is a miss.
+    """
+    digest = hashlib.blake2b(np.ascontiguousarray(view), digest_size=16).digest()
+    return ("exact",) + view.shape[:2] + (digest,)
+
+
+class OcrCache:
+    """
+    An LRU cache of OCR results keyed by a perceptual hash of the region content.
+    Reads whose small digits matter (stock, prices, money) are keyed by the exact
+    region bytes instead, see read(exact=True).
+
+    Lines are stored relative to the region's top-left corner, so the same content
+    shown at another position (e.g. a list row after a scroll) is reused as well.
+    Lookups are thread safe, OCR pipeline workers share one cache.
+    """
+
+    def __init__(self, capacity=64, hash_size=16):
+        self.capacity = capacity
+        self.hash_size = hash_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key):
+        with self._lock:
+            lines = self._entries.get(key)
+            if lines is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return lines
+
+    def _put(self, key, lines):
+        with self._lock:
+            self._entries[key] = lines
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _shift(lines, dx, dy):
+        return [(text, (x + dx, y + dy)) for text, (x, y) in lines]
+
+    def read(self, view, origin, reader, exact=False, kind=None):
+        """
+        Returns OCR lines for a region, running `reader(view, origin)` only when the
+        content changed since it was last read.
+
+        Args:
+            view: The BGR region.
+            origin: Screen coordinates of the region's top-left pixel.
+            reader: A callable returning [(text, (x, y))] in screen coordinates.
+            exact: Key the region by its exact bytes rather than the perceptual hash,
+                for numbers, where one changed digit must not hit the cache.
+            kind: Kept in the key, so reads of the same pixels that return different
+                lines (e.g. names only) don't share results.
+        """
+        key = exact_hash(view) if exact else region_hash(view, self.hash_size)
+        if kind is not None:
+            key = (kind,) + key
+        left, top = origin
+        lines = self._get(key)
+        if lines is None:
+            lines = self._shift(reader(view, origin), -left, -top)
+            self._put(key, lines)
+        return self._shift(lines, left, top)
+
+    def read_rows(self, view, origin, row_height, reader, exact=False, kind=None):
+        """
+        Like read(), but hashes and caches every `row_height` pixel strip on its own so
+        only rows that are new (e.g. scrolled into view) go through OCR. This pays off
+        when row_height matches the list's row pitch and the scroll step.
+        """
+        left, top = origin
+        output = []
+        for y in range(0, view.shape[0], row_height):
+            row = view[y : y + row_height]
+            output.extend(self.read(row, (left, top + y), reader, exact, kind))
+        return output
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"OCR cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), {len(self._entries)} entries"
@@ -0,0 +1,91 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from .Tracer import tracer
+
+
+class OcrPipeline:
+    """
+    Runs OCR on a pool of worker threads so the main thread can keep sending input
+    (scrolling a list, waiting for it to settle, capturing the next frame) while
+    earlier frames are still being read.
+
+    Frames are submitted in order with a tag and results come back in the same order.
+    The pipeline keeps per-stage latencies (capture on the caller's side, time waiting
+    in the queue, OCR, and the caller waiting for results) and the queue depth.
+    """
+
+    def __init__(self, reader, workers=2):
+        """
+        Args:
+            reader: A callable (view, origin) -> [(text, (x, y))], usually
+                WindowManager.read_names, which goes through the OCR cache.
+            workers: How many frames are read at the same time.
+        """
+        self.reader = reader
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="ocr")
+        self._pending = []
+        self._lock = threading.Lock()
+        self.depth = 0
+        self.max_depth = 0
+        # stage -> [count, total seconds, worst seconds]
+        self.latency = {}
+
+    def record(self, stage, elapsed):
+        with self._lock:
+            entry = self.latency.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+
+    def _read(self, view, origin, submitted):
+        started = perf_counter()
+        self.record("queued", started - submitted)
+        try:
+            with tracer.span("pipeline ocr", "ocr"):
+                return self.reader(view, origin)
+        finally:
+            self.record("ocr", perf_counter() - started)
+            with self._lock:
+                self.depth -= 1
+
+    def submit(self, tag, view, origin=(0, 0)):
+        """
+        Queues a frame for OCR. `view` must not change afterwards, pass a copy of a
+        FrameProvider view.
+        """
+        with self._lock:
+            self.depth += 1
+            self.max_depth = max(self.max_depth, self.depth)
+        future = self._executor.submit(self._read, view, origin, perf_counter())
+        self._pending.append((tag, future))
+
+    def results(self):
+        """
+        Yields (tag, lines) for every submitted frame in submission order, waiting for
+        frames that are still being read.
+        """
+        pending, self._pending = self._pending, []
+        for tag, future in pending:
+            started = perf_counter()
+            lines = future.result()
+            self.record("waited", perf_counter() - started)
+            yield tag, lines
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def report(self):
+        """Returns a printable table of latency per stage and the deepest the queue got."""
+        lines = [f"OCR pipeline: {self.workers} workers, max queue depth {self.max_depth}"]
+        lines.append(f"{'stage':<10}{'count':>7}{'avg ms':>9}{'max ms':>9}")
+        for stage, (count, total, worst) in self.latency.items():
+            lines.append(f"{stage:<10}{count:>7}{total / count * 1000:>9.1f}{worst * 1000:>9.1f}")
+        return "\n".join(lines)
+
+    def log_report(self):
+        for line in self.report().splitlines():
+            logging.info(line)
@@ -0,0 +1,337 @@
+import copy
+import logging
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from time import perf_counter
+
+from . import Conditions
+from .Config import load_config
+
+
+class InstanceReport(namedtuple("InstanceReport", [
+    "index", "ready", "cycles", "failures", "cycle_times", "run_time", "input_wait", "input_held", "acquisitions",
+    "error",
+], defaults=(None,))):
+    """What one game instance got done, sent back from its worker process."""
+
+    __slots__ = ()
+
+
+class InputLock:
+    """
+    Time-slices the one physical mouse and keyboard between game instances running in
+    separate processes.
+
+    It is a ticket lock, so instances get the input in the order they asked for it and
+    none can starve the others. Holding it is reentrant within a thread. Whoever gets
+    it while another window has focus activates its own window first, so a focus
+    switch only happens when the input actually moves to another instance.
+    """
+
+    def __init__(self, context=None):
+        context = context or multiprocessing.get_context()
+        self._condition = context.Condition()
+        self._next = context.RawValue("q", 0)
+        self._serving = context.RawValue("q", 0)
+        self._focused = context.RawValue("i", -1)
+        self.switches = context.RawValue("q", 0)
+        self._init_local()
+
+    def _init_local(self):
+        # The instance of this process, set by bind()
+        self.macro = None
+        self.index = None
+        self._local = threading.local()
+        self._held_since = 0.0
+        self.waited = 0.0
+        self.held = 0.0
+        self.acquisitions = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("macro", "_local"):
+            state.pop(name)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_local()
+
+    def bind(self, macro, index):
+        """Makes `macro` the instance this process sends input for."""
+        self.macro = macro
+        self.index = index
+        macro.input_lock = self
+
+    def acquire(self):
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        if depth:
+            return
+        started = perf_counter()
+        with self._condition:
+            ticket = self._next.value
+            self._next.value += 1
+            while self._serving.value != ticket:
+                self._condition.wait()
+        self._held_since = perf_counter()
+        self.waited += self._held_since - started
+        self.acquisitions += 1
+        if self._focused.value != self.index:
+            self._switch_focus()
+
+    def release(self):
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+        self.held += perf_counter() - self._held_since
+        with self._condition:
+            self._serving.value += 1
+            self._condition.notify_all()
+
+    def reset_counts(self):
+        self.waited = self.held = 0.0
+        self.acquisitions = 0
+
+    @contextmanager
+    def hold(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def released(self):
+        """
+        Lets the other instances have the input while this thread waits, e.g. for its
+        window to get focus back, however deep it holds the lock. Takes it back after.
+        """
+        depth = getattr(self._local, "depth", 0)
+        if not depth:
+            yield
+            return
+        self._local.depth = 1
+        self.release()
+        try:
+            yield
+        finally:
+            self.acquire()
+            self._local.depth = depth
+
+    def _switch_focus(self):
+        window_manager = self.macro.window_manager
+        window = window_manager.window
+        if window is None:
+            return
+        try:
+            window.activate()
+            Conditions.wait_until(lambda: window.isActive, 0.3, label="focus switch")
+        except Exception as e:
+            logging.warning(f"Instance {self.index} could not activate its window: {e}")
+        # The watcher may still remember another window having focus
+        window_manager.watcher.poll()
+        self._focused.value = self.index
+        self.switches.value += 1
+
+
+def instance_path(path, index):
+    """The per-instance version of a cache file: cache/calibration_2.json for index 2."""
+    if index == 0:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}_{index}{extension}"
+
+
+# Set in every worker process by _init_worker
+_input_lock = None
+
+
+def _init_worker(input_lock, log_level):
+    global _input_lock
+    _input_lock = input_lock
+    logging.getLogger().setLevel(log_level)
+
+
+def _create_macro(config_path, index, simulated):
+    if simulated:
+        from .Simulator import Simulator
+
+        # Every worker gets its own game with one window, next to the other processes'
+        simulator = Simulator(config_path, realtime=True).install()
+        return simulator.create_macro(), 0
+
+    from .MacroManager import GAGMacro
+
+    config = copy.deepcopy(load_config(config_path))
+    for key, default in (("calibration_cache", "cache/calibration.json"), ("shop_index_path", "cache/shop_index.json")):
+        config[key] = instance_path(config.get(key, default), index)
+    return GAGMacro(config=config), index
+
+
+def _run_instance(index, position, handle, config_path, setup_routines, routines, duration, simulated, log_level):
+    """
+    Sets up one window, runs the setup routines once and then the cycle routines over
+    and over for `duration` seconds.
+    """
+    macro, window_index = _create_macro(config_path, index, simulated)
+    logging.getLogger().setLevel(log_level)  # importing the macro resets it
+    _input_lock.bind(macro, index)
+    with macro.input_slot():
+        ready = macro.setup_window(window_index, position, handle)
+    error = None
+    if ready:
+        for routine in setup_routines:
+            try:
+                getattr(macro.game_actions, routine)()
+            except Exception as e:
+                ready = False
+                error = f"setup routine '{routine}' failed: {e}"
+                logging.exception(f"Instance {index} {error}")
+                macro.flight_recorder.dump(f"instance_{index}_setup")
+                break
+    # Only the cycles count towards the input lock times
+    _input_lock.reset_counts()
+
+    cycles = failures = 0
+    cycle_times = []
+    started = perf_counter()
+    if ready:
+        while perf_counter() - started < duration:
+            cycle_started = perf_counter()
+            try:
+                for routine in routines:
+                    getattr(macro.game_actions, routine)()
+                cycles += 1
+                macro.window_manager.watcher.cycle()
+                cycle_times.append(perf_counter() - cycle_started)
+            except Exception as e:
+                failures += 1
+                logging.exception(f"Instance {index} failed a cycle: {e}")
+                macro.flight_recorder.dump(f"instance_{index}_cycle")
+    macro.close()
+    return InstanceReport(
+        index, ready, cycles, failures, cycle_times, perf_counter() - started,
+        _input_lock.waited, _input_lock.held, _input_lock.acquisitions, error,
+    )
+
+
+class Orchestrator:
+    """
+    Runs one macro per open Roblox window, each in its own process with its own
+    WindowManager, GAGMacro, GameActions and calibration, so their vision work runs in
+    parallel. The shared mouse and keyboard go through an InputLock.
+
+    Every instance runs `setup_routines` once, then repeats `routines` (GameActions
+    method names) as one cycle. The
+    report shows cycle times per instance and the throughput of all of them, which is
+    how to tell when one more instance stops adding to it.
+    """
+
+    def __init__(self, config_path="config.json", routines=("sell_inventory",), instances=None, simulated=False, setup_routines=()):
+        """
+        Args:
+            config_path: The config every instance starts from.
+            routines: GameActions methods making up one cycle.
+            instances: How many windows to run, default every matching window.
+            simulated: Give every instance its own simulated game (real time) instead
+                of a Roblox window.
+            setup_routines: GameActions methods run once before the first cycle.
+        """
+        self.config_path = config_path
+        self.config = load_config(config_path)
+        self.routines = list(routines)
+        self.setup_routines = list(setup_routines)
+        self.simulated = simulated
+        self.instances = instances
+        self.reports = []
+        self.elapsed = 0.0
+        self.switches = 0
+
+    def discover(self):
+        """
+        The handles (HWNDs) of the windows to run: `instances` of them, capped at the
+        number of matching windows. Enumerated once here, since the OS lists windows
+        in Z-order and every instance activating its own window reorders them. A
+        simulated run has no handles, just one None per instance.
+        """
+        if self.simulated:
+            return [None] * (self.instances or 1)
+        # Imported here, workers of a simulated run swap in the simulator's pyautogui first
+        import pyautogui
+
+        title = self.config["window_title"]
+        handles = [w._hWnd for w in pyautogui.getWindowsWithTitle(title) if w.title == title]
+        if self.instances is not None:
+            handles = handles[:self.instances]
+        return handles
+
+    def positions(self, count):
+        """Tiles the windows on the screen, so none covers another while it is captured."""
+        if self.simulated:
+            # Every simulated game has a screen of its own
+            return [(0, 0)] * count
+        import pyautogui
+
+        width, height = self.config["standard_width"], self.config["standard_height"]
+        columns = max(pyautogui.size()[0] // width, 1)
+        return [((i % columns) * width, (i // columns) * height) for i in range(count)]
+
+    def run(self, duration):
+        """Runs every instance for `duration` seconds, returns their InstanceReports."""
+        handles = self.discover()
+        count = len(handles)
+        if count == 0:
+            print("Error: Roblox window not found.")
+            return []
+        # Capture backends and window handles do not survive a fork
+        context = multiprocessing.get_context("spawn")
+        input_lock = InputLock(context)
+        level = logging.getLogger().level
+        started = perf_counter()
+        with ProcessPoolExecutor(count, mp_context=context, initializer=_init_worker, initargs=(input_lock, level)) as pool:
+            futures = [
+                pool.submit(
+                    _run_instance, index, position, handle, self.config_path, self.setup_routines, self.routines,
+                    duration, self.simulated, level,
+                )
+                for index, (position, handle) in enumerate(zip(self.positions(count), handles))
+            ]
+            self.reports = []
+            for index, future in enumerate(futures):
+                try:
+                    self.reports.append(future.result())
+                except Exception as e:
+                    # One instance failing must not lose the reports of the others
+                    logging.error(f"Instance {index} failed: {e!r}")
+                    self.reports.append(InstanceReport(index, False, 0, 0, [], 0.0, 0.0, 0.0, 0, repr(e)))
+        self.elapsed = perf_counter() - started
+        self.switches = input_lock.switches.value
+        return self.reports
+
+    def throughput(self):
+        """Cycles per hour of all instances together, not counting startup."""
+        return sum(report.cycles / max(report.run_time, 1e-9) * 3600 for report in self.reports)
+
+    def report(self):
+        """Returns a printable table of cycle and input lock times per instance."""
+        lines = [f"{'instance':<10}{'cycles':>7}{'failed':>7}{'avg s':>8}{'max s':>8}{'input wait s':>13}{'input held s':>13}"]
+        for report in self.reports:
+            if not report.ready:
+                lines.append(f"{report.index:<10}  {report.error or 'window setup failed'}")
+                continue
+            times = report.cycle_times
+            average = sum(times) / len(times) if times else 0.0
+            lines.append(
+                f"{report.index:<10}{report.cycles:>7}{report.failures:>7}{average:>8.2f}{max(times, default=0.0):>8.2f}"
+                f"{report.input_wait:>13.2f}{report.input_held:>13.2f}"
+            )
+        lines.append(
+            f"{len(self.reports)} instance(s), {self.elapsed:.1f}s, {self.throughput():.0f} cycles per hour, "
+            f"{self.switches} focus switches"
+        )
+        return "\n".join(lines)
@@ -0,0 +1,312 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .CaptureBackends import SyntheticCaptureBackend, create_capture_backend
+from .ColorSearch import ColorSearch, parse_color
+from .FrameProvider import FrameProvider
+
+
+class Job:
+    """
+    A recurring routine. Either runs every `interval` seconds after it last finished,
+    or at every multiple of `period` seconds of wall-clock time plus `offset`, to line
+    up with the game's shop restock timer.
+
+    An optional `condition(frames)` is checked first on the vision thread; the routine
+    only runs when it returns True, otherwise it is checked again after `retry` seconds.
+    """
+
+    def __init__(self, name, routine, interval=None, period=None, offset=0.0, priority=10, condition=None, retry=5.0):
+        if (interval is None) == (period is None):
+            raise ValueError(f"Job '{name}' needs either an interval or a period")
+        self.name = name
+        self.routine = routine
+        self.interval = interval
+        self.period = period
+        self.offset = offset
+        self.priority = priority
+        self.condition = condition
+        self.retry = retry
+
+        self.next_run = None
+        self.queued = False
+        self.runs = 0
+        self.failures = 0
+        self.skips = 0
+        self.busy = 0.0
+        self.late = 0.0
+
+    def schedule(self, now):
+        """Sets the next time the job is due after `now`."""
+        if self.period:
+            self.next_run = (math.floor((now - self.offset) / self.period) + 1) * self.period + self.offset
+        else:
+            self.next_run = now + self.interval
+
+
+def _visible(window_manager, spec, clock):
+    """The check of one condition spec on a frame, before "absent" is applied."""
+    region = spec.get("region")
+
+    if "template" in spec:
+        def visible(frames):
+            view, origin = frames.get_region(window_manager.resolve_region(region))
+            confidence = spec.get("confidence", 0.9)
+            return window_manager.templates.locate(spec["template"], view, origin, confidence=confidence) is not None
+    elif "color" in spec:
+        def visible(frames):
+            colors = ColorSearch(frames, window_manager.resolve_region)
+            return colors.find_largest(spec["color"], region, spec.get("tolerance", 0), spec.get("min_area", 1)) is not None
+    elif spec.get("camera_drift"):
+        camera = window_manager.config.get("camera_alignment", {})
+        threshold = spec.get("threshold", camera.get("tolerance", 4))
+        target = camera.get("horizon_target", 0)
+        if camera.get("sky_color"):
+            from .CameraAlignment import sky_rows
+
+            sky_rgb = parse_color(camera["sky_color"])
+
+            def visible(frames):
+                view, _ = frames.get_region(window_manager.resolve_region(region or "camera_view"))
+                return abs(sky_rows(view, sky_rgb, camera.get("sky_tolerance", 12)) - target) > threshold
+        else:
+            # Without a calibrated sky color drift can't be measured, fall back to a timer
+            max_age = spec.get("max_age", 1800)
+            logging.warning(f"camera_alignment.sky_color is not calibrated, camera drift is assumed every {max_age}s")
+            last = [clock()]
+
+            def visible(frames):
+                if clock() - last[0] < max_age:
+                    return False
+                last[0] = clock()
+                return True
+    else:
+        raise ValueError(f"A job condition needs a template, a color or camera_drift: {spec}")
+
+    absent = spec.get("absent", False)
+    return lambda frames: visible(frames) != absent
+
+
+def condition_from_config(window_manager, spec, clock=time.time):
+    """
+    Builds a job condition from its config.json entry, checked on a fresh frame:
+
+        {"template": "shop.png", "region": null, "confidence": 0.9}
+        {"color": "26ee26", "region": "gear_shop", "tolerance": 0, "min_area": 1}
+        {"camera_drift": true, "threshold": 4, "max_age": 1800}
+
+    The condition holds while the template or color is visible; "absent": true
+    inverts it. camera_drift holds while the horizon in "camera_view" is more than
+    `threshold` rows off camera_alignment's horizon_target, measured with its
+    sky_color; while that is unset it holds once every `max_age` seconds instead.
+    A list of entries holds when all of them do, checked in order.
+    """
+    specs = spec if isinstance(spec, list) else [spec]
+    checks = [_visible(window_manager, entry, clock) for entry in specs]
+
+    def condition(frames):
+        frames.invalidate()
+        return all(check(frames) for check in checks)
+
+    return condition
+
+
+class Scheduler:
+    """
+    Runs GameActions routines as prioritized recurring jobs on an asyncio event loop.
+
+    There is one mouse and keyboard, so routines run one at a time on a single input
+    thread, the most important due job first. Job conditions only look at the screen
+    and run on a separate vision thread with its own FrameProvider and capture
+    backend, so they are checked while a routine is still running.
+    """
+
+    def __init__(self, macro, clock=time.time):
+        self.macro = macro
+        self.clock = clock
+        self.jobs = []
+        self.frames = None
+        self.started = None
+        self.stopped = None
+        self.busy = 0.0
+
+        self._input_executor = ThreadPoolExecutor(1, thread_name_prefix="input")
+        self._vision_executor = ThreadPoolExecutor(1, thread_name_prefix="vision", initializer=self._init_vision)
+        self._sequence = itertools.count()
+        self._queue = None
+        self._changed = None
+        self._stopping = False
+        self._running = None
+
+    def _init_vision(self):
+        # Made on the vision thread, since some capture backends must stay on one thread
+        window_manager = self.macro.window_manager
+        if isinstance(window_manager.capture, SyntheticCaptureBackend):
+            # Frames come from a source like the simulator, not the screen
+            backend = SyntheticCaptureBackend(window_manager.capture.source)
+        else:
+            backend = create_capture_backend(window_manager.config.get("capture", {}).get("backend", "auto"))
+        self.frames = FrameProvider(window_manager, backend, window_manager.frames.max_age)
+
+    def add(self, job):
+        self.jobs.append(job)
+        return job
+
+    def add_from_config(self, schedule):
+        """
+        Adds the jobs under "schedule" in config.json, each naming a GameActions routine
+        and optionally a condition (see condition_from_config) and how many seconds
+        to wait before checking it again:
+
+            "gear_shop": {"routine": "buy_from_gear_shop", "period": 300, "offset": 5, "priority": 0,
+                          "condition": {"template": "shop.png"}, "retry": 5}
+        """
+        for name, spec in schedule.items():
+            routine = getattr(self.macro.game_actions, spec["routine"], None)
+            if routine is None:
+                logging.error(f"Scheduled job '{name}' names unknown routine '{spec['routine']}'")
+                continue
+            self.add(Job(
+                name,
+                routine,
+                interval=spec.get("interval"),
+                period=spec.get("period"),
+                offset=spec.get("offset", 0.0),
+                priority=spec.get("priority", 10),
+                condition=condition_from_config(self.macro.window_manager, spec["condition"], self.clock) if "condition" in spec else None,
+                retry=spec.get("retry", 5.0),
+            ))
+
+    def stop(self):
+        """Stops after the routine that is running now."""
+        self._stopping = True
+        if self._changed is not None:
+            self._changed.set()
+
+    def _evaluate(self, job):
+        try:
+            return bool(job.condition(self.frames))
+        except Exception as e:
+            logging.error(f"Condition of job '{job.name}' failed: {e}")
+            return False
+
+    async def _check(self, job, due):
+        if job.condition is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                ready = await loop.run_in_executor(self._vision_executor, self._evaluate, job)
+            except Exception as e:
+                logging.error(f"Could not check job '{job.name}': {e}")
+                ready = False
+            if not ready:
+                job.skips += 1
+                job.next_run = self.clock() + job.retry
+                job.queued = False
+                self._changed.set()
+                return
+        await self._queue.put((job.priority, next(self._sequence), job, due))
+
+    async def _input_worker(self):
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            _, _, job, due = await self._queue.get()
+            if self._stopping:
+                break
+            started = self.clock()
+            job.late += max(started - due, 0.0)
+            logging.info(f"Running job '{job.name}' ({started - due:.1f}s after it was due)")
+            try:
+                self._running = loop.run_in_executor(self._input_executor, job.routine)
+                await self._running
+                job.runs += 1
+                self.macro.window_manager.watcher.cycle()
+            except Exception as e:
+                job.failures += 1
+                logging.exception(f"Job '{job.name}' failed: {e}")
+                self.macro.flight_recorder.dump(f"job_{job.name}")
+            finally:
+                self._running = None
+            finished = self.clock()
+            job.busy += finished - started
+            self.busy += finished - started
+            job.schedule(finished)
+            job.queued = False
+            self._changed.set()
+
+    async def run(self, duration=None):
+        """Runs the jobs until stop() is called or `duration` seconds have passed."""
+        self._queue = asyncio.PriorityQueue()
+        self._changed = asyncio.Event()
+        self._stopping = False
+        self.started = self.clock()
+        self.stopped = None
+        for job in self.jobs:
+            job.schedule(self.started)
+        worker = asyncio.create_task(self._input_worker())
+        checks = set()
+
+        try:
+            while not self._stopping:
+                now = self.clock()
+                if duration is not None and now - self.started >= duration:
+                    break
+                for job in self.jobs:
+                    if not job.queued and job.next_run <= now:
+                        job.queued = True
+                        task = asyncio.create_task(self._check(job, job.next_run))
+                        checks.add(task)
+                        task.add_done_callback(checks.discard)
+
+                waiting = [job.next_run for job in self.jobs if not job.queued]
+                wake = min(waiting, default=now + 60)
+                if duration is not None:
+                    wake = min(wake, self.started + duration)
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), max(wake - self.clock(), 0.01))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._stopping = True
+            if self._running is not None:
+                await asyncio.wait([self._running])
+            worker.cancel()
+            for task in checks:
+                task.cancel()
+            await asyncio.gather(worker, *checks, return_exceptions=True)
+            self.stopped = self.clock()
+
+    def run_forever(self, duration=None):
+        """Blocking entry point: runs the event loop until stopped or Ctrl+C."""
+        try:
+            asyncio.run(self.run(duration))
+        except KeyboardInterrupt:
+            logging.info("Scheduler interrupted")
+        finally:
+            self._input_executor.shutdown(wait=True)
+            self._vision_executor.shutdown(wait=True)
+
+    def report(self):
+        """Returns a printable table of runs and timing per job plus overall throughput."""
+        end = self.stopped if self.stopped is not None else self.clock()
+        elapsed = max(end - (self.started or end), 1e-9)
+        runs = sum(job.runs for job in self.jobs)
+        idle = max(elapsed - self.busy, 0.0)
+        lines = [
+            f"{runs} routines in {elapsed / 60:.1f} min, {runs / elapsed * 3600:.1f} per hour, "
+            f"input idle {idle:.0f}s ({idle / elapsed:.0%})",
+            f"{'job':<16}{'prio':>5}{'runs':>6}{'failed':>7}{'skipped':>8}{'avg s':>8}{'avg late s':>11}",
+        ]
+        for job in sorted(self.jobs, key=lambda job: job.priority):
+            finished = job.runs + job.failures
+            average = job.busy / finished if finished else 0.0
+            late = job.late / finished if finished else 0.0
+            lines.append(
+                f"{job.name:<16}{job.priority:>5}{job.runs:>6}{job.failures:>7}{job.skips:>8}"
+                f"{average:>8.1f}{late:>11.1f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import zlib
+from collections import Counter
+from time import perf_counter, time
+
+import numpy as np
+
+from .TemplateStore import Match
+
+
+def _plain(value):
+    """
+    Turns a vision result into plain JSON data. Match timings are dropped and scores
+    rounded, so two runs of the same lookup compare equal.
+    """
+    if isinstance(value, Match):
+        value = value._replace(score=round(float(value.score), 3), elapsed=None)
+    return json.loads(json.dumps(value, default=_json_default))
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return repr(value)
+
+
+class SessionRecorder:
+    """
+    Writes every captured frame, input and vision result of a run to a folder so the
+    run can be replayed offline with SessionReplay.
+
+    The folder holds `events.jsonl`, one timestamped event per line, and `frames.bin`,
+    the frames as zlib blobs. Every `keyframe_interval`-th frame (and every frame whose
+    size changed) is stored whole, the others as the XOR with the previous frame, which
+    is mostly zeros because the UI rarely changes much between two captures.
+    """
+
+    def __init__(self, path, keyframe_interval=30, level=1):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self._frames_file = open(os.path.join(path, "frames.bin"), "wb")
+        self._events_file = open(os.path.join(path, "events.jsonl"), "w")
+        self._offset = 0
+        self._previous = None
+        self._delta = None
+        self.started = perf_counter()
+        self.frame_index = -1
+        self.bytes_raw = 0
+        self.bytes_stored = 0
+        self._write({"type": "session", "wall_time": time(), "keyframe_interval": keyframe_interval})
+
+    def attach(self, window_manager):
+        """Records everything seen and done through this window manager from now on."""
+        window_manager.frames.recorder = self
+        window_manager.templates.recorder = self
+        return self
+
+    def detach(self, window_manager):
+        window_manager.frames.recorder = None
+        window_manager.templates.recorder = None
+
+    def _write(self, event):
+        event["t"] = round(perf_counter() - self.started, 4)
+        self._events_file.write(json.dumps(event, default=_json_default) + "\n")
+
+    def frame(self, frame, origin):
+        """Stores a captured BGR frame. Called by the FrameProvider."""
+        self.frame_index += 1
+        key = (
+            self._previous is None
+            or self._previous.shape != frame.shape
+            or self.frame_index % self.keyframe_interval == 0
+        )
+        if key:
+            data = frame
+            self._previous = np.array(frame)
+            self._delta = np.empty_like(frame)
+        else:
+            data = np.bitwise_xor(frame, self._previous, out=self._delta)
+            np.copyto(self._previous, frame)
+
+        blob = zlib.compress(np.ascontiguousarray(data), self.level)
+        self._frames_file.write(blob)
+        self._write({
+            "type": "frame",
+            "index": self.frame_index,
+            "offset": self._offset,
+            "length": len(blob),
+            "shape": list(frame.shape),
+            "origin": list(origin),
+            "key": key,
+        })
+        self._offset += len(blob)
+        self.bytes_raw += frame.nbytes
+        self.bytes_stored += len(blob)
+
+    def input(self, name, args=(), kwargs=None):
+        """Stores an input action and its arguments."""
+        self._write({"type": "input", "name": name, "args": list(args), "kwargs": kwargs or {}})
+
+    def vision(self, kind, query, result, elapsed=None):
+        """
+        Stores a vision lookup made on the latest frame: `kind` is "color", "template"
+        or "ocr", `query` the arguments needed to run it again.
+        """
+        self._write({
+            "type": "vision",
+            "kind": kind,
+            "frame": self.frame_index,
+            "query": query,
+            "result": _plain(result),
+            "elapsed": elapsed,
+        })
+
+    def close(self):
+        self._frames_file.close()
+        self._events_file.close()
+        if self.bytes_raw:
+            logging.info(
+                f"Recorded {self.frame_index + 1} frames to '{self.path}', "
+                f"{self.bytes_stored / 2**20:.1f} MB for {self.bytes_raw / 2**20:.1f} MB of pixels"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Session:
+    """
+    A recorded session opened for reading. `frames.bin` is memory-mapped, so opening a
+    long recording costs nothing until frames are decoded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "events.jsonl"), "r") as f:
+            self.events = [json.loads(line) for line in f if line.strip()]
+        self.frame_events = [event for event in self.events if event["type"] == "frame"]
+        frames_path = os.path.join(path, "frames.bin")
+        size = os.path.getsize(frames_path)
+        self._data = np.memmap(frames_path, dtype=np.uint8, mode="r") if size else np.empty(0, np.uint8)
+        self._decoded = (None, None)
+
+    def __len__(self):
+        return len(self.frame_events)
+
+    @property
+    def vision_events(self):
+        return [event for event in self.events if event["type"] == "vision"]
+
+    @property
+    def input_events(self):
+        return [event for event in self.events if event["type"] == "input"]
+
+    def _decode(self, event):
+        blob = self._data[event["offset"] : event["offset"] + event["length"]]
+        return np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(event["shape"])
+
+    def frame(self, index):
+        """
+        Returns (frame, origin) for a frame index. Walking forward decodes one frame per
+        step, a jump decodes from the nearest keyframe.
+        """
+        event = self.frame_events[index]
+        cached_index, cached = self._decoded
+        if cached_index is not None and cached_index <= index and not any(
+            self.frame_events[i]["key"] for i in range(cached_index + 1, index + 1)
+        ):
+            start, frame = cached_index + 1, cached.copy()
+        else:
+            start = index
+            while not self.frame_events[start]["key"]:
+                start -= 1
+            frame = self._decode(self.frame_events[start]).copy()
+            start += 1
+        for i in range(start, index + 1):
+            np.bitwise_xor(frame, self._decode(self.frame_events[i]), out=frame)
+        self._decoded = (index, frame)
+        return frame, tuple(event["origin"])
+
+
+class SessionReplay:
+    """
+    Feeds a recorded session back through the vision code of a WindowManager, without
+    a game running, and compares every lookup with what was recorded.
+
+    `seek(index)` makes a recorded frame the current frame, after which click_color,
+    template lookups and get_words_in_bounding_box work on it as if it had just been
+    captured. `run()` re-runs every recorded lookup on the frame it was made on.
+    """
+
+    def __init__(self, session, window_manager):
+        self.session = session
+        self.window_manager = window_manager
+        # Recorded frames never go stale
+        window_manager.frames.max_age = float("inf")
+        self.results = []
+
+    def seek(self, index):
+        frame, origin = self.session.frame(index)
+        self.window_manager.frames.use(frame, origin)
+
+    def lookup(self, kind, query):
+        """Runs one recorded lookup against the current frame."""
+        wm = self.window_manager
+        box = tuple(query["box"]) if query.get("box") else None
+        if kind == "color":
+            return wm.colors.find(query["colors"], box, query["tolerance"], query["min_area"])
+        if kind == "template":
+            view, origin = wm.frames.get_region(box)
+            return wm.templates.locate(
+                query["name"], view, origin, query["confidence"], query["grayscale"], query["scale"]
+            )
+        if kind == "ocr":
+            return wm.get_words_in_bounding_box(box, query.get("exact", False), query.get("names_only", False))
+        raise ValueError(f"Unknown vision event kind '{kind}'")
+
+    def run(self, kinds=None):
+        """
+        Re-runs the recorded lookups (optionally only some kinds) and returns a list of
+        (event, result, elapsed, matches_recording).
+        """
+        self.results = []
+        current = None
+        for event in self.session.vision_events:
+            if event["frame"] < 0 or (kinds and event["kind"] not in kinds):
+                continue
+            if event["frame"] != current:
+                self.seek(event["frame"])
+                current = event["frame"]
+            started = perf_counter()
+            result = self.lookup(event["kind"], event["query"])
+            elapsed = perf_counter() - started
+            self.results.append((event, result, elapsed, _plain(result) == event["result"]))
+        return self.results
+
+    def report(self):
+        """Returns a printable table of recorded vs. replayed time and mismatches per kind."""
+        counts, mismatches = Counter(), Counter()
+        recorded, replayed = Counter(), Counter()
+        for event, _, elapsed, same in self.results:
+            kind = event["kind"]
+            counts[kind] += 1
+            mismatches[kind] += not same
+            recorded[kind] += event.get("elapsed") or 0.0
+            replayed[kind] += elapsed
+        lines = [f"{'lookup':<10}{'count':>7}{'recorded ms':>13}{'replayed ms':>13}{'changed':>9}"]
+        for kind in counts:
+            lines.append(
+                f"{kind:<10}{counts[kind]:>7}{recorded[kind] * 1000:>13.1f}"
+                f"{replayed[kind] * 1000:>13.1f}{mismatches[kind]:>9}"
+            )
+        return "\n".join(lines)
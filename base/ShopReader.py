@@ -0,0 +1,106 @@
+import logging
+import re
+from collections import namedtuple
+
+# "12,500¢", "1.5M¢"; OCR often reads the ¢ as a c
+AMOUNT = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*([kmbt]?)\s*[¢c]", re.IGNORECASE)
+NUMBER = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*([kmbt]?)", re.IGNORECASE)
+STOCK = re.compile(r"x\s*(\d+)\s*stock", re.IGNORECASE)
+SUFFIXES = {"": 1, "k": 10**3, "m": 10**6, "b": 10**9, "t": 10**12}
+
+# What buy_from_gear_shop used to click for every item, used when the stock can't be read
+BLIND_CLICKS = 25
+
+
+class Offer(namedtuple("Offer", ["item", "stock", "price"])):
+    """
+    What a shop row says about an item. `stock` and `price` are None when they could
+    not be read.
+    """
+
+    __slots__ = ()
+
+
+def parse_amount(text, symbol=True):
+    """
+    Reads an amount of money like "12,500¢" or "1.5M¢". Without `symbol` the currency
+    sign isn't required, for text read next to the money icon.
+    """
+    match = (AMOUNT if symbol else NUMBER).search(text)
+    if match is None:
+        return None
+    try:
+        return int(float(match.group(1).replace(",", "")) * SUFFIXES[match.group(2).lower()])
+    except ValueError:
+        return None
+
+
+def parse_stock(text):
+    """Reads "X3 Stock" as 3 and "NO STOCK" as 0, None if the text is neither."""
+    if "no stock" in text.lower():
+        return 0
+    match = STOCK.search(text)
+    return int(match.group(1)) if match else None
+
+
+class ShopReader:
+    """
+    Reads stock and price off a shop row and the player's money off the HUD, so the
+    shop routines click "buy" exactly as often as it can succeed.
+    """
+
+    def __init__(self, window_manager, row_height=60, money_template="big_money.png", money_width=200):
+        """
+        Args:
+            window_manager: The WindowManager to read frames and text through.
+            row_height: Height of a shop row at the standard window size. The stock
+                and price are read from a band of this height around the item name.
+            money_template: The icon shown next to the player's money.
+            money_width: Width of the box left of the icon holding the amount.
+        """
+        self.window_manager = window_manager
+        self.row_height = row_height
+        self.money_template = money_template
+        self.money_width = money_width
+
+    def read_offer(self, item, coords, region):
+        """
+        Reads the stock and price shown on the row of `item`, whose name was found at
+        `coords`, inside the shop list `region` (a screen box).
+        """
+        height = self.row_height * self.window_manager.scale
+        band = (region[0], int(coords[1] - height / 3), region[2], int(coords[1] + height * 2 / 3))
+        stock = price = None
+        for text, _ in self.window_manager.get_words_in_bounding_box(band, exact=True):
+            if stock is None:
+                stock = parse_stock(text)
+            if price is None:
+                price = parse_amount(text)
+        return Offer(item, stock, price)
+
+    def read_money(self):
+        """Reads the player's money next to the money icon, None if it isn't visible."""
+        frame, origin = self.window_manager.frames.get_region()
+        match = self.window_manager.templates.locate(self.money_template, frame, origin, confidence=0.85)
+        if match is None:
+            logging.info(f"Could not find '{self.money_template}', money unknown")
+            return None
+        width = self.money_width * self.window_manager.scale
+        box = (int(match.left - width), match.top - 4, match.left, match.top + match.height + 4)
+        for text, _ in self.window_manager.get_words_in_bounding_box(box, exact=True):
+            money = parse_amount(text, symbol=False)
+            if money is not None:
+                return money
+        return None
+
+    @staticmethod
+    def clicks_needed(offer, money=None):
+        """
+        How many purchase clicks can succeed: the stock, capped by what the money
+        buys and by the old blind burst, so a cycle never clicks more than it used to.
+        Falls back to the blind burst when the stock couldn't be read.
+        """
+        clicks = BLIND_CLICKS if offer.stock is None else min(offer.stock, BLIND_CLICKS)
+        if offer.price and money is not None:
+            clicks = min(clicks, money // offer.price)
+        return max(clicks, 0)
@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from . import Conditions
+
+
+def vertical_shift(previous, current, band=32, max_error=4.0):
+    """
+    Returns how many pixels the content moved up between two frames of a scrolling
+    list, by locating the top band of `current` inside `previous`. Returns None when
+    the band can't be found (the list moved more than a full frame).
+    """
+    height = previous.shape[0]
+    band = min(band, height // 2)
+    if band == 0:
+        return None
+    previous_gray = cv2.cvtColor(previous, cv2.COLOR_BGR2GRAY)
+    current_gray = cv2.cvtColor(current[:band], cv2.COLOR_BGR2GRAY)
+    result = cv2.matchTemplate(previous_gray, current_gray, cv2.TM_SQDIFF)
+    error, _, (_, y), _ = cv2.minMaxLoc(result)
+    if error / current_gray.size > max_error ** 2:
+        return None
+    return y
+
+
+class ShopScanner:
+    """
+    Scans a scrolling shop list once and remembers where every item is.
+
+    The list is scrolled from the top to the end, consecutive frames are aligned and
+    stitched into one tall strip, and the strip goes through OCR once. The resulting
+    index (item -> scroll steps + row position) is saved to disk per shop and window
+    size, so later runs jump straight to an item and only re-scan when the live frame
+    doesn't show it where the index said it would be.
+
+    walk() visits several items in list order, so the list is only ever scrolled down
+    between two of them.
+    """
+
+    def __init__(self, macro, shop_name, region, matcher, catalog, scroll_step=-116, max_scrolls=30, index_path="cache/shop_index.json"):
+        self.macro = macro
+        self.window_manager = macro.window_manager
+        self.shop_name = shop_name
+        # A region name or a box on the standard-size window, mapped on every use
+        self.region_config = region
+        self.matcher = matcher
+        self.catalog = catalog
+        self.scroll_step = scroll_step
+        self.max_scrolls = max_scrolls
+        self.index_path = index_path
+        self.index = None
+        # Scroll steps from the top the list is at, None when unknown
+        self.position = None
+        # An index loaded from disk is re-scanned once per session for missing items
+        self.scanned = False
+
+    @property
+    def region(self):
+        """The list's screen box, following the window when it moves or is rescaled."""
+        if isinstance(self.region_config, str):
+            return self.window_manager.resolve_region(self.region_config)
+        return self.window_manager.map_box(self.region_config)
+
+    @property
+    def key(self):
+        window = self.window_manager.window
+        size = f"{window.width}x{window.height}" if window else "unknown"
+        return f"{self.shop_name}:{size}"
+
+    def _match_item(self, text):
+        match = self.matcher.match(text, self.catalog)
+        return match.item if match else None
+
+    def _read_all(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"Could not read shop index '{self.index_path}': {e}")
+            return {}
+
+    def load(self):
+        """Loads the saved index for this shop and window size, if there is one."""
+        entry = self._read_all().get(self.key)
+        if entry and entry.get("scroll_step") == self.scroll_step:
+            self.index = entry["items"]
+        return self.index
+
+    def save(self):
+        data = self._read_all()
+        data[self.key] = {"scroll_step": self.scroll_step, "items": self.index}
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.index_path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def _scroll(self, steps):
+        """Scrolls `steps` list steps down (negative goes up) and waits for the list to settle."""
+        self.macro.scroll_center(self.scroll_step * steps)
+        if self.position is not None:
+            self.position += steps
+        self.macro.wait_until(
+            Conditions.region_settled(self.window_manager, self.region), 0.5, label=f"{self.shop_name} list settled"
+        )
+
+    def scroll_to_top(self):
+        self.macro.scroll_center(10000)
+        self.position = 0
+        self.macro.wait_until(
+            Conditions.region_settled(self.window_manager, self.region), 1, label=f"{self.shop_name} list settled"
+        )
+
+    def _capture(self):
+        view, _ = self.window_manager.frames.get_region(self.region)
+        return view.copy()
+
+    def _scroll_frames(self):
+        """
+        Scrolls from the top to the end of the list one step at a time, yielding every
+        frame with how far the list moved since the previous one (None if unknown).
+        """
+        self.scroll_to_top()
+        previous = self._capture()
+        yield previous, 0
+
+        for _ in range(self.max_scrolls):
+            self._scroll(1)
+            current = self._capture()
+            shift = vertical_shift(previous, current)
+            if shift == 0:
+                break  # The list didn't move, we're at the end
+            yield current, shift
+            previous = current
+
+    def scan(self):
+        """
+        Scrolls through the whole list once and rebuilds the index. With an OCR pipeline
+        every frame is read by the workers while the list keeps scrolling, otherwise
+        the frames are stitched and the strip is read once at the end.
+        """
+        logging.info(f"Scanning the {self.shop_name} shop...")
+        pipeline = self.window_manager.ocr_pipeline
+        if pipeline is not None:
+            self._scan_pipelined(pipeline)
+        else:
+            self._scan_stitched()
+        logging.info(f"Indexed {len(self.index)} {self.shop_name} items")
+        self.scanned = True
+        # The scan ends at the bottom, but a short list may not have moved at all
+        self.position = None
+        self.save()
+        return self.index
+
+    def _scan_pipelined(self, pipeline):
+        started = perf_counter()
+        for steps, (frame, _) in enumerate(self._scroll_frames()):
+            pipeline.record("scroll", perf_counter() - started)
+            pipeline.submit((steps, frame.shape[0]), frame)
+            started = perf_counter()
+
+        self.index = {}
+        first_seen = {}
+        for (steps, height), lines in pipeline.results():
+            for text, (x, y) in lines:
+                item = self._match_item(text)
+                if item is None or item in self.index:
+                    continue
+                entry = {"scrolls": steps, "y": int(y)}
+                first_seen.setdefault(item, entry)
+                # Use the first scroll position that shows the row away from the edges
+                if y - 10 >= 0 and y + 10 < height:
+                    self.index[item] = entry
+        for item, entry in first_seen.items():
+            self.index.setdefault(item, entry)
+        pipeline.log_report()
+
+    def _scan_stitched(self):
+        pieces = []
+        offsets = []
+        for frame, shift in self._scroll_frames():
+            if pieces:
+                if shift is None:
+                    # No overlap with the last frame, treat it as directly below
+                    shift = frame.shape[0]
+                pieces.append(frame[frame.shape[0] - shift :])
+                offsets.append(offsets[-1] + shift)
+            else:
+                pieces.append(frame)
+                offsets.append(0)
+            height = frame.shape[0]
+
+        strip = np.ascontiguousarray(np.vstack(pieces))
+        lines = self.window_manager.read_names(strip, (0, 0))
+
+        self.index = {}
+        for text, (x, y) in lines:
+            item = self._match_item(text)
+            if item is None or item in self.index:
+                continue
+            # Use the first scroll position that shows the row away from the edges
+            steps = len(offsets) - 1
+            for i, offset in enumerate(offsets):
+                if offset <= y - 10 and y + 10 < offset + height:
+                    steps = i
+                    break
+            self.index[item] = {"scrolls": steps, "y": int(y - offsets[steps])}
+
+    def load_or_scan(self):
+        return self.load() or self.scan()
+
+    def _find_in_view(self, item):
+        for text, coords in self.window_manager.get_words_in_bounding_box(self.region, names_only=True):
+            if self._match_item(text) == item:
+                return coords
+        return None
+
+    def _order(self, item):
+        entry = self.index.get(item)
+        # Items the index doesn't know go last, they may cost a re-scan
+        return (0, entry["scrolls"], entry["y"]) if entry else (1, 0, 0)
+
+    def walk(self, items):
+        """
+        Yields (item, screen coordinates or None) for every item, in the order they
+        are listed in the shop, starting from the top of the list.
+        """
+        if self.index is None:
+            self.load_or_scan()
+        self.position = None
+        for item in sorted(items, key=self._order):
+            yield item, self.locate(item)
+
+    def _scroll_to(self, steps):
+        """Scrolls to `steps` steps from the top, forward from where the list is if possible."""
+        if self.position is None or self.position > steps:
+            self.scroll_to_top()
+        if steps > self.position:
+            self._scroll(steps - self.position)
+
+    def locate(self, item, rescan=True):
+        """
+        Scrolls the list so `item` is visible and returns its screen coordinates, or None
+        if the shop doesn't have it. The live frame is checked and the list re-scanned
+        once if the item isn't where the index says. An item the index doesn't have
+        at all gets one re-scan per session, in case the scan that built the index
+        misread it.
+        """
+        if self.index is None:
+            self.load_or_scan()
+        entry = self.index.get(item)
+        if entry is None and rescan and not self.scanned and self._match_item(item) == item:
+            logging.info(f"'{item}' is not in the {self.shop_name} index, re-scanning once")
+            self.scan()
+            entry = self.index.get(item)
+        if entry is None:
+            return None
+
+        moved_from_top = self.position not in (None, 0)
+        self._scroll_to(entry["scrolls"])
+        coords = self._find_in_view(item)
+        if coords is None and moved_from_top:
+            # The rows above may have changed height since the list was last at the top
+            self.scroll_to_top()
+            if entry["scrolls"]:
+                self._scroll(entry["scrolls"])
+            coords = self._find_in_view(item)
+        if coords is not None:
+            return coords
+
+        logging.info(f"'{item}' is not where the {self.shop_name} index expected it")
+        if not rescan:
+            return None
+        self.scan()
+        return self.locate(item, rescan=False)
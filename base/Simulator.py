@@ -0,0 +1,673 @@
+import copy
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import time
+import types
+
+import cv2
+import numpy as np
+
+from .CaptureBackends import SyntheticCaptureBackend
+from .Config import load_config
+from . import Tracer
+from .OcrBackends import GlyphBackend
+
+
+class VirtualClock:
+    """
+    Stands in for time.sleep and time.perf_counter: sleeping just moves the clock
+    forward, so a routine full of sleeps runs in milliseconds.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        seconds = max(seconds, 0)
+        self.now += seconds
+        self.slept += seconds
+
+
+class RealClock:
+    """
+    The VirtualClock interface on real time, for runs where several processes, each
+    with its own simulated game, have to share the wall clock.
+    """
+
+    def __init__(self):
+        self.slept = 0.0
+
+    @property
+    def now(self):
+        return time.perf_counter()
+
+    def perf_counter(self):
+        return time.perf_counter()
+
+    def sleep(self, seconds):
+        seconds = max(seconds, 0)
+        time.sleep(seconds)
+        self.slept += seconds
+
+
+class SimulatedWindow:
+    """The parts of a pygetwindow window the macro uses."""
+
+    _handles = itertools.count(1)
+
+    def __init__(self, title, left=120, top=80, width=1024, height=700):
+        self._hWnd = next(self._handles)
+        self.title = title
+        self.left, self.top, self.width, self.height = left, top, width, height
+        self.isActive = False
+        self.isMaximized = False
+
+    @property
+    def box(self):
+        return (self.left, self.top, self.width, self.height)
+
+    def activate(self):
+        self.isActive = True
+
+    def maximize(self):
+        self.isMaximized = True
+
+    def moveTo(self, x, y):
+        self.left, self.top = x, y
+
+    def resizeTo(self, width, height):
+        self.width, self.height = width, height
+        self.isMaximized = False
+
+
+class SimulatedGame:
+    """
+    A fake Roblox client drawn from templates/ and the config.json coordinates.
+
+    It reacts to the inputs the macro sends (teleport buttons, the recall wrench, the
+    gear and sell NPC dialogs, the scrolling gear list with its stock, prices and green
+    buy button, the money display, the backpack, the camera settings menu, the egg
+    prompt). GUIs open `ui_delay` virtual seconds after the input that triggers them,
+    so waits are exercised realistically.
+    """
+
+    SCREEN_SIZE = (1280, 800)
+    CLIENT_OFFSET = (8, 30)
+    ROW_HEIGHT = 60
+    BUY_COLOR = (0x26, 0xEE, 0x26)
+    SHOP_BUTTON = (110, 88)
+    CAMERA_MODES = ["default", "classic", "follow", "orbital"]
+    LIST_BACKGROUND = (70, 50, 50)
+    HUD_BACKGROUND = (40, 40, 40)
+    # font scale, BGR color, background of every kind of text the game draws
+    TEXT_STYLES = {
+        "name": (0.6, (255, 255, 255), LIST_BACKGROUND),
+        "stock": (0.5, (200, 230, 255), LIST_BACKGROUND),
+        "price": (0.5, (120, 220, 120), LIST_BACKGROUND),
+        "money": (0.6, (120, 220, 120), HUD_BACKGROUND),
+    }
+    MONEY_SYMBOL = (760, 540)
+    LOCATION_COLORS = {
+        "garden": (60, 120, 60),
+        "seeds": (140, 120, 90),
+        "sell": (140, 80, 80),
+        "gear": (60, 90, 120),
+    }
+
+    def __init__(self, config, clock, asset_path="templates", ui_delay=0.3, stock=None, prices=None, money=600_000):
+        self.config = config
+        self.clock = clock
+        self.ui_delay = ui_delay
+        self.elements = config["game_elements"]
+        self.gear_items = list(config.get("shop_items", {}).get("gear", []))
+        self.stock = dict(stock) if stock is not None else {item: (i * 7) % 4 for i, item in enumerate(self.gear_items)}
+        self.prices = dict(prices) if prices is not None else {item: 25_000 * (i + 1) for i, item in enumerate(self.gear_items)}
+        self.money = money
+        self.images = {
+            name: cv2.imread(os.path.join(asset_path, name), cv2.IMREAD_COLOR)
+            for name in ("seeds.png", "shop.png", "money_symbol.png", "big_money.png", "cameramode_follow.png")
+        }
+        # Every text drawn so far -> its grayscale image, what the simulated OCR reads
+        self.labels = {}
+        for item in self.gear_items:
+            self.label_template(item, "name")
+
+        self.window = SimulatedWindow(config["window_title"])
+        self.mouse = (0, 0)
+        self.mouse_down_at = None
+        self._pending = []
+
+        self.location = "garden"
+        self.gui = None  # "gear_dialog", "gear_shop", "sell_dialog", "egg_prompt"
+        self.settings_open = False
+        self.camera_mode = 0
+        self.camera_pitch = 0
+        self.camera_zoom = 0
+        self.backpack_open = False
+        self.search_focused = False
+        self.search_text = ""
+        self.hotbar = {}
+        self.equipped = None
+        self.walked = 0.0
+        self._walk_started = None
+        self.list_offset = 0
+        self.selected = None
+
+        # key -> how many of its next presses the game misses, to test recovery
+        self.dropped_keys = {}
+        # Pixels per virtual second players walk across the world behind the GUIs, one
+        # every 250 pixels; 0 for a still world
+        self.world_motion = 0
+
+        self.inputs = 0
+        self.purchases = {}
+        self.wasted_clicks = 0
+        self.sold = 0
+        self.eggs_bought = 0
+
+    # Geometry
+
+    def client_to_screen(self, x, y):
+        return (self.window.left + self.CLIENT_OFFSET[0] + x, self.window.top + self.CLIENT_OFFSET[1] + y)
+
+    def _element(self, name):
+        return self.client_to_screen(*self.elements[name])
+
+    def _gear_region(self):
+        left, top, right, bottom = self.config["regions"]["gear_shop"]
+        return (self.window.left + left, self.window.top + top, self.window.left + right, self.window.top + bottom)
+
+    def _row_top(self, index):
+        return self._gear_region()[1] + index * self.ROW_HEIGHT - self.list_offset
+
+    def _buy_button(self, index):
+        left = self._gear_region()[0]
+        top = self._row_top(index)
+        return (left + 10, top + 32, left + 90, top + 54)
+
+    @staticmethod
+    def _inside(point, box):
+        return box[0] <= point[0] < box[2] and box[1] <= point[1] < box[3]
+
+    @staticmethod
+    def _near(point, center, half_width, half_height):
+        return abs(point[0] - center[0]) <= half_width and abs(point[1] - center[1]) <= half_height
+
+    # Time
+
+    def _later(self, action):
+        self._pending.append((self.clock.now + self.ui_delay, action))
+
+    def _update(self):
+        due = [action for when, action in self._pending if when <= self.clock.now]
+        self._pending = [(when, action) for when, action in self._pending if when > self.clock.now]
+        for action in due:
+            action()
+
+    def _open(self, gui):
+        def action():
+            self.gui = gui
+
+        self._later(action)
+
+    def _close_guis(self):
+        self.gui = None
+        self.selected = None
+        self._pending = []
+
+    # Input
+
+    def move_to(self, x, y):
+        self._update()
+        self.mouse = (int(x), int(y))
+
+    def move_rel(self, dx, dy):
+        self._update()
+        self.mouse = (self.mouse[0] + int(dx), self.mouse[1] + int(dy))
+        if self.gui is None and not self.backpack_open and not self.settings_open:
+            self.camera_pitch += int(dy)
+
+    def mouse_down(self):
+        self._update()
+        self.mouse_down_at = self.mouse
+
+    def mouse_up(self):
+        self._update()
+        start, self.mouse_down_at = self.mouse_down_at, None
+        if start is None or not self.backpack_open:
+            return
+        if (
+            self.search_text == "recall"
+            and self._near(start, self._element("top_left_item_slot"), 25, 25)
+            and self._near(self.mouse, self._element("item_slot_two"), 25, 25)
+        ):
+            self.hotbar[self.config.get("keybinds", {}).get("recall_wrench", "2")] = "Recall Wrench"
+
+    def click(self, clicks=1):
+        for _ in range(clicks):
+            self.inputs += 1
+            self._update()
+            self._click(self.mouse)
+
+    def _click(self, point):
+        if self._near(point, self.client_to_screen(*self.SHOP_BUTTON), 32, 11):
+            self._close_guis()
+            return
+        if self.settings_open:
+            return
+
+        if self.equipped == "Recall Wrench":
+            self.equipped = None
+            self._close_guis()
+            self.location = "gear"
+            self.walked = 0.0
+            return
+
+        if self.gui == "egg_prompt":
+            if self._near(point, self.client_to_screen(400, 300), 10, 12):
+                self.eggs_bought += 1
+                self.gui = None
+            return
+        if self.gui == "gear_dialog":
+            if self._near(point, self._element("gear_option_one"), 60, 15):
+                self.gui = None
+                self._open("gear_shop")
+            return
+        if self.gui == "sell_dialog":
+            if self._near(point, self._element("sell_inventory"), 60, 15):
+                self.sold += 1
+                self.gui = None
+            return
+        if self.gui == "gear_shop":
+            if self.selected is not None and self._inside(point, self._buy_button(self.selected)):
+                item = self.gear_items[self.selected]
+                if self.stock.get(item, 0) > 0 and self.money >= self.prices[item]:
+                    self.stock[item] -= 1
+                    self.money -= self.prices[item]
+                    self.purchases[item] = self.purchases.get(item, 0) + 1
+                else:
+                    self.wasted_clicks += 1
+                return
+            if self._inside(point, self._gear_region()):
+                index = (point[1] - self._gear_region()[1] + self.list_offset) // self.ROW_HEIGHT
+                if 0 <= index < len(self.gear_items):
+                    self.selected = int(index)
+            return
+
+        if self.backpack_open:
+            self.search_focused = self._near(point, self._element("backpack_search_bar"), 80, 15)
+            return
+
+        for location, element in (("seeds", "seed_button"), ("garden", "garden_button"), ("sell", "sell_button")):
+            if self._near(point, self._element(element), 50, 17):
+                self.location = location
+                self.walked = 0.0
+                return
+
+    def press(self, key):
+        self.key_down(key)
+        self.key_up(key)
+
+    def key_down(self, key):
+        self.inputs += 1
+        self._update()
+        if self.dropped_keys.get(key, 0) > 0:
+            self.dropped_keys[key] -= 1
+            return
+        if key == "w":
+            self._walk_started = self.clock.now
+        elif key == "e" and self.gui is None:
+            if self.location == "gear":
+                self._open("egg_prompt" if self.walked > 0.5 else "gear_dialog")
+            elif self.location == "sell":
+                self._open("sell_dialog")
+        elif key == "`":
+            self.backpack_open = not self.backpack_open
+            self.search_focused = False
+            self.search_text = ""
+        elif key == "esc":
+            self.settings_open = not self.settings_open
+        elif key == "right" and self.settings_open:
+            self.camera_mode = (self.camera_mode + 1) % len(self.CAMERA_MODES)
+        elif key == "left" and self.settings_open:
+            self.camera_mode = (self.camera_mode - 1) % len(self.CAMERA_MODES)
+        elif key in self.hotbar and not self.backpack_open:
+            self.equipped = None if self.equipped else self.hotbar[key]
+
+    def key_up(self, key):
+        self._update()
+        if key == "w" and self._walk_started is not None:
+            self.walked += self.clock.now - self._walk_started
+            self._walk_started = None
+
+    def write(self, text):
+        for key in text:
+            self.inputs += 1
+            if self.backpack_open and self.search_focused:
+                self.search_text += key
+
+    def scroll(self, clicks):
+        self.inputs += 1
+        self._update()
+        if self.gui == "gear_shop" and self._inside(self.mouse, self._gear_region()):
+            region = self._gear_region()
+            content = len(self.gear_items) * self.ROW_HEIGHT
+            limit = max(content - (region[3] - region[1]), 0)
+            self.list_offset = int(min(max(self.list_offset - clicks, 0), limit))
+        elif self.gui is None:
+            self.camera_zoom += clicks
+
+    # Rendering
+
+    def _paste(self, screen, image, center):
+        height, width = image.shape[:2]
+        left, top = center[0] - width // 2, center[1] - height // 2
+        right, bottom = min(left + width, screen.shape[1]), min(top + height, screen.shape[0])
+        if left < 0 or top < 0 or right <= left or bottom <= top:
+            return
+        screen[top:bottom, left:right] = image[: bottom - top, : right - left]
+
+    def _panel(self, screen, left, top, right, bottom, color=(35, 35, 45)):
+        cv2.rectangle(screen, self.client_to_screen(left, top), self.client_to_screen(right, bottom), color, -1)
+
+    def _text_size(self, text, style):
+        scale = self.TEXT_STYLES[style][0]
+        return cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, 1)
+
+    def draw_text(self, image, text, x, y, style="name"):
+        """Draws text in one of the game's styles with its baseline at (x, y)."""
+        scale, color, _ = self.TEXT_STYLES[style]
+        cv2.putText(image, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, scale, color, 1, cv2.LINE_AA)
+        if text not in self.labels:
+            self.label_template(text, style)
+
+    def label_template(self, text, style="name"):
+        """A grayscale crop of a text as the game draws it, remembered for the OCR."""
+        (width, height), baseline = self._text_size(text, style)
+        image = np.full((height + baseline + 6, width + 6, 3), self.TEXT_STYLES[style][2], dtype=np.uint8)
+        scale, color, _ = self.TEXT_STYLES[style]
+        cv2.putText(image, text, (3, height + 3), cv2.FONT_HERSHEY_SIMPLEX, scale, color, 1, cv2.LINE_AA)
+        self.labels[text] = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return self.labels[text]
+
+    def _render_gear_list(self, screen):
+        left, top, right, bottom = self._gear_region()
+        canvas = np.full((len(self.gear_items) * self.ROW_HEIGHT, right - left, 3), self.LIST_BACKGROUND, dtype=np.uint8)
+        for index, item in enumerate(self.gear_items):
+            row = index * self.ROW_HEIGHT
+            cv2.line(canvas, (0, row), (canvas.shape[1], row), (110, 90, 90), 1)
+            (_, height), _ = self._text_size(item, "name")
+            self.draw_text(canvas, item, 10, row + 8 + height)
+            stock = self.stock.get(item, 0)
+            self.draw_text(canvas, f"x{stock} Stock" if stock else "NO STOCK", 280, row + 24, "stock")
+            self.draw_text(canvas, f"{self.prices[item]:,}c", 100, row + 50, "price")
+            if index == self.selected:
+                cv2.rectangle(canvas, (10, row + 32), (89, row + 53), self.BUY_COLOR[::-1], -1)
+        visible = canvas[self.list_offset : self.list_offset + bottom - top]
+        screen[top : top + visible.shape[0], left:right] = visible
+
+    def _render_money(self, screen):
+        x, y = self.client_to_screen(*self.MONEY_SYMBOL)
+        cv2.rectangle(screen, (x - 200, y - 16), (x + 14, y + 16), self.HUD_BACKGROUND, -1)
+        self._paste(screen, self.images["big_money.png"], (x, y))
+        text = f"{self.money:,}"
+        (width, height), _ = self._text_size(text, "money")
+        self.draw_text(screen, text, x - 14 - width, y + height // 2, "money")
+
+    def render(self):
+        """Draws the whole virtual screen as a BGR array."""
+        self._update()
+        screen = np.full((self.SCREEN_SIZE[1], self.SCREEN_SIZE[0], 3), (30, 30, 30), dtype=np.uint8)
+        w = self.window
+        cv2.rectangle(screen, (w.left, w.top), (w.left + w.width - 1, w.top + w.height - 1), (200, 200, 200), -1)
+
+        # The 3D world: a sky and ground split by a horizon that follows the camera pitch
+        client_left, client_top = self.client_to_screen(0, 0)
+        client_right = w.left + w.width - self.CLIENT_OFFSET[0]
+        client_bottom = w.top + w.height - self.CLIENT_OFFSET[0]
+        horizon = int(np.clip(client_top + 280 - self.camera_pitch // 4, client_top, client_bottom))
+        screen[client_top:horizon, client_left:client_right] = (200, 160, 110)
+        screen[horizon:client_bottom, client_left:client_right] = self.LOCATION_COLORS[self.location]
+        if self.world_motion:
+            for x in range(client_left + int(self.clock.now * self.world_motion) % 250, client_right, 250):
+                screen[client_top:client_bottom, x : min(x + 40, client_right)] = (20, 20, 20)
+
+        self._paste(screen, self.images["seeds.png"], self._element("seed_button"))
+        self._paste(screen, self.images["shop.png"], self.client_to_screen(*self.SHOP_BUTTON))
+        for element, color in (("garden_button", (80, 170, 80)), ("sell_button", (80, 80, 200))):
+            x, y = self._element(element)
+            cv2.rectangle(screen, (x - 45, y - 15), (x + 45, y + 15), color, -1)
+
+        self._render_money(screen)
+        x, y = self._element("item_slot_two")
+        cv2.rectangle(screen, (x - 25, y - 25), (x + 25, y + 25), (60, 60, 60), -1)
+        if self.hotbar:
+            cv2.rectangle(screen, (x - 15, y - 15), (x + 15, y + 15), (0, 140, 255), -1)
+
+        if self.backpack_open:
+            self._panel(screen, 80, 200, 700, 520)
+            x, y = self._element("backpack_search_bar")
+            cv2.rectangle(screen, (x - 80, y - 15), (x + 80, y + 15), (90, 90, 90), -1)
+            if self.search_text == "recall":
+                x, y = self._element("top_left_item_slot")
+                cv2.rectangle(screen, (x - 15, y - 15), (x + 15, y + 15), (0, 140, 255), -1)
+
+        if self.gui == "gear_dialog":
+            self._panel(screen, 420, 230, 720, 340)
+            x, y = self._element("gear_option_one")
+            cv2.rectangle(screen, (x - 60, y - 15), (x + 60, y + 15), (120, 120, 160), -1)
+        elif self.gui == "sell_dialog":
+            self._panel(screen, 420, 220, 720, 330)
+            x, y = self._element("sell_inventory")
+            cv2.rectangle(screen, (x - 60, y - 15), (x + 60, y + 15), (120, 160, 120), -1)
+        elif self.gui == "egg_prompt":
+            self._panel(screen, 300, 240, 500, 360)
+            self._paste(screen, self.images["money_symbol.png"], self.client_to_screen(400, 300))
+        elif self.gui == "gear_shop":
+            self._render_gear_list(screen)
+
+        if self.settings_open:
+            self._panel(screen, 200, 150, 600, 450)
+            if self.CAMERA_MODES[self.camera_mode] == "follow":
+                self._paste(screen, self.images["cameramode_follow.png"], self._element("change_camera_mode"))
+
+        return screen
+
+
+class SimulatedOcrBackend(GlyphBackend):
+    """
+    Reads the simulated game by matching the exact images of every text it has drawn,
+    so OCR works headless without screen_ocr. Where two texts match at the same spot
+    (e.g. "x1 Stock" and "x7 Stock") only the better match is kept.
+    """
+
+    name = "simulated"
+
+    def __init__(self, game, matcher, min_confidence=0.95):
+        self.game = game
+        self.matcher = matcher
+        self.fallback = None
+        self.cache_path = None
+        self.min_confidence = min_confidence
+        self.fallbacks = 0
+
+    @property
+    def templates(self):
+        return self.game.labels
+
+    def recognize(self, view, origin):
+        gray = cv2.cvtColor(view, cv2.COLOR_BGR2GRAY)
+        hits = []
+        for label, template in list(self.templates.items()):
+            height, width = template.shape
+            if height > gray.shape[0] or width > gray.shape[1]:
+                continue
+            result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (x, y) = cv2.minMaxLoc(result)
+            if score >= self.min_confidence:
+                hits.append((score, label, (x, y, x + width, y + height)))
+
+        found = []
+        kept = []
+        for score, label, box in sorted(hits, reverse=True):
+            if any(box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3] for other in kept):
+                continue
+            kept.append(box)
+            center = (origin[0] + (box[0] + box[2]) // 2, origin[1] + (box[1] + box[3]) // 2)
+            found.append((label.lower(), center, score))
+        found.sort(key=lambda hit: hit[1][1])
+        return found
+
+    def read(self, view, origin, names_only=False):
+        return [(text, center) for text, center, _ in self.recognize(view, origin)]
+
+
+class Simulator:
+    """
+    Runs the real GAGMacro/GameActions code against a SimulatedGame.
+
+    While installed, pyautogui, pydirectinput and pygetwindow are replaced by modules
+    that drive the game, and every `sleep`/`perf_counter` the macro uses runs on a
+    virtual clock. Use it as a context manager:
+
+        with Simulator() as sim:
+            macro = sim.create_macro()
+            macro.setup_window()
+            macro.game_actions.buy_from_gear_shop()
+
+    With realtime=True the game runs on the real clock instead, which is slower but
+    lets simulators in several processes interact through shared locks.
+    """
+
+    # Modules whose perf_counter drives waiting, frame aging and lost game time rather than measuring work
+    CLOCK_MODULES = ("Conditions", "FrameProvider", "InputSequence", "Watchdog", "WindowWatcher")
+
+    def __init__(self, config_path="config.json", ui_delay=0.3, stock=None, prices=None, money=600_000, realtime=False):
+        self.config = copy.deepcopy(load_config(config_path))
+        self.realtime = realtime
+        self.clock = RealClock() if realtime else VirtualClock()
+        self.game = SimulatedGame(self.config, self.clock, ui_delay=ui_delay, stock=stock, prices=prices, money=money)
+        self._temp_dir = None
+        self._saved_modules = {}
+        self._patched = []
+
+    def _input_modules(self):
+        game, clock = self.game, self.clock
+
+        pydirectinput = types.ModuleType("pydirectinput")
+        pydirectinput.PAUSE = 0.1
+
+        def paused(action):
+            def wrapper(*args, _pause=True, **kwargs):
+                action(*args, **kwargs)
+                if _pause:
+                    clock.sleep(pydirectinput.PAUSE)
+
+            return wrapper
+
+        pydirectinput.moveTo = paused(lambda x, y: game.move_to(x, y))
+        pydirectinput.moveRel = paused(lambda x=0, y=0: game.move_rel(x, y))
+        pydirectinput.click = paused(lambda x=None, y=None, button="left", clicks=1: game.click(clicks))
+        pydirectinput.mouseDown = paused(lambda button="left": game.mouse_down())
+        pydirectinput.mouseUp = paused(lambda button="left": game.mouse_up())
+        pydirectinput.press = paused(lambda key: game.press(key))
+        pydirectinput.keyDown = paused(lambda key: game.key_down(key))
+        pydirectinput.keyUp = paused(lambda key: game.key_up(key))
+        pydirectinput.write = paused(lambda text, interval=0.0: game.write(text))
+
+        pyautogui = types.ModuleType("pyautogui")
+        pyautogui.PAUSE = 0
+        pyautogui.moveTo = lambda x, y, *args, **kwargs: game.move_to(x, y)
+        pyautogui.click = lambda *args, **kwargs: game.click()
+        pyautogui.mouseDown = lambda *args, **kwargs: game.mouse_down()
+        pyautogui.mouseUp = lambda *args, **kwargs: game.mouse_up()
+        pyautogui.dragTo = lambda x, y, *args, **kwargs: (game.mouse_down(), game.move_to(x, y), game.mouse_up())
+        pyautogui.scroll = lambda clicks, *args, **kwargs: game.scroll(clicks)
+        pyautogui.getWindowsWithTitle = lambda title: [game.window] if title in game.window.title else []
+
+        pygetwindow = types.ModuleType("pygetwindow")
+        pygetwindow.getActiveWindow = lambda: game.window if game.window.isActive else None
+
+        return {"pyautogui": pyautogui, "pydirectinput": pydirectinput, "pygetwindow": pygetwindow}
+
+    def _patch(self, module, name, value):
+        if hasattr(module, name):
+            self._patched.append((module, name, getattr(module, name)))
+            setattr(module, name, value)
+
+    def install(self):
+        modules = self._input_modules()
+        for name, module in modules.items():
+            self._saved_modules[name] = sys.modules.get(name)
+            sys.modules[name] = module
+
+        from . import MacroManager  # noqa: F401 -- makes sure every macro module is loaded
+
+        # Modules sleeping through the Tracer keep its traced sleep, so sleeps still
+        # show up in traces, and only the sleep behind it is replaced
+        self._patch(Tracer, "_sleep", self.clock.sleep)
+        package = __name__.rpartition(".")[0]
+        for module_name, module in list(sys.modules.items()):
+            if not module_name.startswith(package + ".") or module is None:
+                continue
+            if getattr(module, "sleep", None) is not Tracer.sleep:
+                self._patch(module, "sleep", self.clock.sleep)
+            if module_name.rpartition(".")[2] in self.CLOCK_MODULES:
+                self._patch(module, "perf_counter", self.clock.perf_counter)
+            self._patch(module, "pyautogui", modules["pyautogui"])
+            self._patch(module, "pydirectinput", modules["pydirectinput"])
+            self._patch(module, "gw", modules["pygetwindow"])
+        return self
+
+    def uninstall(self):
+        for module, name, value in reversed(self._patched):
+            setattr(module, name, value)
+        self._patched = []
+        for name, module in self._saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        self._saved_modules = {}
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    def create_macro(self):
+        """
+        Builds a GAGMacro wired to the simulated game. Caches go to a temporary folder.
+        """
+        from .MacroManager import GAGMacro
+
+        self._temp_dir = tempfile.TemporaryDirectory()
+        config = copy.deepcopy(self.config)
+        config["shop_index_path"] = os.path.join(self._temp_dir.name, "shop_index.json")
+        config["calibration_cache"] = os.path.join(self._temp_dir.name, "calibration.json")
+        config["capture"] = {"backend": "synthetic"}
+        config["flight_recorder"] = dict(config.get("flight_recorder", {}), path=os.path.join(self._temp_dir.name, "debug"))
+        if not self.realtime:
+            # A polling thread would run on real time, poll lazily on the virtual clock
+            config["focus"] = dict(config.get("focus", {}), background=False)
+
+        macro = GAGMacro(config=config)
+        if not self.realtime:
+            # Busy-waiting never ends on a clock that only moves when slept on
+            macro.input_player.spin = 0
+        window_manager = macro.window_manager
+        window_manager.capture = window_manager.frames.backend = SyntheticCaptureBackend(self.game.render)
+        window_manager._ocr_backend = SimulatedOcrBackend(self.game, window_manager.text_matcher)
+        logging.debug("Simulated game attached to macro")
+        return macro
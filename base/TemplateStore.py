@@ -0,0 +1,196 @@
+import logging
+import os
+from collections import namedtuple
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from .Tracer import tracer
+
+
+class Match(namedtuple("Match", ["name", "left", "top", "width", "height", "score", "elapsed"])):
+    """
+    A template hit in screen coordinates. `score` is the normalized correlation and
+    `elapsed` the time the lookup took in seconds.
+    """
+
+    __slots__ = ()
+
+    @property
+    def center(self):
+        return (self.left + self.width // 2, self.top + self.height // 2)
+
+
+class Template:
+    """
+    A template image decoded once, with the arrays and statistics matching needs.
+    """
+
+    def __init__(self, name, image):
+        self.name = name
+        if image.ndim == 3 and image.shape[2] in (2, 4):
+            # Like pyscreeze, the alpha channel is ignored when matching
+            image = image[..., :-1]
+        if image.ndim == 3 and image.shape[2] == 1:
+            image = image[..., 0]
+        if image.ndim == 2:
+            # A grayscale PNG, color matching compares it as gray BGR
+            self.gray = np.ascontiguousarray(image)
+            self.bgr = cv2.cvtColor(self.gray, cv2.COLOR_GRAY2BGR)
+        else:
+            self.bgr = np.ascontiguousarray(image)
+            self.gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        self.height, self.width = self.gray.shape
+        mean, std = cv2.meanStdDev(self.gray)
+        self.mean = float(mean[0][0])
+        self.std = float(std[0][0])
+        self._scaled = {}
+
+    def scaled(self, scale):
+        """Returns this template resized by `scale`, cached per scale."""
+        scale = round(scale, 3)
+        if scale == 1:
+            return self
+        if scale not in self._scaled:
+            size = (max(int(round(self.width * scale)), 1), max(int(round(self.height * scale)), 1))
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            self._scaled[scale] = Template(self.name, cv2.resize(self.bgr, size, interpolation=interpolation))
+        return self._scaled[scale]
+
+    @property
+    def is_flat(self):
+        """A single-colored template has no correlation to speak of."""
+        return self.std < 1e-6
+
+
+class TemplateStore:
+    """
+    Loads every image under the templates folder once and matches them against
+    frames in memory with cv2.matchTemplate.
+    """
+
+    EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+    def __init__(self, asset_path="templates"):
+        self.asset_path = asset_path
+        # Loaded on first lookup so constructing the store costs nothing at startup
+        self.templates = None
+        # How much larger the game is drawn than the size the templates were cut at
+        self.scale = 1.0
+        # name -> [lookups, hits, total seconds]
+        self.timings = {}
+        # A SessionRecorder that gets every lookup, see SessionRecorder.attach
+        self.recorder = None
+
+    def load(self):
+        """(Re)loads all templates from disk."""
+        self.templates = {}
+        if not os.path.isdir(self.asset_path):
+            logging.error(f"Template folder not found at '{self.asset_path}'")
+            return
+        for filename in sorted(os.listdir(self.asset_path)):
+            if not filename.lower().endswith(self.EXTENSIONS):
+                continue
+            image = cv2.imread(os.path.join(self.asset_path, filename), cv2.IMREAD_UNCHANGED)
+            if image is None:
+                logging.warning(f"Could not decode template '{filename}'")
+                continue
+            self.templates[filename] = Template(filename, image)
+        logging.debug(f"Loaded {len(self.templates)} templates from '{self.asset_path}'")
+
+    def get(self, name):
+        """Returns a template by file name (a path is reduced to its file name)."""
+        if self.templates is None:
+            self.load()
+        return self.templates.get(os.path.basename(name))
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def _record(self, name, elapsed, hit):
+        entry = self.timings.setdefault(name, [0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += int(hit)
+        entry[2] += elapsed
+
+    def _record_lookup(self, name, frame, origin, confidence, grayscale, scale, match, started):
+        box = (origin[0], origin[1], origin[0] + frame.shape[1], origin[1] + frame.shape[0])
+        query = {"name": name, "box": box, "confidence": confidence, "grayscale": grayscale, "scale": scale}
+        self.recorder.vision("template", query, match, perf_counter() - started)
+
+    def _match(self, template, haystack, origin, confidence, grayscale, started):
+        needle = template.gray if grayscale else template.bgr
+        if template.is_flat or needle.shape[0] > haystack.shape[0] or needle.shape[1] > haystack.shape[1]:
+            elapsed = perf_counter() - started
+            self._record(template.name, elapsed, False)
+            return None
+
+        result = cv2.matchTemplate(haystack, needle, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        elapsed = perf_counter() - started
+        hit = score >= confidence
+        self._record(template.name, elapsed, hit)
+        logging.debug(f"Template '{template.name}' score {score:.3f} in {elapsed * 1000:.2f}ms")
+        if not hit:
+            return None
+        return Match(template.name, origin[0] + x, origin[1] + y, template.width, template.height, score, elapsed)
+
+    @tracer.traced("match", "locate template")
+    def locate(self, name, frame, origin=(0, 0), confidence=0.9, grayscale=False, scale=None):
+        """
+        Finds the best match of one template in a BGR frame.
+
+        Args:
+            name: The template file name, e.g. "shop.png".
+            frame: A BGR array, usually a view handed out by the FrameProvider.
+            origin: Screen coordinates of the frame's top-left pixel.
+            confidence: Minimum normalized correlation to count as found.
+            grayscale: Match on grayscale, roughly three times faster.
+            scale: Resize the template by this factor first. Defaults to self.scale.
+
+        Returns:
+            A Match, or None if the template is unknown or scored below confidence.
+        """
+        started = perf_counter()
+        template = self.get(name)
+        if template is None:
+            logging.error(f"Template '{name}' not found in '{self.asset_path}'")
+            return None
+        scale = self.scale if scale is None else scale
+        template = template.scaled(scale)
+        haystack = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if grayscale else frame
+        match = self._match(template, haystack, origin, confidence, grayscale, started)
+        if self.recorder is not None:
+            self._record_lookup(name, frame, origin, confidence, grayscale, scale, match, started)
+        return match
+
+    @tracer.traced("match", "locate templates")
+    def locate_many(self, names, frame, origin=(0, 0), confidence=0.9, grayscale=False):
+        """
+        Looks up several templates against the same frame, converting it only once.
+
+        Returns:
+            A dict mapping each name to its Match, or None if it was not found.
+        """
+        haystack = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if grayscale else frame
+        matches = {}
+        for name in names:
+            started = perf_counter()
+            template = self.get(name)
+            if template is None:
+                logging.error(f"Template '{name}' not found in '{self.asset_path}'")
+                matches[name] = None
+                continue
+            template = template.scaled(self.scale)
+            matches[name] = self._match(template, haystack, origin, confidence, grayscale, started)
+            if self.recorder is not None:
+                self._record_lookup(name, frame, origin, confidence, grayscale, self.scale, matches[name], started)
+        return matches
+
+    def report(self):
+        """Returns a printable table of lookups, hits and average time per template."""
+        lines = [f"{'template':<24}{'lookups':>8}{'hits':>6}{'avg ms':>9}"]
+        for name, (lookups, hits, total) in sorted(self.timings.items()):
+            lines.append(f"{name:<24}{lookups:>8}{hits:>6}{total / lookups * 1000:>9.2f}")
+        return "\n".join(lines)
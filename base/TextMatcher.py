@@ -0,0 +1,177 @@
+from collections import namedtuple
+
+
+CatalogMatch = namedtuple("CatalogMatch", ["item", "catalog", "confidence", "distance"])
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def substring_distance(pattern, text, limit):
+    """
+    The smallest edit distance between `pattern` and any substring of `text`
+    (Sellers' algorithm), or limit + 1 once it is clear the result exceeds `limit`.
+    """
+    m = len(pattern)
+    column = list(range(m + 1))
+    best = m
+    for ch in text:
+        diagonal = 0
+        left = 0
+        for i in range(1, m + 1):
+            up = column[i]
+            value = diagonal if pattern[i - 1] == ch else diagonal + 1
+            if up + 1 < value:
+                value = up + 1
+            if left + 1 < value:
+                value = left + 1
+            column[i] = left = value
+            diagonal = up
+        if left < best:
+            best = left
+            if best == 0:
+                break
+    return best if best <= limit else limit + 1
+
+
+class TextMatcher:
+    """
+    Matches OCR lines against the shop catalogs from config.json.
+
+    All item names are compiled once into an Aho-Corasick automaton, so exact hits of
+    any name in a line are found in a single pass over the line. Lines with OCR typos
+    fall back to a trigram index that shortlists a few names, which are then checked
+    with a bounded edit distance.
+    """
+
+    def __init__(self, catalogs, max_error=0.25, candidates=3):
+        """
+        Args:
+            catalogs: A dict mapping catalog names (e.g. "gear") to lists of item names.
+            max_error: The largest edit distance accepted, as a fraction of the name length.
+            candidates: How many names the trigram index hands to the edit distance check.
+        """
+        self.max_error = max_error
+        self.candidates = candidates
+        self.patterns = []
+        for catalog, items in catalogs.items():
+            for item in items:
+                self.patterns.append((_normalize(item), item, catalog))
+        self._build_automaton()
+        self._build_trigram_index()
+
+    def _build_automaton(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, (pattern, _, _) in enumerate(self.patterns):
+            node = 0
+            for ch in pattern:
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    next_node = len(self._goto) - 1
+                    self._goto[node][ch] = next_node
+                node = next_node
+            self._output[node].append(index)
+
+        queue = list(self._goto[0].values())
+        while queue:
+            node = queue.pop(0)
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0) if node else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _build_trigram_index(self):
+        self._trigram_index = {}
+        self._trigram_counts = []
+        for index, (pattern, _, _) in enumerate(self.patterns):
+            grams = _trigrams(pattern)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._trigram_index.setdefault(gram, []).append(index)
+
+    def _exact(self, text, allowed):
+        best = None
+        node = 0
+        for ch in text:
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for index in self._output[node]:
+                if allowed is not None and self.patterns[index][2] not in allowed:
+                    continue
+                if best is None or len(self.patterns[index][0]) > len(self.patterns[best][0]):
+                    best = index
+        return best
+
+    def _fuzzy(self, text, allowed):
+        shared = {}
+        for gram in _trigrams(text):
+            for index in self._trigram_index.get(gram, ()):
+                shared[index] = shared.get(index, 0) + 1
+        ranked = sorted(shared, key=lambda index: shared[index] / self._trigram_counts[index], reverse=True)
+
+        best = None
+        checked = 0
+        for index in ranked:
+            pattern, item, catalog = self.patterns[index]
+            if allowed is not None and catalog not in allowed:
+                continue
+            limit = int(len(pattern) * self.max_error)
+            distance = substring_distance(pattern, text, limit)
+            if distance <= limit:
+                confidence = 1 - distance / len(pattern)
+                if best is None or confidence > best.confidence:
+                    best = CatalogMatch(item, catalog, confidence, distance)
+                if distance <= 1:
+                    break  # Can't do much better than one typo
+            checked += 1
+            if checked >= self.candidates:
+                break
+        return best
+
+    def match(self, text, catalogs=None):
+        """
+        Returns the best CatalogMatch for one OCR line, or None.
+
+        Args:
+            text: The OCR line.
+            catalogs: Limits matching to these catalog names (a name or a list).
+        """
+        if isinstance(catalogs, str):
+            catalogs = (catalogs,)
+        allowed = set(catalogs) if catalogs is not None else None
+        text = _normalize(text)
+
+        index = self._exact(text, allowed)
+        if index is not None:
+            _, item, catalog = self.patterns[index]
+            return CatalogMatch(item, catalog, 1.0, 0)
+        return self._fuzzy(text, allowed)
+
+    def match_lines(self, lines, catalogs=None):
+        """
+        Matches the output of WindowManager.get_words_in_bounding_box.
+
+        Returns:
+            A list of (match, (x, y)) for every line that matched an item.
+        """
+        matches = []
+        for text, coords in lines:
+            match = self.match(text, catalogs)
+            if match is not None:
+                matches.append((match, coords))
+        return matches
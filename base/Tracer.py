@@ -0,0 +1,186 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter
+from time import perf_counter
+
+# Span categories whose time is broken out per action: a span of one of these counts
+# towards its own category, minus whatever nested spans of these it contains.
+MEASURED = ("sleep", "input", "capture", "match", "ocr")
+
+# Looked up on every call so the simulator can swap in its virtual clock
+_sleep = time.sleep
+
+
+class _NullSpan:
+    """What span() hands out while tracing is off: entering and leaving do nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start", "breakdown")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.breakdown = Counter()
+
+    def __enter__(self):
+        self.tracer._stack().append(self)
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer._close(self, perf_counter())
+        return False
+
+
+class Tracer:
+    """
+    Records nested timing spans of the macro's actions and routines.
+
+    Every span knows how much of its wall time went to sleeping, sending input,
+    capturing, template/color matching and OCR, counting each nested span once.
+    Spans are exported as Chrome trace JSON (open in chrome://tracing or Perfetto)
+    or summarized as a table. While disabled, span() returns a shared no-op object
+    and traced functions run after a single attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started = 0.0
+        # (name, category, start, duration, thread id, args, breakdown)
+        self.events = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.clear()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self.events = []
+        self.started = perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _close(self, span, end):
+        duration = end - span.start
+        stack = self._stack()
+        stack.pop()
+        if span.cat in MEASURED:
+            span.breakdown[span.cat] += duration - sum(span.breakdown.values())
+        if stack:
+            stack[-1].breakdown.update(span.breakdown)
+        with self._lock:
+            self.events.append(
+                (span.name, span.cat, span.start, duration, threading.get_ident(), span.args, span.breakdown)
+            )
+
+    def span(self, name, cat="action", **args):
+        """
+        A context manager timing the code inside it:
+
+            with tracer.span("scan gear shop", "routine"):
+                ...
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def traced(self, cat="action", name=None):
+        """Decorator form of span(), named after the function by default."""
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, span_name, cat, {}):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def export_chrome(self, path):
+        """Writes the recorded spans as a Chrome trace JSON file."""
+        pid = os.getpid()
+        trace_events = []
+        for name, cat, start, duration, tid, args, breakdown in self.events:
+            args = dict(args)
+            args.update({f"{key}_ms": round(value * 1000, 3) for key, value in breakdown.items()})
+            trace_events.append({
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": round((start - self.started) * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            })
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self, categories=("routine", "action")):
+        """
+        Returns a printable table with, per routine and action, how often it ran, its
+        total time and how that time splits into sleeping, input, capture, matching,
+        OCR and everything else.
+        """
+        rows = {}
+        for name, cat, _, duration, _, _, breakdown in self.events:
+            if cat not in categories:
+                continue
+            row = rows.setdefault((cat, name), [0, 0.0, Counter()])
+            row[0] += 1
+            row[1] += duration
+            row[2].update(breakdown)
+
+        header = f"{'span':<32}{'count':>6}{'total s':>9}" + "".join(f"{key:>9}" for key in MEASURED) + f"{'other':>9}"
+        lines = [header]
+        for (cat, name), (count, total, breakdown) in sorted(rows.items(), key=lambda item: -item[1][1]):
+            other = total - sum(breakdown.values())
+            lines.append(
+                f"{cat[0]}:{name:<30}{count:>6}{total:>9.2f}"
+                + "".join(f"{breakdown[key]:>9.2f}" for key in MEASURED)
+                + f"{other:>9.2f}"
+            )
+        return "\n".join(lines)
+
+
+tracer = Tracer()
+
+
+def sleep(seconds):
+    """time.sleep, recorded as a "sleep" span while tracing."""
+    if not tracer.enabled:
+        return _sleep(seconds)
+    with _Span(tracer, "sleep", "sleep", {"seconds": seconds}):
+        _sleep(seconds)
@@ -0,0 +1,159 @@
+import logging
+from collections import Counter
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from .Tracer import sleep, tracer
+
+
+class StuckError(RuntimeError):
+    """A routine step did not reach the state it expected; the routine is abandoned."""
+
+    def __init__(self, step, detail=""):
+        super().__init__(f"Stuck at '{step}'" + (f": {detail}" if detail else ""))
+        self.step = step
+
+
+def fingerprint(view, size=16):
+    """
+    A cheap fingerprint of a frame: the frame shrunk to size x size gray cells. Two
+    frames of the same screen have (nearly) the same cells, see distance().
+    """
+    if view.size == 0:
+        return np.zeros((size, size), dtype=np.int16)
+    gray = cv2.cvtColor(view, cv2.COLOR_BGR2GRAY) if view.ndim == 3 else view
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def distance(a, b, tolerance=8):
+    """How many cells of two fingerprints differ by more than `tolerance` gray levels."""
+    return int(np.count_nonzero(np.abs(a - b) > tolerance))
+
+
+class Watchdog:
+    """
+    Notices when a routine is stuck and gets the game back to a known state, instead
+    of letting the routine click blindly through the rest of the cycle.
+
+    Routines report the steps they depend on with expect(), and call checkpoint()
+    after an input that should have moved the screen on, e.g. every purchase in a
+    shop list. Call it only after sending input, a lookup that found nothing changed
+    nothing to compare. A failed expectation, or the same fingerprint at
+    `stall_limit + 1` checkpoints of one step in a row, raises StuckError.
+
+    run() catches it, dumps the flight recorder and recovers with escalating routines
+    (close GUIs, then also go to the garden, then also redo the camera setup), waiting
+    longer after each failure in a row, and runs the routine again up to `retries`
+    times.
+
+    Counters: failures per step, recoveries, and the time lost to failed attempts,
+    backoff and recovery.
+    """
+
+    def __init__(self, game_actions, retries=1, backoff=1.0, max_backoff=60.0, stall_limit=3, hash_distance=4):
+        self.game_actions = game_actions
+        self.macro = game_actions.macro
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stall_limit = stall_limit
+        self.hash_distance = hash_distance
+
+        self.consecutive = 0
+        self._last_print = None
+        self._stalls = 0
+        self._step = None
+
+        self.runs = 0
+        self.failures = Counter()
+        self.recoveries = 0
+        self.failed_recoveries = 0
+        self.lost = 0.0
+
+    def expect(self, ok, step):
+        """Raises StuckError unless `ok`, e.g. the result of GAGMacro.wait_until."""
+        if not ok:
+            raise StuckError(step, "expected state not reached")
+        return ok
+
+    def checkpoint(self, step, region=None):
+        """
+        Fingerprints the region (default: whole window). Raises StuckError if it has
+        not changed over the last `stall_limit` checkpoints of this step, meaning the
+        inputs in between did nothing. `hash_distance` cells may differ by noise.
+        """
+        window_manager = self.macro.window_manager
+        view, _ = window_manager.frames.get_region(window_manager.resolve_region(region))
+        current = fingerprint(view)
+        if step == self._step and self._last_print is not None and distance(current, self._last_print) <= self.hash_distance:
+            self._stalls += 1
+        else:
+            self._stalls = 0
+        self._step = step
+        self._last_print = current
+        if self._stalls >= self.stall_limit:
+            raise StuckError(step, f"screen unchanged for {self._stalls + 1} checkpoints")
+
+    def _reset_progress(self):
+        self._step = None
+        self._last_print = None
+        self._stalls = 0
+
+    def run(self, name, routine):
+        """Runs a routine, recovering and retrying it when it gets stuck."""
+        for attempt in range(self.retries + 1):
+            self.runs += 1
+            self._reset_progress()
+            started = perf_counter()
+            try:
+                result = routine()
+                self.consecutive = 0
+                return result
+            except StuckError as e:
+                self.failures[e.step] += 1
+                self.consecutive += 1
+                logging.warning(f"Routine '{name}' got stuck (attempt {attempt + 1}): {e}")
+                self.macro.flight_recorder.dump(f"stuck_{name}_{e.step}")
+                self.recover()
+                self.lost += perf_counter() - started
+        logging.error(f"Routine '{name}' is still stuck after {self.retries + 1} attempts, skipping it")
+        return False
+
+    def recover_from(self, step):
+        """Counts a failed step and recovers, without abandoning the routine."""
+        started = perf_counter()
+        self.failures[step] += 1
+        self.consecutive += 1
+        logging.warning(f"Step '{step}' failed, recovering")
+        self.macro.flight_recorder.dump(f"stuck_{step}")
+        self.recover()
+        self.lost += perf_counter() - started
+
+    @tracer.traced("routine", "recover")
+    def recover(self):
+        """Waits out the backoff, then runs recovery steps matching how often it failed in a row."""
+        delay = min(self.backoff * 2 ** (self.consecutive - 1), self.max_backoff)
+        level = min(self.consecutive, 3)
+        logging.info(f"Recovering at level {level} after {delay:.1f}s")
+        sleep(delay)
+        try:
+            self.game_actions.close_gui()
+            if level >= 2:
+                self.game_actions.goto_garden()
+                sleep(0.5)
+            if level >= 3:
+                self.game_actions.set_camera_and_settings()
+            self.recoveries += 1
+        except Exception as e:
+            self.failed_recoveries += 1
+            logging.exception(f"Recovery failed: {e}")
+
+    def report(self):
+        failures = sum(self.failures.values())
+        steps = ", ".join(f"{step} {count}" for step, count in self.failures.most_common()) or "none"
+        return (
+            f"Watchdog: {self.runs} routine runs, {failures} stuck ({steps}), "
+            f"{self.recoveries} recoveries ({self.failed_recoveries} failed), {self.lost:.1f}s lost"
+        )
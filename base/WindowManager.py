@@ -1,55 +1,158 @@
-import json
+import logging
 import sys
-from time import sleep
-import pyautogui
-from screen_ocr import Reader
+import threading
+from time import perf_counter
+from . import Conditions
+from .Calibration import Calibrator
+from .CaptureBackends import create_capture_backend
+from .ColorSearch import ColorSearch
+from .Config import load_config
+from .FrameProvider import FrameProvider
+from .GameState import StateReader
+from .OcrBackends import create_ocr_backend
+from .OcrCache import OcrCache
+from .OcrPipeline import OcrPipeline
+from .TemplateStore import TemplateStore
+from .TextMatcher import TextMatcher
+from .Tracer import tracer
+from .WindowWatcher import WindowWatcher
 
 
 class WindowManager:
-    def __init__(self, config_path='config.json'):
-        self.config = self._load_config(config_path)
+    def __init__(self, config_path='config.json', config=None):
+        self.config = config if config is not None else self._load_config(config_path)
         self.os_name = sys.platform
 
         self.window = None
         self.yOffset = self.config['title_bar_offsets'].get(self.os_name, 30)
         self.xOffset = self.config['border_offsets'].get(self.os_name, 5)
-        self.ocr_reader = Reader.create_quality_reader()
+        # How much larger the game is drawn than the standard size config.json was measured at
+        self.scale = 1.0
+        self.text_matcher = TextMatcher(self.config.get('shop_items', {}))
+        # Built on first use, creating the OCR reader is the slowest part of startup
+        self._ocr_backend = None
+        # OCR pipeline workers may ask for the backend first
+        self._ocr_lock = threading.Lock()
+        ocr_cache_config = self.config.get('ocr_cache', {})
+        self.ocr_cache = OcrCache(ocr_cache_config.get('capacity', 64))
+        self.ocr_row_height = ocr_cache_config.get('row_height')
+        self.ocr_workers = self.config.get('ocr_pipeline', {}).get('workers', 2)
+        self._ocr_pipeline = None
+        self.capture = create_capture_backend(self.config.get('capture', {}).get('backend', 'auto'))
+        self.frames = FrameProvider(self, self.capture, self.config.get('frame_cache', {}).get('max_age', 0.5))
+        self.calibrated = False
+        self.calibration = None
+        self.calibrated_size = None
+        focus_config = self.config.get('focus', {})
+        self.watcher = WindowWatcher(
+            self,
+            focus_config.get('poll_interval', 0.1),
+            focus_config.get('background', False),
+            focus_config.get('resume_timeout'),
+        )
+        self.templates = TemplateStore("templates")
+        self.colors = ColorSearch(self.frames, self.resolve_region)
+        game_state_config = self.config.get('game_state', {})
+        self.state = StateReader(self, game_state_config.get('probes'), game_state_config.get('stride', 2))
+        self.calibrator = Calibrator(self, self.config.get('calibration_cache', 'cache/calibration.json'))
 
     def _load_config(self, path):
         """Loads the JSON configuration file."""
-        with open(path, 'r') as f:
-            return json.load(f)
+        return load_config(path)
+
+    @property
+    def ocr_backend(self):
+        """The OCR backend from config.json, created the first time text is read."""
+        if self._ocr_backend is None:
+            with self._ocr_lock:
+                if self._ocr_backend is None:
+                    ocr_config = self.config.get('ocr', {})
+                    self._ocr_backend = create_ocr_backend(
+                        ocr_config.get('backend', 'screen_ocr'),
+                        self.text_matcher,
+                        ocr_config.get('glyph_cache', 'cache/glyphs.npz'),
+                        ocr_config.get('min_confidence', 0.85),
+                    )
+        return self._ocr_backend
+
+    @property
+    def ocr_pipeline(self):
+        """
+        The pool reading frames while the list keeps scrolling, None when
+        ocr_pipeline.workers is 0 and OCR runs on the main thread.
+        """
+        if self._ocr_pipeline is None and self.ocr_workers > 0:
+            self._ocr_pipeline = OcrPipeline(self.read_names, self.ocr_workers)
+        return self._ocr_pipeline
+
+    def close(self):
+        """Stops the window watcher and OCR workers and releases the capture backend."""
+        self.watcher.stop()
+        if self._ocr_pipeline is not None:
+            self._ocr_pipeline.close()
+            self._ocr_pipeline = None
+        self.capture.close()
+
+    def find_windows(self):
+        """Every window titled exactly like window_title, in the order the OS lists them."""
+        # Imported here, so the vision code also runs headless, e.g. to replay a session
+        import pyautogui
 
-    def setup_window(self):
-        """Finds, activates, and standardizes the target window."""
-        
         windows = pyautogui.getWindowsWithTitle(self.config['window_title']) # type: ignore
-        if not windows:
-            print("Error: Roblox window not found.")
+        # get windows containing only "Roblox"
+        return [w for w in windows if self.config['window_title'] == w.title]
+
+    def setup_window(self, index=0, position=(0, 0), handle=None):
+        """
+        Finds, activates, and standardizes the target window.
+
+        Args:
+            index: Which of the matching windows to use, when several clients are open.
+            position: Where the top left corner of the window is moved to.
+            handle: The window handle (HWND) to use instead of `index`. The OS lists
+                windows in Z-order, so an index changes whenever another one is
+                activated; a handle doesn't.
+        """
+        
+        windows = self.find_windows()
+        if handle is not None:
+            windows = [w for w in windows if getattr(w, '_hWnd', None) == handle]
+            index = 0
+            if not windows:
+                print(f"Error: Roblox window {handle} not found.")
+                return False
+        if len(windows) <= index:
+            print(f"Error: Roblox window {index + 1} not found ({len(windows)} open).")
             return False
         
-        # get window containing only "Roblox"
-        windows = [w for w in windows if self.config['window_title'] == w.title]
-        self.window = windows[0]
+        self.window = windows[index]
         try:
+            # Each step continues as soon as the window reports the new state,
+            # the old fixed delays are the timeouts
             self.window.activate()
-            sleep(0.3)
-            self.window.maximize()
-            sleep(0.3)
-            self.window.moveTo(0, 0)
-            sleep(0.3)
-            self.window.resizeTo(self.config['standard_width'], self.config['standard_height'])
-            sleep(0.5)
-            # get client offset
-            location = pyautogui.locateCenterOnScreen(
-                "templates/seeds.png",
-                region=self.window.box,
-                confidence=0.95
-            )
-            if location:
-                self.xOffset = location.x - self.config.get("game_elements").get("seed_button")[0]
-                self.yOffset = location.y - self.config.get("game_elements").get("seed_button")[1]
-                print(f"Height and width of top bar/sidebar: {self.xOffset}, y: {self.yOffset}")
+            Conditions.wait_until(lambda: self.window.isActive, 0.3, label="window active")
+            if self.config.get('resize_window', True):
+                width, height = self.config['standard_width'], self.config['standard_height']
+                self.window.maximize()
+                Conditions.wait_until(lambda: self.window.isMaximized, 0.3, label="window maximized")
+                self.window.moveTo(*position)
+                Conditions.wait_until(lambda: (self.window.left, self.window.top) == tuple(position), 0.3, label="window moved")
+                self.window.resizeTo(width, height)
+                Conditions.wait_until(lambda: (self.window.width, self.window.height) == (width, height), 0.3, label="window resized")
+                # the window moved, wait for the game to redraw at the new size
+                Conditions.wait_until(
+                    Conditions.region_settled(self), 0.5, frames=self.frames, label="game redrawn"
+                )
+            self.frames.invalidate()
+
+            # get client offset and scale
+            calibration = self.calibrator.run()
+            if calibration:
+                self.apply_calibration(calibration)
+                print(f"Height and width of top bar/sidebar: {self.xOffset}, y: {self.yOffset}, scale: {self.scale:.2f}")
+            else:
+                self.apply_default_offsets()
+            self.watcher.watch(self.window)
 
         except Exception as e:
             print(f"Error standardizing window {e}")
@@ -68,34 +171,128 @@ class WindowManager:
         center_y = self.window.top + self.window.height // 2
         return (center_x, center_y)
 
-    def get_words_in_bounding_box(self, bounding_box):
+    def apply_calibration(self, calibration):
+        """Uses a Calibration's client offsets and scale for all coordinate mapping."""
+        self.xOffset = self.window.left + calibration.client_x
+        self.yOffset = self.window.top + calibration.client_y
+        self.scale = calibration.scale
+        self.templates.scale = calibration.scale
+        self.calibration = calibration
+        self.calibrated_size = (self.window.width, self.window.height)
+        self.calibrated = True
+        self.frames.invalidate()
+
+    def apply_default_offsets(self):
+        """
+        Falls back to the title bar and border sizes from config.json when the window
+        couldn't be calibrated, measured from wherever the window is.
+        """
+        logging.warning("Window calibration failed, using the default title bar and border offsets")
+        self.xOffset = self.window.left + self.config['border_offsets'].get(self.os_name, 5)
+        self.yOffset = self.window.top + self.config['title_bar_offsets'].get(self.os_name, 30)
+        self.scale = self.templates.scale = 1.0
+        self.calibration = None
+        self.calibrated = False
+        self.frames.invalidate()
+
+    def window_changed(self):
+        """
+        Called when the window moved: the calibration is relative to the window, so it
+        is re-applied as is, unless the window was also resized and needs a new one.
+        """
+        calibration = self.calibration
+        if calibration is None or self.calibrated_size != (self.window.width, self.window.height):
+            self.frames.invalidate()
+            calibration = self.calibrator.run()
+        if calibration:
+            self.apply_calibration(calibration)
+        else:
+            self.apply_default_offsets()
+
+    def capture_box(self):
+        """
+        The (left, top, right, bottom) screen box frames are captured from: the client
+        area once calibrated, the whole window before that, None without a window.
+        """
+        if not self.window:
+            return None
+        right = self.window.left + self.window.width
+        bottom = self.window.top + self.window.height
+        if not self.calibrated:
+            return (self.window.left, self.window.top, right, bottom)
+        # The side and bottom borders are as wide as the left one
+        border = self.xOffset - self.window.left
+        return (self.xOffset, self.yOffset, right - border, bottom - border)
+
+    def to_screen(self, x, y):
+        """Maps CLIENT coordinates from config.json to screen coordinates."""
+        return (self.xOffset + int(round(x * self.scale)), self.yOffset + int(round(y * self.scale)))
+
+    def map_box(self, box):
+        """
+        Maps a (left, top, right, bottom) box measured on the standard-size window at
+        (0, 0) to the screen, following the window's position and scale. Only the
+        client part of the box is scaled, the title bar and border keep their size.
+        """
+        client_x, client_y = self.config.get('region_client_origin', (8, 30))
+        left, top = self.to_screen(box[0] - client_x, box[1] - client_y)
+        right, bottom = self.to_screen(box[2] - client_x, box[3] - client_y)
+        return (left, top, right, bottom)
+
+    def resolve_region(self, region):
+        """
+        Turns a region name from config.json into a (left, top, right, bottom) screen
+        box. Explicit boxes are passed through and None means the whole window.
+        """
+        if region is None or not isinstance(region, str):
+            return region
+        regions = self.config.get('regions', {})
+        if region not in regions:
+            logging.error(f"Region '{region}' not found in config")
+            return None
+        return self.map_box(regions[region])
+
+    @tracer.traced()
+    def get_words_in_bounding_box(self, bounding_box, exact=False, names_only=False):
         """
         Performs OCR on a screen region and returns a list of lowercase text lines.
+        Results are cached by region content, so an unchanged region is not read twice.
         
         Args:
             bounding_box: A tuple (left, top, right, bottom) defining the area.
-            ocr_reader: An initialized screen_ocr.Reader instance.
+            exact: Cache by the exact region content, for numbers like stock and
+                prices that the perceptual hash can't tell apart.
+            names_only: Only catalog names are needed, see OcrBackend.
 
         Returns:
             A list of tuples, where each tuple contains:
             - A lowercase string of the detected line of text.
             - A tuple (x, y) for the line's center coordinates.
         """
-        result = self.ocr_reader.read_screen(bounding_box)
-        
-        output = []
-        for line in result.result.lines:
-            if not line.words:
-                continue
-                
-            line_text = "".join(word.text + " " for word in line.words).strip().lower()
-            
-            first_word = line.words[0]
-            last_word = line.words[-1]
-            
-            mid_y = int(first_word.top + (first_word.height / 2))
-            mid_x = int((first_word.left + (last_word.left + last_word.width)) / 2)
-            
-            output.append((line_text, (mid_x, mid_y)))
-            
-        return output
\ No newline at end of file
+        started = perf_counter()
+        view, origin = self.frames.get_region(bounding_box)
+        reader, kind = (self.read_name_lines, "names") if names_only else (self.read_lines, None)
+        if self.ocr_row_height:
+            lines = self.ocr_cache.read_rows(view, origin, self.ocr_row_height, reader, exact, kind)
+        else:
+            lines = self.ocr_cache.read(view, origin, reader, exact, kind)
+        if self.frames.recorder is not None:
+            query = {"box": bounding_box, "exact": exact, "names_only": names_only}
+            self.frames.recorder.vision("ocr", query, lines, perf_counter() - started)
+        return lines
+
+    def read_cached(self, view, origin):
+        """read_lines through the OCR cache."""
+        return self.ocr_cache.read(view, origin, self.read_lines)
+
+    def read_names(self, view, origin):
+        """Like read_cached, for regions where only catalog names are needed."""
+        return self.ocr_cache.read(view, origin, self.read_name_lines, kind="names")
+
+    def read_name_lines(self, view, origin):
+        return self.read_lines(view, origin, names_only=True)
+
+    @tracer.traced("ocr", "ocr read")
+    def read_lines(self, view, origin, names_only=False):
+        """Runs the OCR backend on a BGR region, returning lines in screen coordinates."""
+        return self.ocr_backend.read(view, origin, names_only)
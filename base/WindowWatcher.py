@@ -0,0 +1,152 @@
+import logging
+import threading
+from contextlib import nullcontext
+from time import perf_counter
+
+from .Tracer import sleep
+
+
+class WindowWatcher:
+    """
+    Keeps track of whether the game window has focus and where it is, so input
+    actions check a cached flag instead of asking the OS before every click.
+
+    By default the window is polled lazily, at most once per `interval`, when an input
+    asks for focus. In background mode a daemon thread polls it every `interval`
+    seconds instead, whether or not any input is sent, which only pays off when
+    inputs come faster than that. If focus is lost, the input (and so the routine sending it) waits
+    until the window is active again instead of ending the macro. When the window was
+    moved in the meantime, the calibrated offsets are re-applied before continuing.
+    """
+
+    def __init__(self, window_manager, interval=0.1, background=False, resume_timeout=None):
+        """
+        Args:
+            window_manager: The WindowManager whose window is watched.
+            interval: Seconds between two polls of the window.
+            background: Poll on a daemon thread instead of lazily on input.
+            resume_timeout: How long a paused input waits for focus before giving
+                up, None to wait forever.
+        """
+        self.window_manager = window_manager
+        self.interval = interval
+        self.background = background
+        self.resume_timeout = resume_timeout
+
+        self.window = None
+        self.focused = False
+        self.geometry = None
+        self._applied_geometry = None
+        self._polled_at = float("-inf")
+        self._focus = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Focus checks inputs asked for vs. getActiveWindow calls actually made, by
+        # inputs and by the background thread, over `cycles` cycles of routines
+        self.checks = 0
+        self.polls = 0
+        self.background_polls = 0
+        self.pauses = 0
+        self.cycles = 0
+
+    def watch(self, window):
+        """Starts watching a window, the current position counts as calibrated."""
+        self.stop()
+        self.window = window
+        self.poll()
+        self._applied_geometry = self.geometry
+        if self.background:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="window-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll(background=True)
+            except Exception as e:
+                logging.warning(f"Window watcher could not poll the window: {e}")
+
+    def poll(self, background=False):
+        """Asks the OS for the active window and the window's geometry once."""
+        if background:
+            self.background_polls += 1
+        else:
+            self.polls += 1
+        self._polled_at = perf_counter()
+        import pygetwindow as gw  # only needed once there is a window to watch
+
+        self.focused = gw.getActiveWindow() == self.window
+        self.geometry = (self.window.left, self.window.top, self.window.width, self.window.height)
+        if self.focused:
+            self._focus.set()
+        else:
+            self._focus.clear()
+
+    def _wait_for_focus(self):
+        started = perf_counter()
+        while True:
+            if self.background:
+                self._focus.wait(self.interval)
+            else:
+                sleep(self.interval)
+                self.poll()
+            if self.focused:
+                return True
+            if self.resume_timeout is not None and perf_counter() - started >= self.resume_timeout:
+                return False
+
+    def ensure_focus(self, action="input", released=nullcontext):
+        """
+        Returns True once the window is active, pausing while it is not. Returns False
+        if focus did not come back within `resume_timeout`. The pause runs inside
+        `released()`, which hands the input lock to other instances while waiting.
+        """
+        self.checks += 1
+        if not self.background and perf_counter() - self._polled_at >= self.interval:
+            self.poll()
+
+        if not self.focused:
+            self.pauses += 1
+            title = getattr(self.window, "title", "Roblox")
+            logging.warning(f"Window '{title}' lost focus, pausing '{action}' until it is active again")
+            with released():
+                resumed = self._wait_for_focus()
+            if not resumed:
+                logging.error(f"Window '{title}' did not get focus back, skipping '{action}'")
+                return False
+            logging.info(f"Window '{title}' is active again, resuming '{action}'")
+
+        if self.geometry != self._applied_geometry:
+            logging.info(f"Window moved from {self._applied_geometry} to {self.geometry}")
+            self._applied_geometry = self.geometry
+            self.window_manager.window_changed()
+        return True
+
+    def cycle(self):
+        """Marks the end of one cycle of routines, the report averages over them."""
+        self.cycles += 1
+
+    def reset_counts(self):
+        self.checks = self.polls = self.background_polls = self.pauses = self.cycles = 0
+
+    def report(self):
+        """
+        How many focus syscalls the cache saved since the last reset, compared to one
+        per check. Negative when background polling makes more calls than inputs need.
+        """
+        calls = self.polls + self.background_polls
+        cycles = max(self.cycles, 1)
+        return (
+            f"Focus checks: {self.checks}, getActiveWindow calls: {calls} "
+            f"({self.polls} on input, {self.background_polls} in the background), "
+            f"saved: {self.checks - calls}, pauses: {self.pauses}; "
+            f"per cycle: {self.checks / cycles:.0f} checks, {calls / cycles:.0f} calls over {self.cycles} cycle(s)"
+        )
@@ -0,0 +1,45 @@
+"""
+Measures frames per second and bytes copied per grab for every capture backend
+that can run on this machine.
+
+Run from the repository root:
+    python -m benchmarks.capture_backends --box 0 0 800 600
+"""
+import argparse
+from time import perf_counter
+
+from base.CaptureBackends import CAPTURE_BACKENDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--box", type=int, nargs=4, default=[0, 0, 800, 600], metavar=("LEFT", "TOP", "RIGHT", "BOTTOM"))
+    parser.add_argument("--grabs", type=int, default=100)
+    args = parser.parse_args()
+
+    box = tuple(args.box)
+    print(f"Grabbing {box[2] - box[0]}x{box[3] - box[1]} at ({box[0]}, {box[1]}), {args.grabs} times per backend")
+    print(f"{'backend':<12}{'fps':>9}{'ms/grab':>9}{'KB copied/grab':>16}")
+    for name, backend_class in CAPTURE_BACKENDS.items():
+        try:
+            backend = backend_class()
+            backend.grab(box)  # Warm up, allocates the buffers
+        except Exception as e:
+            print(f"{name:<12}unavailable: {e}")
+            continue
+
+        backend.grabs = backend.bytes_copied = 0
+        started = perf_counter()
+        for _ in range(args.grabs):
+            backend.grab(box)
+        elapsed = perf_counter() - started
+        backend.close()
+
+        print(
+            f"{name:<12}{args.grabs / elapsed:>9.1f}{elapsed / args.grabs * 1000:>9.2f}"
+            f"{backend.bytes_copied / backend.grabs / 1024:>16.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
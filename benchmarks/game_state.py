@@ -0,0 +1,138 @@
+"""
+Measures what a GameState snapshot costs per frame against asking every detector
+separately, in a few states of the simulated game. Both are timed on a frame that
+is already captured, so the times compare detector work only; the captures column
+counts the frames the separate checks used to grab, one each, whose cost depends on
+the capture backend. Also prints what the snapshot saw, so a wrong probe in
+config.json shows up, and which detectors are calibrated for the real game.
+
+Run from the repository root:
+    python -m benchmarks.game_state --frames 200
+"""
+import argparse
+import logging
+from time import perf_counter
+
+from base import Conditions
+from base.Simulator import Simulator
+
+
+def _idle(game):
+    pass
+
+
+def _gear_dialog(game):
+    game.gui = "gear_dialog"
+
+
+def _gear_shop(game):
+    game.gui = "gear_shop"
+    game.selected = 0
+
+
+def _backpack(game):
+    game.backpack_open = True
+
+
+def _settings(game):
+    game.settings_open = True
+    game.camera_mode = game.CAMERA_MODES.index("follow")
+
+
+def _egg_prompt(game):
+    game.gui = "egg_prompt"
+
+
+def _wrench(game):
+    game.hotbar = {"2": "Recall Wrench"}
+
+
+STATES = [
+    ("idle", _idle),
+    ("gear dialog", _gear_dialog),
+    ("gear shop + buy", _gear_shop),
+    ("backpack", _backpack),
+    ("settings, follow", _settings),
+    ("egg prompt", _egg_prompt),
+    ("wrench in hotbar", _wrench),
+]
+
+
+def separate_lookups(window_manager):
+    """One Conditions check per probe, the way routines asked before snapshots."""
+    reader = window_manager.state
+    checks = []
+    for name, probe in reader.probes.items():
+        box = reader.screen_box(probe)
+        if probe.get("kind", "color") == "template":
+            check = Conditions.template_visible(window_manager, probe["template"], probe.get("confidence", 0.9), box)
+        else:
+            check = Conditions.color_present(window_manager, probe["color"], box, probe.get("tolerance", 10))
+        checks.append(check)
+    return checks
+
+
+def _reset(game):
+    game.gui = None
+    game.selected = None
+    game.backpack_open = game.settings_open = False
+    game.camera_mode = 0
+    game.hotbar = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--frames", type=int, default=200, help="frames timed per state")
+    args = parser.parse_args()
+
+    with Simulator(args.config) as sim:
+        macro = sim.create_macro()
+        logging.getLogger().setLevel(logging.WARNING)  # the macro turns on DEBUG when imported
+        macro.setup_window()
+        window_manager = macro.window_manager
+        frames, reader = window_manager.frames, window_manager.state
+        checks = separate_lookups(window_manager)
+
+        print(f"{'state':<20}{'snapshot ms':>12}{'separate ms':>12}{'captures':>10}  detected")
+        for name, arrange in STATES:
+            _reset(sim.game)
+            arrange(sim.game)
+
+            snapshot_time = 0.0
+            for _ in range(args.frames):
+                frames.invalidate()
+                frames.get_frame()
+                started = perf_counter()
+                state = reader.snapshot()
+                snapshot_time += perf_counter() - started
+
+            separate_time = 0.0
+            for _ in range(args.frames):
+                frames.invalidate()
+                frames.get_frame()
+                started = perf_counter()
+                for check in checks:
+                    check()
+                separate_time += perf_counter() - started
+
+            detected = ", ".join(
+                f"{key}={value}" for key, value in state.values.items() if key != "probes" and value not in (None, False)
+            )
+            print(
+                f"{name:<20}{snapshot_time / args.frames * 1000:>12.3f}{separate_time / args.frames * 1000:>12.3f}"
+                f"{len(checks):>10}  {detected or '-'}"
+            )
+
+        frames.invalidate()
+        reader.snapshot()
+        reader.snapshot()
+        print()
+        print(f"Snapshots evaluated: {reader.snapshots}, served from cache: {reader.hits}")
+        untrusted = [name for name in reader.detectors if not reader.trusted(name)]
+        print(f"Not calibrated for the real game in {args.config}: {', '.join(untrusted) or 'none'}")
+        macro.close()
+
+
+if __name__ == "__main__":
+    main()
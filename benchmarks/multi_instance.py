@@ -0,0 +1,43 @@
+"""
+Runs 1, 2, ... N simulated game instances side by side through the Orchestrator and
+reports how total throughput grows with each added instance.
+
+Every instance is a separate process with its own simulated game running on real
+time, all sharing one InputLock as they would share the mouse and keyboard.
+
+Run from the repository root:
+    python -m benchmarks.multi_instance --max-instances 4 --duration 10
+"""
+import argparse
+import logging
+
+from base.Orchestrator import Orchestrator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--max-instances", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds every instance runs its cycles")
+    parser.add_argument("--routines", nargs="+", default=["sell_inventory"], help="GameActions methods in one cycle")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = []
+    for count in range(1, args.max_instances + 1):
+        orchestrator = Orchestrator(args.config, args.routines, instances=count, simulated=True)
+        orchestrator.run(args.duration)
+        print(orchestrator.report())
+        print()
+        results.append((count, orchestrator.throughput()))
+
+    print(f"{'instances':<10}{'cycles/h':>10}{'gain':>8}")
+    previous = None
+    for count, throughput in results:
+        gain = f"{throughput / previous - 1:+.0%}" if previous else ""
+        print(f"{count:<10}{throughput:>10.0f}{gain:>8}")
+        previous = throughput
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares latency and accuracy of the OCR backends on recorded shop screenshots.
+
+Put PNG screenshots of the shop region in a folder. An optional labels.json in the
+same folder maps file names to the catalog items visible in them; without it, the
+screen_ocr output is used as the reference.
+
+Run from the repository root:
+    python -m benchmarks.ocr_backends path/to/screenshots
+"""
+import argparse
+import json
+import os
+import tempfile
+from time import perf_counter
+
+import cv2
+
+from base.OcrBackends import GlyphBackend, ScreenOcrBackend
+from base.TextMatcher import TextMatcher
+
+
+def items_in(lines, matcher):
+    return {match.item for match, _ in matcher.match_lines(lines)}
+
+
+def run(backend, frames, matcher, repeats):
+    timings = []
+    found = {}
+    for name, frame in frames:
+        for _ in range(repeats):
+            started = perf_counter()
+            lines = backend.read(frame, (0, 0), names_only=True)
+            timings.append(perf_counter() - started)
+        found[name] = items_in(lines, matcher)
+    timings.sort()
+    return found, timings
+
+
+def accuracy(found, reference):
+    expected = sum(len(items) for items in reference.values())
+    correct = sum(len(found[name] & items) for name, items in reference.items())
+    extra = sum(len(found[name] - items) for name, items in reference.items())
+    return correct, expected, extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("folder")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        matcher = TextMatcher(json.load(f).get("shop_items", {}))
+
+    frames = []
+    for filename in sorted(os.listdir(args.folder)):
+        if filename.lower().endswith(".png"):
+            frames.append((filename, cv2.imread(os.path.join(args.folder, filename), cv2.IMREAD_COLOR)))
+    if not frames:
+        print(f"No PNG screenshots in '{args.folder}'")
+        return
+
+    screen_ocr = ScreenOcrBackend()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        glyph = GlyphBackend(matcher, screen_ocr, os.path.join(cache_dir, "glyphs.npz"))
+        # One pass to learn the word templates from the recordings themselves
+        for _, frame in frames:
+            glyph.read(frame, (0, 0), names_only=True)
+        learned_fallbacks = glyph.fallbacks
+        glyph.fallbacks = 0
+
+        results = {backend.name: run(backend, frames, matcher, args.repeats) for backend in (screen_ocr, glyph)}
+
+    labels_path = os.path.join(args.folder, "labels.json")
+    if os.path.exists(labels_path):
+        with open(labels_path, "r") as f:
+            reference = {name: set(items) for name, items in json.load(f).items() if name in dict(frames)}
+    else:
+        reference = results["screen_ocr"][0]
+
+    print(f"{len(frames)} screenshots, {len(glyph.templates)} glyph templates learned ({learned_fallbacks} learning reads)")
+    print(f"{'backend':<12}{'mean ms':>9}{'p95 ms':>9}{'correct':>9}{'missed':>8}{'extra':>7}")
+    for name, (found, timings) in results.items():
+        correct, expected, extra = accuracy(found, reference)
+        mean = sum(timings) / len(timings) * 1000
+        p95 = timings[int(len(timings) * 0.95) - 1 if len(timings) > 1 else 0] * 1000
+        print(f"{name:<12}{mean:>9.2f}{p95:>9.2f}{correct:>9}{expected - correct:>8}{extra:>7}")
+    print(f"glyph fell back to screen_ocr on {glyph.fallbacks} of {len(frames) * args.repeats} reads")
+
+
+if __name__ == "__main__":
+    main()
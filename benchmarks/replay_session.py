@@ -0,0 +1,44 @@
+"""
+Replays a session recorded with `main.py --record DIR` through the current vision
+code and reports lookup times and every result that differs from the recording.
+
+Run from the repository root:
+    python -m benchmarks.replay_session cache/sessions/run1 --kinds color template
+"""
+import argparse
+import copy
+import logging
+
+from base.Config import load_config
+from base.SessionRecorder import Session, SessionReplay
+from base.WindowManager import WindowManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("session", help="folder written by the session recorder")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--kinds", nargs="+", choices=["color", "template", "ocr"], help="only replay these lookups")
+    parser.add_argument("--show", type=int, default=10, help="how many changed results to print")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    config = copy.deepcopy(load_config(args.config))
+    config["capture"] = {"backend": "synthetic"}  # Frames come from the recording
+    window_manager = WindowManager(args.config, config=config)
+
+    session = Session(args.session)
+    print(f"{len(session)} frames, {len(session.input_events)} inputs, {len(session.vision_events)} lookups")
+    replay = SessionReplay(session, window_manager)
+    results = replay.run(args.kinds)
+    print(replay.report())
+
+    changed = [(event, result) for event, result, _, same in results if not same]
+    for event, result in changed[: args.show]:
+        print(f"\nframe {event['frame']} {event['kind']} {event['query']}")
+        print(f"  recorded: {event['result']}")
+        print(f"  replayed: {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Runs the macro's routines against the headless simulated game and reports how long
+each would take in game time, how long it took to compute, and what it cost.
+
+Run from the repository root:
+    python -m benchmarks.simulated_routines --ui-delay 0.3
+"""
+import argparse
+import logging
+from time import perf_counter
+
+from base.Simulator import Simulator
+from base.Tracer import tracer
+
+
+ROUTINES = [
+    ("setup_window", lambda macro: macro.setup_window()),
+    ("goto_garden", lambda macro: macro.game_actions.goto_garden()),
+    ("set_camera_and_settings", lambda macro: macro.game_actions.set_camera_and_settings()),
+    ("put_recall_wrench_in_hotbar", lambda macro: macro.game_actions.put_recall_wrench_in_hotbar()),
+    ("buy_from_gear_shop", lambda macro: macro.game_actions.buy_from_gear_shop()),
+    ("sell_inventory", lambda macro: macro.game_actions.sell_inventory()),
+    ("buy_from_egg_shop", lambda macro: macro.game_actions.buy_from_egg_shop()),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--ui-delay", type=float, default=0.3, help="Seconds the game takes to open a GUI")
+    parser.add_argument("--record", metavar="DIR", help="record the run for benchmarks.replay_session")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace of the run to FILE")
+    parser.add_argument(
+        "--drop-key", action="append", default=[], metavar="KEY",
+        help="make the game miss the first press of KEY, to exercise the watchdog (repeatable)",
+    )
+    args = parser.parse_args()
+
+    with Simulator(args.config, ui_delay=args.ui_delay) as sim:
+        logging.getLogger().setLevel(logging.WARNING)  # the macro turns on DEBUG when imported
+        macro = sim.create_macro()
+        for key in args.drop_key:
+            sim.game.dropped_keys[key] = sim.game.dropped_keys.get(key, 0) + 1
+        frames = macro.window_manager.frames
+        if args.record:
+            macro.start_recording(args.record)
+        if args.trace:
+            tracer.enable()
+
+        print(f"{'routine':<30}{'game s':>9}{'wall ms':>9}{'captures':>10}{'inputs':>8}")
+        for name, routine in ROUTINES:
+            game_started, captures, inputs = sim.clock.now, frames.captures, sim.game.inputs
+            started = perf_counter()
+            routine(macro)
+            elapsed = perf_counter() - started
+            print(
+                f"{name:<30}{sim.clock.now - game_started:>9.2f}{elapsed * 1000:>9.1f}"
+                f"{frames.captures - captures:>10}{sim.game.inputs - inputs:>8}"
+            )
+
+        macro.window_manager.watcher.cycle()
+        game = sim.game
+        print()
+        print(f"Bought: {game.purchases}")
+        print(f"Buy clicks on sold out items: {game.wasted_clicks}")
+        print(f"Inventory sold {game.sold} time(s), eggs bought: {game.eggs_bought}")
+        print(macro.window_manager.watcher.report())
+        print(macro.game_actions.watchdog.report())
+        print(macro.input_player.report())
+        print()
+        print(macro.wait_report())
+        macro.close()
+        if args.trace:
+            tracer.disable()
+            tracer.export_chrome(args.trace)
+            print()
+            print(tracer.summary())
+
+
+if __name__ == "__main__":
+    main()
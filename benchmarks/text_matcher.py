@@ -0,0 +1,62 @@
+"""
+Benchmarks TextMatcher on synthetic noisy OCR lines built from the config.json catalogs.
+
+Run from the repository root:
+    python -m benchmarks.text_matcher
+"""
+import json
+import random
+from time import perf_counter
+
+from base.TextMatcher import TextMatcher
+
+# Confusions screen OCR typically makes on the game font
+CONFUSIONS = {"l": "1", "i": "l", "o": "0", "s": "5", "e": "c", "a": "o", "n": "m", "g": "q"}
+SUFFIXES = ["", " x1 stock", " x0 stock", " $600", " no stock", " 25,000"]
+
+
+def noisy(name, rng, typos):
+    chars = list(name.lower())
+    for _ in range(typos):
+        position = rng.randrange(len(chars))
+        roll = rng.random()
+        if roll < 0.5:
+            chars[position] = CONFUSIONS.get(chars[position], chars[position])
+        elif roll < 0.75:
+            del chars[position]
+        else:
+            chars.insert(position, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+    return "".join(chars) + rng.choice(SUFFIXES)
+
+
+def main(lines_per_level=2000, seed=0):
+    with open("config.json", "r") as f:
+        catalogs = json.load(f)["shop_items"]
+
+    started = perf_counter()
+    matcher = TextMatcher(catalogs)
+    print(f"Compiled {len(matcher.patterns)} names in {(perf_counter() - started) * 1e3:.2f}ms")
+
+    rng = random.Random(seed)
+    names = [(item, catalog) for catalog, items in catalogs.items() for item in items]
+    print(f"{'typos':>5}{'lines':>7}{'correct':>9}{'wrong':>7}{'missed':>8}{'us/line':>9}")
+    for typos in range(4):
+        samples = [(noisy(item, rng, typos), item) for item, _ in (rng.choice(names) for _ in range(lines_per_level))]
+        started = perf_counter()
+        results = [matcher.match(text) for text, _ in samples]
+        elapsed = perf_counter() - started
+
+        correct = sum(1 for result, (_, item) in zip(results, samples) if result and result.item == item)
+        missed = sum(1 for result in results if result is None)
+        wrong = len(samples) - correct - missed
+        print(f"{typos:>5}{len(samples):>7}{correct:>9}{wrong:>7}{missed:>8}{elapsed / len(samples) * 1e6:>9.1f}")
+
+    junk = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(20)) for _ in range(lines_per_level)]
+    started = perf_counter()
+    false_hits = sum(1 for text in junk if matcher.match(text))
+    elapsed = perf_counter() - started
+    print(f"junk {len(junk):>8}{'':>9}{false_hits:>7}{'':>8}{elapsed / len(junk) * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,148 @@
-from time import sleep
-from base.MacroManager import GAGMacro
+import argparse
+from time import perf_counter, sleep
+
+
+def profile_startup(config_path, record=None):
+    """
+    Builds the macro step by step and prints how long each part of startup takes.
+    """
+    timings = []
+
+    started = perf_counter()
+    from base.MacroManager import GAGMacro
+    timings.append(("imports", perf_counter() - started))
+
+    started = perf_counter()
+    from base.Config import load_config
+    load_config(config_path)
+    timings.append(("config", perf_counter() - started))
+
+    started = perf_counter()
+    macro = GAGMacro(config_path)
+    timings.append(("macro construction", perf_counter() - started))
+    if record:
+        macro.start_recording(record)
+
+    started = perf_counter()
+    macro.templates.get("seeds.png")
+    timings.append(("templates (first use)", perf_counter() - started))
+
+    started = perf_counter()
+    macro.window_manager.ocr_backend
+    timings.append(("OCR backend (first use)", perf_counter() - started))
+
+    started = perf_counter()
+    ready = macro.setup_window()
+    timings.append(("window setup", perf_counter() - started))
+
+    total = sum(elapsed for _, elapsed in timings)
+    print(f"{'startup step':<26}{'seconds':>9}")
+    for step, elapsed in timings:
+        print(f"{step:<26}{elapsed:>9.3f}")
+    print(f"{'total':<26}{total:>9.3f}")
+    return macro, ready
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Grow a Garden macro")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print a breakdown of import, config, backend init and window setup time",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        help="record frames, inputs and vision results to DIR for offline replay",
+    )
+    parser.add_argument(
+        "--schedule",
+        action="store_true",
+        help="after the setup routines, keep running the jobs under \"schedule\" in the config",
+    )
+    parser.add_argument(
+        "--run-for",
+        type=float,
+        metavar="SECONDS",
+        help="stop the scheduled jobs after this long (default: until Ctrl+C), or the --instances run (default: 600)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="time every action and routine, write a Chrome trace to FILE and print a summary",
+    )
+    parser.add_argument(
+        "--instances",
+        type=int,
+        metavar="N",
+        help="run one macro per open Roblox window (at most N, 0 for all) for --run-for seconds",
+    )
+    parser.add_argument(
+        "--cycle",
+        nargs="+",
+        default=["buy_from_gear_shop", "sell_inventory"],
+        metavar="ROUTINE",
+        help="with --instances, the routines every instance repeats",
+    )
+    args = parser.parse_args()
+
     print("Starting macro in 3 seconds...")
     sleep(3)
 
-    macro = GAGMacro()
+    if args.trace:
+        from base.Tracer import tracer
+
+        tracer.enable()
+
+    if args.instances is not None:
+        from base.Orchestrator import Orchestrator
+
+        orchestrator = Orchestrator(
+            args.config,
+            args.cycle,
+            instances=args.instances or None,
+            setup_routines=["goto_garden", "set_camera_and_settings", "put_recall_wrench_in_hotbar"],
+        )
+        orchestrator.run(args.run_for or 600)
+        print(orchestrator.report())
+        raise SystemExit
+
+    if args.profile_startup:
+        macro, ready = profile_startup(args.config, args.record)
+    else:
+        from base.MacroManager import GAGMacro
+
+        macro = GAGMacro(args.config)
+        if args.record:
+            macro.start_recording(args.record)
+        ready = macro.setup_window()
     game_actions = macro.game_actions
-    
-    if macro.setup_window():
+
+    if ready:
         game_actions.goto_garden()
         sleep(0.5)
-        game_actions.set_camera_and_settings()  
-        sleep(0.5)  
+        game_actions.set_camera_and_settings()
+        sleep(0.5)
         game_actions.put_recall_wrench_in_hotbar()
         sleep(0.5)
-        game_actions.buy_from_gear_shop()
\ No newline at end of file
+        game_actions.buy_from_gear_shop()
+        macro.window_manager.watcher.cycle()
+        print(macro.wait_report())
+        print(macro.window_manager.watcher.report())
+        print(macro.input_player.report())
+        print(game_actions.watchdog.report())
+
+        if args.schedule:
+            from base.Scheduler import Scheduler
+
+            scheduler = Scheduler(macro)
+            scheduler.add_from_config(macro.config.get("schedule", {}))
+            scheduler.run_forever(args.run_for)
+            print(scheduler.report())
+    macro.close()
+
+    if args.trace:
+        tracer.disable()
+        tracer.export_chrome(args.trace)
+        print(tracer.summary())
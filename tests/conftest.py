@@ -0,0 +1,27 @@
+import logging
+import os
+
+import pytest
+
+from base.Simulator import Simulator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def sim(monkeypatch):
+    """A simulated game on a virtual clock, with the input modules faked."""
+    # Templates and config are looked up relative to the repository root
+    monkeypatch.chdir(ROOT)
+    with Simulator(os.path.join(ROOT, "config.json")) as sim:
+        yield sim
+
+
+@pytest.fixture
+def macro(sim):
+    """A GAGMacro set up on the simulated game's window."""
+    macro = sim.create_macro()
+    logging.getLogger().setLevel(logging.WARNING)  # the macro turns on DEBUG when imported
+    assert macro.setup_window()
+    yield macro
+    macro.close()
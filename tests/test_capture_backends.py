@@ -0,0 +1,70 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from base.CaptureBackends import CaptureBackend, MssCaptureBackend, SyntheticCaptureBackend
+
+
+def test_a_backend_without_grab_cannot_be_created():
+    class Incomplete(CaptureBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_synthetic_grab_clips_to_the_screen_and_alternates_buffers():
+    screen = np.arange(20 * 30 * 3, dtype=np.uint8).reshape(20, 30, 3)
+    backend = SyntheticCaptureBackend(lambda: screen)
+
+    first = backend.grab((25, 15, 40, 30))
+    assert first.shape == (5, 5, 3)
+    assert np.array_equal(first, screen[15:20, 25:30])
+
+    # The view handed out for one frame stays valid while the next is captured
+    second = backend.grab((25, 15, 40, 30))
+    assert second is not first
+    assert backend.grab(None).shape == (20, 30, 3)
+    assert backend.grabs == 3
+
+
+class FakeMss:
+    """Stands in for an mss handle, which only works on the thread that made it."""
+
+    monitors = [{"left": 0, "top": 0, "width": 4, "height": 3}]
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.closed = False
+
+    def grab(self, monitor):
+        assert threading.get_ident() == self.thread, "mss handle used on another thread"
+        width, height = monitor["width"], monitor["height"]
+        return SimpleNamespace(raw=bytes(width * height * 4), width=width, height=height)
+
+    def close(self):
+        self.closed = True
+
+
+def test_mss_gets_a_handle_per_thread(monkeypatch):
+    handles = []
+
+    def create():
+        handles.append(FakeMss())
+        return handles[-1]
+
+    monkeypatch.setitem(sys.modules, "mss", SimpleNamespace(mss=create))
+    backend = MssCaptureBackend()
+    assert backend.grab((0, 0, 4, 3)).shape == (3, 4, 3)
+
+    with ThreadPoolExecutor(1) as executor:
+        assert executor.submit(backend.grab, None).result().shape == (3, 4, 3)
+        executor.submit(backend.grab, (1, 1, 3, 2)).result()
+
+    assert len(handles) == 2
+    backend.close()
+    assert all(handle.closed for handle in handles)
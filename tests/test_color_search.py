@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from base.ColorSearch import ColorSearch, parse_color
+
+
+class Frames:
+    """A fixed frame with its top left corner at `origin` on the screen."""
+
+    recorder = None
+
+    def __init__(self, frame, origin=(0, 0)):
+        self.frame = frame
+        self.origin = origin
+
+    def get_region(self, box=None):
+        if box is None:
+            return self.frame, self.origin
+        ox, oy = self.origin
+        return self.frame[box[1] - oy : box[3] - oy, box[0] - ox : box[2] - ox], (box[0], box[1])
+
+
+def paint(frame, box, hex):
+    left, top, right, bottom = box
+    frame[top:bottom, left:right] = parse_color(hex)[::-1]
+
+
+def test_parse_color():
+    assert parse_color("26ee26") == (0x26, 0xEE, 0x26)
+    assert parse_color("#ff8c00") == (255, 140, 0)
+
+
+@pytest.mark.parametrize("tolerance", [0, 8])
+def test_touching_colors_stay_separate_blobs(tolerance):
+    frame = np.zeros((40, 60, 3), dtype=np.uint8)
+    paint(frame, (10, 10, 31, 21), "26ee26")  # 21 x 11
+    paint(frame, (31, 10, 36, 21), "ff8c00")  # 5 x 11, touching on the right
+    search = ColorSearch(Frames(frame, origin=(100, 200)))
+
+    found = search.find(["26ee26", "ff8c00"], tolerance=tolerance)
+
+    green, = found["26ee26"]
+    orange, = found["ff8c00"]
+    assert (green.left, green.top, green.width, green.height, green.area) == (110, 210, 21, 11, 231)
+    assert (orange.left, orange.width, orange.area) == (131, 5, 55)
+    assert green.center == (120, 215)
+
+
+def test_blobs_are_largest_first_and_small_ones_dropped():
+    frame = np.zeros((40, 60, 3), dtype=np.uint8)
+    paint(frame, (0, 0, 2, 2), "26ee26")
+    paint(frame, (10, 10, 14, 14), "26ee26")
+    paint(frame, (30, 30, 31, 31), "26ee26")
+    search = ColorSearch(Frames(frame))
+
+    assert [blob.area for blob in search.find("26ee26")["26ee26"]] == [16, 4, 1]
+    assert [blob.area for blob in search.find("26ee26", min_area=2)["26ee26"]] == [16, 4]
+    assert search.find_largest("26ee26", region=(0, 0, 5, 5)).area == 4
+
+
+def test_tolerance_per_channel():
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    paint(frame, (0, 0, 3, 3), "28ec26")  # r +2, g -2
+    search = ColorSearch(Frames(frame))
+
+    assert search.find("26ee26")["26ee26"] == []
+    assert search.find("26ee26", tolerance=2)["26ee26"][0].area == 9
+    assert search.find("26ee26", tolerance=(1, 2, 0))["26ee26"] == []
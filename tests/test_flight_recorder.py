@@ -0,0 +1,46 @@
+import atexit
+import logging
+import os
+import sys
+
+from base import FlightRecorder as flight_recorder_module
+from base.FlightRecorder import FlightRecorder
+
+
+def log_handlers():
+    listener = flight_recorder_module._listener
+    return list(logging.getLogger().handlers) + list(listener.handlers if listener else ())
+
+
+def test_close_removes_the_log_handler_and_exit_hook(tmp_path, monkeypatch):
+    hooks = []
+    monkeypatch.setattr(atexit, "register", hooks.append)
+    monkeypatch.setattr(atexit, "unregister", hooks.remove)
+    recorder = FlightRecorder(path=str(tmp_path))
+    assert recorder.log in log_handlers()
+    assert hooks == [recorder.close]
+
+    recorder.close()
+    assert recorder.log not in log_handlers()
+    assert hooks == []
+
+
+def test_kept_records_hold_the_traceback_text_not_the_frames(tmp_path):
+    recorder = FlightRecorder(path=str(tmp_path))
+    try:
+        try:
+            raise ValueError("no shop")
+        except ValueError:
+            record = logging.LogRecord("root", logging.ERROR, __file__, 1, "Job failed", None, sys.exc_info())
+        recorder.log.handle(record)
+        assert recorder.log.records[-1] is record
+        assert record.exc_info is None
+        assert "ValueError: no shop" in record.exc_text
+
+        recorder.dump("job_gear_shop")
+        recorder.flush()
+        folder, = os.listdir(tmp_path)
+        with open(os.path.join(tmp_path, folder, "log.txt")) as f:
+            assert "ValueError: no shop" in f.read()
+    finally:
+        recorder.close()
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from base.Orchestrator import InputLock
+
+
+def bound_lock():
+    """A lock whose instance already has focus, so acquiring never switches windows."""
+    lock = InputLock()
+    lock.index = 0
+    lock._focused.value = 0
+    return lock
+
+
+def test_waiters_get_the_input_in_the_order_they_asked():
+    lock = bound_lock()
+    order = []
+    lock.acquire()
+
+    threads = []
+    for i in range(4):
+        thread = threading.Thread(target=lambda i=i: (lock.acquire(), order.append(i), lock.release()))
+        thread.start()
+        threads.append(thread)
+        # Wait until this thread has taken its ticket before starting the next one
+        while lock._next.value != i + 2:
+            time.sleep(0.001)
+
+    lock.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == [0, 1, 2, 3]
+    assert lock.acquisitions == 5
+
+
+def test_holding_is_reentrant_within_a_thread():
+    lock = bound_lock()
+    with lock.hold():
+        with lock.hold():
+            assert lock._serving.value == 0
+        # The inner release does not hand the input on
+        assert lock._serving.value == 0
+    assert lock._serving.value == 1
+    assert lock.acquisitions == 1
+
+
+def test_released_lets_another_thread_in_and_takes_the_input_back():
+    lock = bound_lock()
+    entered = threading.Event()
+
+    def other():
+        with lock.hold():
+            entered.set()
+
+    with lock.hold():
+        with lock.hold():
+            thread = threading.Thread(target=other)
+            thread.start()
+            assert not entered.wait(0.05)
+            with lock.released():
+                assert entered.wait(5)
+            thread.join(5)
+            assert lock._local.depth == 2
+        assert lock._local.depth == 1
+    assert lock._serving.value == lock._next.value
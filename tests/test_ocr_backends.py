@@ -0,0 +1,129 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from base.OcrBackends import GlyphBackend, OcrBackend, ScreenOcrBackend
+from base.TextMatcher import TextMatcher
+
+ITEMS = ["Watering Can", "Trowel", "Recall Wrench", "Basic Sprinkler"]
+BACKGROUND = (70, 50, 50)
+ROW = 60
+
+
+def word(text, left, top, width=30, height=10):
+    return SimpleNamespace(text=text, left=left, top=top, width=width, height=height)
+
+
+class Reader:
+    """Stands in for screen_ocr.Reader with the read_image signature of screen_ocr 0.6+."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.calls = []
+
+    def read_image(self, image, bounding_box=None, screen_coordinates=None, search_radius=None):
+        self.calls.append((image.size, bounding_box))
+        left, top = bounding_box[:2] if bounding_box else (0, 0)
+        lines = [
+            SimpleNamespace(words=[word(w.text, w.left + left, w.top + top, w.width, w.height) for w in line])
+            for line in self.lines
+        ]
+        return SimpleNamespace(result=SimpleNamespace(lines=lines))
+
+
+def test_screen_ocr_reads_in_screen_coordinates():
+    reader = Reader([[word("Trowel", 5, 4, 40)], [], [word("X3", 5, 24, 20), word("Stock", 30, 24)]])
+    backend = ScreenOcrBackend(reader)
+    view = np.zeros((40, 80, 3), dtype=np.uint8)
+
+    assert backend.read_boxes(view, (100, 200)) == [
+        ("trowel", (105, 204, 145, 214)),
+        ("x3 stock", (105, 224, 160, 234)),
+    ]
+    assert backend.read(view, (100, 200)) == [("trowel", (125, 209)), ("x3 stock", (132, 229))]
+    assert reader.calls[0] == ((80, 40), (100, 200, 180, 240))
+
+
+def name_image(text):
+    (width, height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
+    image = np.full((height + baseline + 6, width + 6, 3), BACKGROUND, dtype=np.uint8)
+    cv2.putText(image, text, (3, height + 3), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+    return image
+
+
+def shop_list(items=ITEMS):
+    """A list with one name per row, and the stock under it as a shop row has."""
+    view = np.full((len(items) * ROW, 300, 3), BACKGROUND, dtype=np.uint8)
+    for index, item in enumerate(items):
+        name = name_image(item)
+        view[index * ROW + 5 : index * ROW + 5 + name.shape[0], 10 : 10 + name.shape[1]] = name
+        cv2.putText(view, "x3 Stock", (150, index * ROW + 45), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 230, 255), 1)
+    return view
+
+
+def row_band(view, index):
+    return view[index * ROW + 2 : index * ROW + 30, 0:200]
+
+
+class Fallback:
+    """The OCR the glyph backend falls back to, reading every name row."""
+
+    def __init__(self):
+        self.reads = 0
+
+    def read_boxes(self, view, origin):
+        self.reads += 1
+        return [(item.lower(), (origin[0] + 10, origin[1] + i * ROW + 5, origin[0] + 100, origin[1] + i * ROW + 25))
+                for i, item in enumerate(ITEMS)]
+
+
+@pytest.fixture
+def glyph(tmp_path):
+    matcher = TextMatcher({"gear": ITEMS})
+    backend = GlyphBackend(matcher, Fallback(), str(tmp_path / "glyphs.npz"))
+    backend.templates = {item: cv2.cvtColor(name_image(item), cv2.COLOR_BGR2GRAY) for item in ITEMS}
+    return backend
+
+
+def test_glyphs_read_a_clean_list(glyph):
+    lines = glyph.read(shop_list(), (0, 0), names_only=True)
+
+    assert [text for text, _ in lines] == [item.lower() for item in ITEMS]
+    assert glyph.fallback.reads == 0
+
+
+def test_glyphs_leave_prices_and_stock_to_the_fallback(glyph):
+    glyph.read(shop_list(), (0, 0))
+
+    assert glyph.fallback.reads == 1
+
+
+def test_a_weakly_matched_row_falls_back(glyph):
+    view = shop_list()
+    band = row_band(view, 3)  # The last row, no gap gives it away
+    noise = np.random.default_rng(0).normal(0, 50, band.shape)
+    band[:] = (cv2.GaussianBlur(band, (3, 3), 0) + noise).clip(0, 255).astype(np.uint8)
+
+    lines = glyph.read(view, (0, 0), names_only=True)
+
+    assert glyph.fallback.reads == 1
+    assert "basic sprinkler" in [text for text, _ in lines]
+
+
+def test_a_row_missing_between_hits_falls_back(glyph):
+    view = shop_list()
+    row_band(view, 1)[:] = (90, 90, 90)  # Nothing of "Trowel" is left to match
+
+    glyph.read(view, (0, 0), names_only=True)
+
+    assert glyph.fallback.reads == 1
+
+
+def test_a_backend_without_read_cannot_be_created():
+    class Incomplete(OcrBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
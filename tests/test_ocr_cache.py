@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+
+from base.OcrCache import OcrCache, exact_hash, region_hash
+
+
+def text_view(text, shape=(30, 160)):
+    view = np.full(shape + (3,), (70, 50, 50), dtype=np.uint8)
+    cv2.putText(view, text, (5, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+    return view
+
+
+class Reader:
+    """Reads a region as one line at its top left corner, counting the reads."""
+
+    def __init__(self, text="line"):
+        self.text = text
+        self.calls = 0
+
+    def __call__(self, view, origin):
+        self.calls += 1
+        return [(self.text, (origin[0] + 5, origin[1] + 10))]
+
+
+def test_region_hash_ignores_noise_but_not_content():
+    view = text_view("Trowel")
+    noisy = (view.astype(np.int16) + np.random.default_rng(0).integers(-1, 2, view.shape)).clip(0, 255).astype(np.uint8)
+
+    assert region_hash(noisy) == region_hash(view)
+    assert region_hash(text_view("Recall Wrench")) != region_hash(view)
+    assert region_hash(view[:, :100]) != region_hash(view)  # the size is part of the key
+
+
+def test_exact_hash_tells_one_glyph_apart():
+    x2, x3 = text_view("x2 Stock", (30, 400)), text_view("x3 Stock", (30, 400))
+
+    assert exact_hash(x2) != exact_hash(x3)
+    assert exact_hash(x2) == exact_hash(x2.copy())
+    assert exact_hash(x2)[0] == "exact"
+
+
+def test_hits_are_shifted_to_the_new_origin():
+    cache, reader = OcrCache(), Reader()
+    view = text_view("Trowel")
+
+    assert cache.read(view, (100, 200), reader) == [("line", (105, 210))]
+    assert cache.read(view, (100, 260), reader) == [("line", (105, 270))]
+    assert reader.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_exact_reads_and_kinds_have_their_own_keys():
+    cache, reader = OcrCache(), Reader()
+    view = text_view("x3 Stock")
+
+    cache.read(view, (0, 0), reader)
+    cache.read(view, (0, 0), reader, exact=True)
+    cache.read(view, (0, 0), reader, kind="names")
+    cache.read(view, (0, 0), reader, exact=True)
+    assert reader.calls == 3
+
+    # One changed pixel is a new read for an exact key
+    changed = view.copy()
+    changed[0, 0] += 1
+    cache.read(changed, (0, 0), reader, exact=True)
+    assert reader.calls == 4
+
+
+def test_least_recently_used_entries_are_dropped():
+    cache, reader = OcrCache(capacity=2), Reader()
+    first, second, third = (text_view(text) for text in ("Trowel", "Recall Wrench", "Godly Sprinkler"))
+
+    for view in (first, second, first, third):
+        cache.read(view, (0, 0), reader)
+    assert reader.calls == 3
+    cache.read(first, (0, 0), reader)  # still cached, it was used after second
+    assert reader.calls == 3
+    cache.read(second, (0, 0), reader)
+    assert reader.calls == 4
+
+
+def test_read_rows_only_reads_new_rows():
+    cache, reader = OcrCache(), Reader()
+    rows = [text_view(text) for text in ("Trowel", "Recall Wrench", "Godly Sprinkler", "Basic Sprinkler")]
+
+    lines = cache.read_rows(np.vstack(rows[:3]), (0, 100), 30, reader)
+    assert [y for _, (_, y) in lines] == [110, 140, 170]
+    assert reader.calls == 3
+
+    # Scrolled by one row: only the row that came into view is read
+    cache.read_rows(np.vstack(rows[1:]), (0, 100), 30, reader)
+    assert reader.calls == 4
@@ -0,0 +1,40 @@
+import os
+
+from base.Orchestrator import Orchestrator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_setup_picks_the_window_by_handle(sim):
+    macro = sim.create_macro()
+    try:
+        assert not macro.setup_window(handle=sim.game.window._hWnd + 1000)
+        assert macro.setup_window(handle=sim.game.window._hWnd)
+        assert macro.window is sim.game.window
+    finally:
+        macro.close()
+
+
+def test_uncalibrated_offsets_follow_the_window_position(sim, monkeypatch):
+    macro = sim.create_macro()
+    try:
+        window_manager = macro.window_manager
+        monkeypatch.setattr(window_manager.calibrator, "run", lambda: None)
+        assert macro.setup_window(position=(300, 200))
+        border = window_manager.config["border_offsets"].get(window_manager.os_name, 5)
+        title_bar = window_manager.config["title_bar_offsets"].get(window_manager.os_name, 30)
+        assert (window_manager.xOffset, window_manager.yOffset) == (300 + border, 200 + title_bar)
+        assert not window_manager.calibrated
+    finally:
+        macro.close()
+
+
+def test_a_failing_setup_routine_is_reported_with_the_other_instances(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    orchestrator = Orchestrator(routines=[], simulated=True, instances=2, setup_routines=["no_such_routine"])
+    reports = orchestrator.run(0.1)
+
+    assert [report.index for report in reports] == [0, 1]
+    assert not any(report.ready for report in reports)
+    assert all("no_such_routine" in report.error for report in reports)
+    assert "no_such_routine" in orchestrator.report()
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+
+from base.Scheduler import Job, Scheduler, condition_from_config
+
+
+def fake_macro():
+    """Just what the input worker touches after a routine."""
+    dumps = []
+    window_manager = SimpleNamespace(watcher=SimpleNamespace(cycle=lambda: None))
+    return SimpleNamespace(window_manager=window_manager, flight_recorder=SimpleNamespace(dump=dumps.append)), dumps
+
+
+def test_job_needs_exactly_one_of_interval_and_period():
+    with pytest.raises(ValueError):
+        Job("shop", None)
+    with pytest.raises(ValueError):
+        Job("shop", None, interval=10, period=300)
+
+
+@pytest.mark.parametrize("now, expected", [
+    (0.0, 5.0),
+    (4.9, 5.0),
+    (5.0, 305.0),
+    (299.0, 305.0),
+    (612.0, 905.0),
+])
+def test_period_jobs_line_up_with_the_restock_timer(now, expected):
+    job = Job("gear_shop", None, period=300, offset=5)
+    job.schedule(now)
+    assert job.next_run == expected
+
+
+def test_interval_jobs_run_after_they_last_finished():
+    job = Job("sell", None, interval=1800)
+    job.schedule(1234.5)
+    assert job.next_run == 1234.5 + 1800
+
+
+def test_the_most_important_due_job_runs_first():
+    macro, _ = fake_macro()
+    scheduler = Scheduler(macro)
+    order = []
+
+    def routine(name):
+        def run():
+            order.append(name)
+            if len(order) == 2:
+                scheduler.stop()
+        return run
+
+    # Both are due when the scheduler starts; the less important one is added first
+    scheduler.add(Job("sell", routine("sell"), interval=0, priority=5))
+    scheduler.add(Job("gear_shop", routine("gear_shop"), interval=0, priority=0))
+    scheduler.run_forever(duration=5)
+
+    assert order == ["gear_shop", "sell"]
+
+
+def test_failing_routines_are_counted_and_rescheduled():
+    macro, dumps = fake_macro()
+    scheduler = Scheduler(macro)
+
+    def broken():
+        raise RuntimeError("no shop")
+
+    job = scheduler.add(Job("gear_shop", broken, interval=0.05))
+    scheduler.run_forever(duration=0.3)
+
+    assert job.failures >= 2
+    assert job.runs == 0
+    assert dumps[0] == "job_gear_shop"
+
+
+def test_camera_drift_is_measured_with_a_calibrated_sky_color(sim):
+    sim.config["camera_alignment"] = dict(sim.config["camera_alignment"], mode="closed_loop", sky_color="6ea0c8")
+    macro = sim.create_macro()
+    try:
+        assert macro.setup_window()
+        drifted = condition_from_config(macro.window_manager, {"camera_drift": True, "threshold": 4})
+
+        assert drifted(macro.window_manager.frames)  # Looking straight ahead, sky everywhere
+        macro.game_actions.set_camera_and_settings()
+        assert not drifted(macro.window_manager.frames)
+        sim.game.camera_pitch -= 200  # Nudged back up
+        assert drifted(macro.window_manager.frames)
+    finally:
+        macro.close()
+
+
+def test_camera_drift_falls_back_to_a_timer_without_a_sky_color(sim, macro):
+    now = [0.0]
+    spec = [{"color": "26ee26", "region": "gear_shop", "absent": True}, {"camera_drift": True, "max_age": 1800}]
+    drifted = condition_from_config(macro.window_manager, spec, clock=lambda: now[0])
+    frames = macro.window_manager.frames
+
+    now[0] = 1799.0
+    assert not drifted(frames)
+    now[0] = 1800.0
+    assert drifted(frames)
+    now[0] = 1900.0
+    assert not drifted(frames)
+
+    # Not while the gear shop is open, and that doesn't use up the timer
+    now[0] = 3600.0
+    sim.game.gui = "gear_shop"
+    sim.game.selected = 0
+    assert not drifted(frames)
+    sim.game.gui = None
+    assert drifted(frames)
@@ -0,0 +1,49 @@
+import pytest
+
+from base.ShopReader import BLIND_CLICKS, Offer, ShopReader, parse_amount, parse_stock
+
+
+@pytest.mark.parametrize(
+    "text, amount",
+    [
+        ("12,500¢", 12_500),
+        ("price 1.5M¢", 1_500_000),
+        ("2k c", 2_000),
+        ("3B¢", 3_000_000_000),
+        ("x3 Stock", None),
+        ("", None),
+    ],
+)
+def test_parse_amount(text, amount):
+    assert parse_amount(text) == amount
+
+
+def test_parse_amount_without_symbol():
+    assert parse_amount("600,000", symbol=False) == 600_000
+    assert parse_amount("1.25m", symbol=False) == 1_250_000
+    assert parse_amount("600,000") is None
+
+
+@pytest.mark.parametrize("text, stock", [("X3 Stock", 3), ("x 12 stock", 12), ("NO STOCK", 0), ("Trowel", None)])
+def test_parse_stock(text, stock):
+    assert parse_stock(text) == stock
+
+
+@pytest.mark.parametrize(
+    "stock, price, money, clicks",
+    [
+        (3, 100, None, 3),
+        (3, 100, 250, 2),
+        (3, 100, 50, 0),
+        (None, 100, None, BLIND_CLICKS),
+        (None, 100, 1_000, 10),
+        (0, 100, 1_000, 0),
+        (40, 100, None, BLIND_CLICKS),  # Never more than the blind burst it replaces
+        (3, None, 0, 3),  # An unread price doesn't limit anything
+    ],
+)
+def test_clicks_needed(stock, price, money, clicks):
+    needed = ShopReader.clicks_needed(Offer("Trowel", stock, price), money)
+
+    assert needed == clicks
+    assert 0 <= BLIND_CLICKS - needed <= BLIND_CLICKS
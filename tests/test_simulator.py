@@ -0,0 +1,160 @@
+"""
+Drives the macro's routines through the simulated game. Run from the repository root:
+    python -m pytest -q
+"""
+from base.SessionRecorder import Session, SessionReplay
+
+
+def affordable(game):
+    """What buying down the list should get: the stock, or as many as the money left buys."""
+    money, expected = game.money, {}
+    for item in game.gear_items:
+        count = min(game.stock.get(item, 0), money // game.prices[item])
+        if count:
+            expected[item] = count
+            money -= count * game.prices[item]
+    return expected
+
+
+def test_buy_from_gear_shop(sim, macro):
+    expected = affordable(sim.game)
+    macro.game_actions.put_recall_wrench_in_hotbar()
+    macro.game_actions.buy_from_gear_shop()
+
+    assert sim.game.purchases == expected
+    assert sim.game.wasted_clicks == 0
+    assert sim.game.gui is None
+
+
+def test_untrusted_probes_keep_the_unconditional_steps(sim, macro):
+    # config.json ships every probe uncalibrated, the routines must not skip on their word
+    state = macro.window_manager.state
+    assert not any(state.trusted(name) for name in state.detectors)
+
+    sim.game.hotbar = {"2": "Recall Wrench"}
+    before = sim.game.inputs
+    macro.game_actions.put_recall_wrench_in_hotbar()
+    assert sim.game.inputs > before
+
+
+def test_calibrated_probes_skip_what_is_done_already(sim):
+    # Checked against what this game draws
+    game_state = sim.config["game_state"]
+    game_state["probes"] = {name: dict(probe, calibrated=True) for name, probe in game_state["probes"].items()}
+    macro = sim.create_macro()
+    try:
+        assert macro.setup_window()
+        expected = affordable(sim.game)
+        sim.game.hotbar = {"2": "Recall Wrench"}
+        before = sim.game.inputs
+        macro.game_actions.put_recall_wrench_in_hotbar()
+        assert macro.game_actions.close_gui()
+        assert sim.game.inputs == before
+
+        macro.game_actions.buy_from_gear_shop()
+        assert sim.game.purchases == expected
+        assert macro.game_actions.watchdog.failures == {}
+    finally:
+        macro.close()
+
+
+def test_sell_inventory(sim, macro):
+    macro.game_actions.sell_inventory()
+
+    assert sim.game.sold == 1
+    assert sim.game.gui is None
+
+
+def test_watchdog_recovers_a_dropped_key(sim, macro):
+    expected = affordable(sim.game)
+    sim.game.dropped_keys["e"] = 1  # The gear dialog doesn't open the first time
+    macro.game_actions.put_recall_wrench_in_hotbar()
+    macro.game_actions.buy_from_gear_shop()
+
+    watchdog = macro.game_actions.watchdog
+    assert watchdog.failures == {"gear dialog open": 1}
+    assert watchdog.recoveries == 1
+    assert sim.game.purchases == expected
+
+
+def test_unstocked_catalog_items_are_not_stuck(sim):
+    # The catalog lists items the shop doesn't show, several in a row at the end
+    shown = sim.game.gear_items[:6]
+    sim.game.gear_items = shown
+    sim.config["shop_items"]["gear"] = shown + ["Magnifying Glass", "Tanning Mirror", "Master Sprinkler", "Cleaning Spray"]
+    macro = sim.create_macro()
+    try:
+        assert macro.setup_window()
+        expected = affordable(sim.game)
+        macro.game_actions.put_recall_wrench_in_hotbar()
+        macro.game_actions.buy_from_gear_shop()
+
+        assert macro.game_actions.watchdog.failures == {}
+        assert sim.game.purchases == expected
+    finally:
+        macro.close()
+
+
+def test_stock_is_read_again_after_it_changes(sim, macro):
+    sim.game.gui = "gear_shop"
+    sim.game.selected = 0
+    actions = macro.game_actions
+    scanner = actions.get_shop_scanner("gear")
+
+    sim.game.stock["Trowel"] = 3
+    coords = scanner.locate("Trowel")
+    assert actions.shop_reader.read_offer("Trowel", coords, scanner.region).stock == 3
+
+    # One digit changes on an otherwise identical row, the OCR cache must not reuse "x3"
+    sim.game.stock["Trowel"] = 2
+    macro.window_manager.frames.invalidate()
+    assert actions.shop_reader.read_offer("Trowel", coords, scanner.region).stock == 2
+
+
+def test_multi_color_find_replays(sim, macro, tmp_path):
+    # The buy button and the wrench in the hotbar, one blob of each color
+    sim.game.gui = "gear_shop"
+    sim.game.selected = 0
+    sim.game.hotbar = {"2": "Recall Wrench"}
+    path = str(tmp_path / "session")
+    macro.start_recording(path)
+    found = macro.window_manager.colors.find(["26ee26", "ff8c00"])
+    macro.stop_recording()
+    assert found["26ee26"] and found["ff8c00"]
+
+    # The query records the searched box (the whole window), not the cells of the last blob
+    session = Session(path)
+    assert [event["query"]["box"] for event in session.vision_events] == [None]
+    results = SessionReplay(session, macro.window_manager).run()
+    assert [same for _, _, _, same in results] == [True]
+
+
+def test_gear_shop_waits_ignore_the_moving_world(sim, macro):
+    expected = affordable(sim.game)
+    macro.game_actions.put_recall_wrench_in_hotbar()
+    sim.game.world_motion = 200
+    macro.game_actions.buy_from_gear_shop()
+
+    assert macro.game_actions.watchdog.failures == {}
+    assert sim.game.purchases == expected
+
+
+def test_closed_loop_camera_needs_a_calibrated_sky_color(sim):
+    # config.json ships without a sky color, the closed loop must not trust a guess
+    sim.config["camera_alignment"] = dict(sim.config["camera_alignment"], mode="closed_loop")
+    assert sim.config["camera_alignment"]["sky_color"] is None
+    macro = sim.create_macro()
+    try:
+        assert macro.setup_window()
+        aligner = macro.game_actions.camera_aligner
+        assert macro.game_actions.set_camera_and_settings()
+        assert [step.name for step in aligner.steps] == ["pitch"]
+        assert sim.game.camera_pitch > 0  # the open-loop recipe looked up
+
+        # With the color this game draws, the closed loop measures the pitch itself
+        aligner.sky_rgb = (0x6E, 0xA0, 0xC8)
+        sim.game.camera_pitch = 0
+        assert macro.game_actions.set_camera_and_settings()
+        assert all(step.converged for step in aligner.steps)
+    finally:
+        macro.close()
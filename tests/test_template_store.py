@@ -0,0 +1,35 @@
+import cv2
+import numpy as np
+
+from base.TemplateStore import Template, TemplateStore
+
+
+def test_grayscale_and_alpha_templates_load(tmp_path):
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, (12, 16), dtype=np.uint8)
+    cv2.imwrite(str(tmp_path / "gray.png"), gray)
+    cv2.imwrite(str(tmp_path / "color.png"), rng.integers(0, 256, (12, 16, 4), dtype=np.uint8))
+
+    store = TemplateStore(str(tmp_path))
+    store.load()
+
+    assert sorted(store.templates) == ["color.png", "gray.png"]
+    for template in store.templates.values():
+        assert template.bgr.shape == (12, 16, 3)
+        assert template.gray.shape == (12, 16)
+    assert np.array_equal(store.get("gray.png").gray, gray)
+
+    # Gray with alpha, as IMREAD_UNCHANGED gives it
+    template = Template("gray_alpha.png", np.dstack([gray, np.full_like(gray, 255)]))
+    assert np.array_equal(template.gray, gray)
+    assert template.bgr.shape == (12, 16, 3)
+
+
+def test_grayscale_template_is_found(tmp_path):
+    frame = np.random.default_rng(1).integers(0, 256, (60, 80, 3), dtype=np.uint8)
+    cv2.imwrite(str(tmp_path / "patch.png"), cv2.cvtColor(frame[20:32, 30:46], cv2.COLOR_BGR2GRAY))
+
+    store = TemplateStore(str(tmp_path))
+    match = store.locate("patch.png", frame, (100, 200), confidence=0.9, grayscale=True)
+
+    assert (match.left, match.top) == (130, 220)
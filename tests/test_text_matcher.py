@@ -0,0 +1,78 @@
+import pytest
+
+from base.TextMatcher import TextMatcher, substring_distance
+
+CATALOGS = {
+    "gear": ["Trowel", "Recall Wrench", "Basic Sprinkler", "Godly Sprinkler"],
+    "seeds": ["Carrot", "Strawberry"],
+}
+
+
+@pytest.fixture
+def matcher():
+    return TextMatcher(CATALOGS)
+
+
+@pytest.mark.parametrize(
+    "pattern, text, limit, distance",
+    [
+        ("trowel", "x3 trowel 50c", 2, 0),
+        ("trowel", "trovel", 2, 1),  # substitution
+        ("trowel", "trowl", 2, 1),  # deletion
+        ("trowel", "trrowel", 2, 1),  # insertion
+        ("trowel", "carrot", 2, 3),  # past the limit: limit + 1
+        ("trowel", "", 10, 6),
+    ],
+)
+def test_substring_distance(pattern, text, limit, distance):
+    assert substring_distance(pattern, text, limit) == distance
+
+
+def test_exact_names_inside_a_line(matcher):
+    match = matcher.match("  X3   Basic Sprinkler 100,000c ")
+
+    assert (match.item, match.catalog, match.confidence, match.distance) == ("Basic Sprinkler", "gear", 1.0, 0)
+
+
+def test_longest_exact_name_wins():
+    matcher = TextMatcher({"gear": ["Sprinkler", "Godly Sprinkler"]})
+
+    assert matcher.match("godly sprinkler").item == "Godly Sprinkler"
+    assert matcher.match("a sprinkler").item == "Sprinkler"
+
+
+def test_automaton_follows_failure_links():
+    # "abce" runs down the "abcd" branch before "bce" has to be found through a failure link
+    matcher = TextMatcher({"test": ["abcd", "bce"]})
+
+    assert matcher.match("xabce").item == "bce"
+    assert matcher.match("abcd").item == "abcd"
+
+
+def test_typos_fall_back_to_the_trigram_index(matcher):
+    match = matcher.match("Godiy Sprinkler")
+
+    assert match.item == "Godly Sprinkler"
+    assert match.distance == 1
+    assert match.confidence == pytest.approx(1 - 1 / len("godly sprinkler"))
+
+
+def test_too_many_typos_and_junk_do_not_match(matcher):
+    assert matcher.match("Tqxwxl") is None
+    assert matcher.match("1,250,000") is None
+    assert matcher.match("") is None
+
+
+def test_catalog_filter(matcher):
+    assert matcher.match("carrot", "seeds").item == "Carrot"
+    assert matcher.match("carrot", "gear") is None
+    assert matcher.match("carot", ["gear"]) is None
+    assert matcher.match("carot", ["gear", "seeds"]).item == "Carrot"
+
+
+def test_match_lines(matcher):
+    lines = [("trowel", (10, 20)), ("x3 stock", (10, 40)), ("recal wrench", (10, 80))]
+
+    matches = matcher.match_lines(lines)
+
+    assert [(match.item, coords) for match, coords in matches] == [("Trowel", (10, 20)), ("Recall Wrench", (10, 80))]
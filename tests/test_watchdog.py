@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from base.Watchdog import StuckError, Watchdog
+
+
+class Actions:
+    """Records the recovery routines the watchdog runs, and the frame checkpoints see."""
+
+    def __init__(self):
+        self.calls = []
+        self.view = np.zeros((64, 64, 3), dtype=np.uint8)
+        frames = SimpleNamespace(get_region=lambda box: (self.view, (0, 0)))
+        window_manager = SimpleNamespace(frames=frames, resolve_region=lambda region: None)
+        recorder = SimpleNamespace(dump=lambda reason: self.calls.append(("dump", reason)))
+        self.macro = SimpleNamespace(window_manager=window_manager, flight_recorder=recorder)
+
+    def close_gui(self):
+        self.calls.append("close_gui")
+
+    def goto_garden(self):
+        self.calls.append("goto_garden")
+
+    def set_camera_and_settings(self):
+        self.calls.append("set_camera_and_settings")
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    delays = []
+    monkeypatch.setattr("base.Watchdog.sleep", delays.append)
+    return delays
+
+
+def test_backoff_doubles_up_to_the_limit_and_recovery_escalates(delays):
+    actions = Actions()
+    watchdog = Watchdog(actions, backoff=1.0, max_backoff=5.0)
+    for _ in range(4):
+        watchdog.recover_from("shop open")
+
+    assert [d for d in delays if d != 0.5] == [1.0, 2.0, 4.0, 5.0]
+    recoveries = [call for call in actions.calls if not isinstance(call, tuple)]
+    assert recoveries == (
+        ["close_gui"]
+        + ["close_gui", "goto_garden"]
+        + ["close_gui", "goto_garden", "set_camera_and_settings"] * 2
+    )
+    assert watchdog.failures == {"shop open": 4}
+    assert watchdog.recoveries == 4
+
+
+def test_run_retries_a_stuck_routine_and_resets_the_backoff(delays):
+    actions = Actions()
+    watchdog = Watchdog(actions, retries=1)
+    attempts = []
+
+    def routine():
+        attempts.append(1)
+        watchdog.expect(len(attempts) > 1, "dialog open")
+        return "done"
+
+    assert watchdog.run("shop", routine) == "done"
+    assert len(attempts) == 2
+    assert watchdog.failures == {"dialog open": 1}
+    assert ("dump", "stuck_shop_dialog open") in actions.calls
+    assert watchdog.consecutive == 0
+
+
+def test_run_gives_up_after_the_retries(delays):
+    watchdog = Watchdog(Actions(), retries=2)
+
+    assert watchdog.run("shop", lambda: watchdog.expect(False, "dialog open")) is False
+    assert watchdog.runs == 3
+    assert watchdog.failures == {"dialog open": 3}
+
+
+def test_checkpoint_raises_when_the_screen_stops_changing():
+    actions = Actions()
+    watchdog = Watchdog(actions, stall_limit=2)
+
+    # A changing screen never stalls
+    for shade in (0, 80, 160, 240):
+        actions.view[:] = shade
+        watchdog.checkpoint("buy")
+
+    # The last changed frame plus stall_limit identical ones
+    watchdog.checkpoint("buy")
+    with pytest.raises(StuckError) as error:
+        watchdog.checkpoint("buy")
+    assert error.value.step == "buy"
+
+
+def test_checkpoint_of_another_step_starts_over():
+    actions = Actions()
+    watchdog = Watchdog(actions, stall_limit=1)
+
+    watchdog.checkpoint("buy")
+    watchdog.checkpoint("sell")
+    with pytest.raises(StuckError):
+        watchdog.checkpoint("sell")